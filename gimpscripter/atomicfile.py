@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+
+'''
+Write files atomically: to a temporary file in the same directory, then renamed over the file.
+A reader (Gimp, or GimpScripter in its next session) never sees a partial file,
+and a crash while writing leaves the old file, not a corrupt one.
+
+Used for wrappers and spec files (see generate.py), and the caches of the plugin db (see mockmenu.)
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import os
+import tempfile
+
+
+def replace(temppath, filepath):
+  '''
+  Rename temppath to filepath, replacing any file there.
+  !!! On Windows, rename doesn't replace, so the old file is removed first:
+  not atomic there, a crash in between leaves no file (but never a partial one.)
+  '''
+  if os.name == "nt" and os.path.exists(filepath):
+    os.remove(filepath)
+  os.rename(temppath, filepath)
+
+
+def write(filepath, write_contents, mode=None):
+  '''
+  Write file at filepath atomically, calling write_contents(f) on an open (binary) temporary file.
+  If mode is given, chmod the file to it, else it is readable and writable by the user only.
+  On failure, raises and leaves no temporary file.
+  '''
+  handle, temppath = tempfile.mkstemp(suffix=".tmp", prefix=".", dir=os.path.dirname(filepath) or ".")
+  try:
+    with os.fdopen(handle, "wb") as f:
+      write_contents(f)
+    if mode is not None:
+      os.chmod(temppath, mode)
+    replace(temppath, filepath)
+  except:
+    if os.path.exists(temppath):
+      os.remove(temppath)
+    raise
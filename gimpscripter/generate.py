@@ -71,15 +71,21 @@ from gimpfu import *
 
 import os
 import stat
+import hashlib
 # import operator # for or_
 
 # our own submodules
 from gimpscripter import parameters 
+from gimpscripter import atomicfile
 from gimpscripter import constantmaps
 from gimpscripter import parse_params
 from gimpscripter import template
 from gimpscripter import macros
+from gimpscripter import optimize
+from gimpscripter import specification
+from gimpscripter import specfile
 from gimpscripter.mockmenu import plugindb
+from gimpscripter.mockmenu import map_procedures
 # Refers to a pdb dictionary of useable procedures ( a facsimile subset of the Gimp PDB.)
 
 
@@ -104,6 +110,10 @@ EPHEMERAL_LOOKUP = "ephemera.lookup"
 # indent 2 spaces and trail newline !!!
 # TODO unify names
 INTER_COMMAND_RUNTIME = "  ephemera.update()\n" 
+# After a command with known effects, which don't rename objects: names of known objects need not be fetched again.
+INTER_COMMAND_RUNTIME_KNOWN_EFFECTS = "  ephemera.update(refresh_names=False)\n"
+# Name of function to push an ephemeral object returned by a command onto the runtime's stacks.
+EPHEMERAL_PUSH = "ephemera.push"
 GIMPSCRIPTER_PRELUDE = "  ephemera = GimpEphemera(image, drawable)"  # WAS image_stack = GimpStack(image)\n"
 GIMPSCRIPTER_POSTLUDE = ""
 # !!! Note  call to image_stack.top() is in constantmaps.py
@@ -115,6 +125,27 @@ PDB_INVOKE_PREFIX = "pdb."
 
 # TODO make  wrapping plugin return  stack top
 
+# Lines of code before and after the body, by undo mode (see specification.UNDO_FOO.)
+# The body is in a try:, indented by UNDO_INDENT, so undo is restored even if a command fails.
+# Only the undo of the image passed to the wrapping plugin: images the commands create have their own.
+# (The GUI's labels and the user manual say so.)
+# No image is passed (image is None) when a wrapper whose first command takes no image
+# (imagetype "", e.g. File/New) is chosen with no image open: then there is nothing to group or disable.
+# !!! gimp_image_undo_disable also frees the image's undo history, as batch use wants.
+UNDO_PRELUDES = {
+  specification.UNDO_GROUP : "  if image:\n    pdb.gimp_image_undo_group_start(image)\n  try:",
+  specification.UNDO_DISABLED : "  if image:\n    pdb.gimp_image_undo_disable(image)\n  try:",
+  }
+UNDO_POSTLUDES = {
+  specification.UNDO_GROUP : "  finally:\n    if image:\n      pdb.gimp_image_undo_group_end(image)",
+  specification.UNDO_DISABLED : "  finally:\n    if image:\n      pdb.gimp_image_undo_enable(image)",
+  }
+UNDO_INDENT = "    "
+
+# Types of return values pushed on the runtime's stacks.  The runtime has no stack of displays.
+EPHEMERAL_RETURN_TYPES = (PF_IMAGE, PF_LAYER, PF_CHANNEL, PF_DRAWABLE, PF_VECTORS)
+
+
 # Constants for type of wrapping plugin.
 # In  future, maybe other types eg sequences of plugins
 WRAPPING_TYPE_CONSTANT = 1    # all settings constant i.e. hardcoded
@@ -124,6 +155,9 @@ WRAPPING_TYPE_LAST = 3      # using last (current at runtime) settings of wrappe
 # Other constants
 PARAM_SEP = ", "
 
+# Whether to rewrite the body of plugin_main, see optimize.py
+OPTIMIZE_WRAPPING_MAIN_BODY = True
+
 # Globals
 substitutions = {}
 
@@ -165,13 +199,34 @@ def generate(plugin_spec):
   
   # Write completed script to file.
   # TODO warn of overwrite
-  #if os.path.isfile(filepath):
-  filepath = substitutions["filepath"]
-  with open(filepath, "w") as f:
-    f.write(substitutedtemplate)
+  if write_if_changed(substitutions["filepath"], substitutedtemplate):
+    substitutions["wrappingstatus"] = "Created"
+  else:
+    substitutions["wrappingstatus"] = "Unchanged (file not rewritten)"
+  
+  # Save spec beside wrapper, so wrapper can be reopened.  Not executable, else Gimp would run it as a plugin.
+  write_if_changed(substitutions["specpath"], specfile.dumps(plugin_spec),
+    stat.S_IRUSR | stat.S_IWUSR)
+
+
+def write_if_changed(filepath, text, mode=stat.S_IRWXU):
+  '''
+  Write text to file at filepath, with mode (default executable), unless the file already holds the same text.
+  Return whether written.
+  
+  Gimp queries a plugin again (slowing its start) whenever the plugin file's mtime changes,
+  so an unchanged wrapper is not touched.  Compared by hash (digest) of contents.
+  Written atomically (see atomicfile.py), so Gimp never reads a partial wrapper.
+  '''
+  digest = hashlib.sha1(text).digest()
+  if os.path.isfile(filepath):
+    with open(filepath, "rb") as f:
+      if hashlib.sha1(f.read()).digest() == digest:
+        return False
   
   # Make wrapping plugin file executable. (Linux, Mac OSX, not needed for Windows?)
-  os.chmod(filepath, stat.S_IRWXU)
+  atomicfile.write(filepath, lambda f: f.write(text), mode)
+  return True
 
 
 
@@ -205,9 +260,18 @@ def make_substitution_map(plugin_spec):
   Make substitution strings for plugin_main() of wrapping plugin.
   '''
   commands = plugin_spec.commands
+  wrapping = plugin_spec.wrapping
+  analysis = SequenceAnalysis(commands, wrapping)
   
-  substitutions["wrappingmainformalparams"] = make_wrapping_main_formal_params(commands)
-  substitutions["wrappingmainbody"] = make_wrapping_main_body(commands)
+  substitutions["wrappingmainformalparams"] = make_wrapping_main_formal_params(commands, analysis)
+  if wrapping.undo_mode in UNDO_PRELUDES:
+    substitutions["wrappingmainbody"] = make_wrapping_main_body(commands, analysis, UNDO_INDENT)
+    substitutions["undoprelude"] = UNDO_PRELUDES[wrapping.undo_mode]
+    substitutions["undopostlude"] = UNDO_POSTLUDES[wrapping.undo_mode]
+  else: # UNDO_STEPS, Gimp's own
+    substitutions["wrappingmainbody"] = make_wrapping_main_body(commands, analysis)
+    substitutions["undoprelude"] = ""
+    substitutions["undopostlude"] = ""
   
   '''
   Make substitution strings for registering wrapping plugin.
@@ -219,7 +283,7 @@ def make_substitution_map(plugin_spec):
   substitutions["wrappingprocedurename"] = wrappingprocedurename
   # TODO let  author-user enter a blurb but default it to a reasonable guess
   substitutions["wrappingblurb"] = make_wrapping_blurb(commands)
-  substitutions["wrappingparameterdefs"] = make_wrapping_paramdefs(commands)
+  substitutions["wrappingparameterdefs"] = make_wrapping_paramdefs(commands, analysis)
   '''
   label and menu parameters work together.
   !!! A side effect of menu parameter is to omit image and drawable parameters to a plugin.
@@ -244,7 +308,7 @@ def make_substitution_map(plugin_spec):
   substitutions["wrappinglabel"] = plugin_spec.wrapping.menuname
   substitutions["wrappingmenuarg"] = 'menu="' + WRAPPING_MENU_PATH_PREFIX_REGISTER + '"'
   
-  if is_need_runtime(commands):
+  if analysis.is_need_runtime:
     filepath = gimp.directory + "/plug-ins/gimpscripter/runtime.py"
     with open(filepath, "r") as f:
       substitutions["wrappingruntimelibrary"] = f.read()
@@ -258,6 +322,7 @@ def make_substitution_map(plugin_spec):
   # Make file path to local plugins.
   # Pygimp knows parent directory + standard directory name + filename + standard extension
   substitutions["filepath"] = gimp.directory + "/plug-ins/" + wrappingfilename + ".py"
+  substitutions["specpath"] = specfile.path_for_wrapper(substitutions["filepath"])
   
   return substitutions
 
@@ -293,32 +358,64 @@ def what_wrapping_type(command, wrappedparms):
 '''
 These are decision routines.
 '''
-def is_need_runtime(commands):
-  '''
-  A runtime library is needed if:
-  TODO update this comment
-  - if wrapping has hidden params
-  - if author-user did not defer (did enter name strings) for ephemeral parameters.
-  Put library code into wrapping plugin, rather than import a module of library code, 
-  so publishing a wrapping plugin is simpler (not dependent on other modules.)
-  Alternatively, template should include "from gimpscripter import runtime"
-  and EPHEMERAL_CALL should be "runtime.ephemeral.lookup"
-  '''
-  # TODO if all ephemeral are OUT params of wrapped plugins, no need for this
-  ## WAS if commands.has_ephemeral_params() :
+class SequenceAnalysis(object):
+  '''
+  Facts about a sequence of commands that generating needs, computed once, in one pass over the sequence,
+  so generating is linear in the length of the sequence.
+  
+  By position of command:
+    parms: its Params (a slice of the Commands' ParamList)
+    wrapping_types: see what_wrapping_type()
+    is_updates_needed_after: see is_update_needed_after()
+  Of the sequence:
+    is_need_runtime: whether wrapper needs the runtime library
+    is_need_image: whether wrapper needs formal parameters "image, drawable"
+  '''
+  def __init__(self, commands, wrapping):
+    self.parms = []
+    self.wrapping_types = []
+    self.is_updates_needed_after = []
+    has_in_params = False
+    has_ephemeral_params = False
+    for position in range(len(commands)):
+      command = commands.get_command_for(position)
+      parms = commands.get_parms_for(position)
+      self.parms.append(parms)
+      self.wrapping_types.append(what_wrapping_type(command, parms))
+      self.is_updates_needed_after.append(is_update_needed_after(command))
       
-  # Temporarily, until we can figure out whether macros use ephemera,
-  # return True
-  return commands.has_ephemeral_params()
-
-
-def is_need_wrapper_main_formal_param_image(commands):
-  ''' Does wrapper need formal parameters "image, drawable" 
-  If any command refers to "image" or "drawable" in leading params (what we call IN or hidden params)
-  OR if needs runtime (since the runtime depends on image, drawable to initialize stacks.
-  '''
-  # WAS  is_take_image()
-  return commands.has_in_params() or is_need_runtime(commands)
+      # As Commands.has_in_params(): assume macros that use the runtime access hidden params
+      if command.is_macro():
+        if macros.uses_ephemera(command.name):
+          has_in_params = True
+          has_ephemeral_params = True
+      elif not has_in_params and parse_params.count_nonrunmode_hidden_params(parms):
+        has_in_params = True
+      if not has_ephemeral_params:
+        has_ephemeral_params = any(map(parameters.Param.is_ephemeral, parms))
+    
+    '''
+    A runtime library is needed if:
+    TODO update this comment
+    - if wrapping has hidden params
+    - if author-user did not defer (did enter name strings) for ephemeral parameters.
+    Also if a macro uses ephemera, see macros.uses_ephemera()
+    Put library code into wrapping plugin, rather than import a module of library code, 
+    so publishing a wrapping plugin is simpler (not dependent on other modules.)
+    Alternatively, template should include "from gimpscripter import runtime"
+    and EPHEMERAL_CALL should be "runtime.ephemeral.lookup"
+    '''
+    # TODO if all ephemeral are OUT params of wrapped plugins, no need for this
+    self.is_need_runtime = has_ephemeral_params
+    
+    '''
+    Wrapper needs formal parameters "image, drawable"
+    If any command refers to "image" or "drawable" in leading params (what we call IN or hidden params)
+    OR if needs runtime (since the runtime depends on image, drawable to initialize stacks.
+    OR if wrapping has an undo mode (which groups or disables undo of image.)
+    '''
+    # WAS  is_take_image()
+    self.is_need_image = has_in_params or self.is_need_runtime or wrapping.undo_mode in UNDO_PRELUDES
   
 
 '''
@@ -327,7 +424,7 @@ from various pieces of slices of Param for wrapped plugin.
 '''
 
 
-def make_wrapping_main_formal_params(commands):
+def make_wrapping_main_formal_params(commands, analysis):
   '''
   Return string for formal parameters of wrapping plugin main() procedure.
   Depends on whether wrapped commands take same parameters (which are passed through).
@@ -337,7 +434,7 @@ def make_wrapping_main_formal_params(commands):
   Any deferred wrapped parameters must also be parameters of wrapping.
   '''
   
-  if is_need_wrapper_main_formal_param_image(commands):
+  if analysis.is_need_image:
     hidden_params = "image, drawable, " # !!! Trailing comma
   else:
     # Also, imagetypes param to register() should be empty,
@@ -363,14 +460,14 @@ def make_paramdef_default(parm):
     return parm.get_evaluable_value() # repr() so a string type is quoted
 
 
-def make_standard_paramdefs(commands):
-  if is_need_wrapper_main_formal_param_image(commands):
+def make_standard_paramdefs(analysis):
+  if analysis.is_need_image:
     return '(PF_IMAGE, "image", "Input image", None), (PF_DRAWABLE, "drawable", "Input drawable", None)'
   else:
     return ""
     
 
-def make_wrapping_paramdefs(commands):
+def make_wrapping_paramdefs(commands, analysis):
   '''
   Return string of parameter definitions for wrapping plugin registration.
   These comprise:
@@ -397,7 +494,7 @@ def make_wrapping_paramdefs(commands):
   # Comma separated cat param defs, turned into strings
   paramdefstrings = []
   
-  standard_paramdefs = make_standard_paramdefs(commands)
+  standard_paramdefs = make_standard_paramdefs(analysis)
   if standard_paramdefs:
     paramdefstrings.append(standard_paramdefs)
     
@@ -459,11 +556,13 @@ def make_imagetype_string(procname):
 
 
 
-def make_LHS_name(paramtype):
+def make_LHS_name(paramtype, index):
+  ''' Name for the return value at index.  Names are reused by later commands. '''
   if paramtype == PF_IMAGE:
-    return "fooimage"
+    name = "fooimage"
   else:
-    return "fooobject"
+    name = "fooobject"
+  return name + str(index)
 
 def make_LHS_string(command):
   '''
@@ -472,8 +571,8 @@ def make_LHS_string(command):
   !!! Note LHS contains '=' (usual meaning of LHS does not)
   '''
   names = []
-  for parm in parameters.get_return_parms(command.name):
-    names.append(make_LHS_name(parm.type))
+  for index, returndef in enumerate(command.get_return_paramdefs()):
+    names.append(make_LHS_name(returndef[0], index))
   if names:
     if len(names) > 1:
       return "(" + ",".join(names) + ") ="  # a tuple is returned from plugins unless a single value
@@ -481,39 +580,84 @@ def make_LHS_string(command):
       return names[0] + "="
   else:
     return ""
-  
-  
-def make_wrapping_main_body(commands):
-  ''' Generate seq of command invocations for body of wrapping plugin main. '''
+
+def make_push_string(command):
+  '''
+  Make lines of code to push ephemeral return values of a command onto the runtime's stacks.
+  The runtime then need not infer them by querying Gimp (see INTER_COMMAND_RUNTIME.)
+  '''
   script = ""
-  for position in range(0, len(commands)):
-    script += make_invocation(commands, position)
+  for index, returndef in enumerate(command.get_return_paramdefs()):
+    if returndef[0] in EPHEMERAL_RETURN_TYPES:
+      script += "  " + EPHEMERAL_PUSH + "(" \
+        + constantmaps._type_to_string_map[returndef[0]] \
+        + ", " + make_LHS_name(returndef[0], index) + ")\n"
   return script
 
+def get_effects(command):
+  ''' Return (created, deleted) types of objects, or None if effects unknown. '''
+  if macros.is_macro(command.name):
+    return macros.get_effects(command.name)
+  else:
+    return map_procedures.procname_to_effects.get(command.name)
+
+def is_update_needed_after(command):
+  '''
+  Can a command change the set of Gimp objects in ways its return values don't tell?
+  If so, the wrapper must query Gimp for them (INTER_COMMAND_RUNTIME) after the command.
+  '''
+  effects = get_effects(command)
+  if effects is None: # e.g. a plugin or script
+    return True
+  created, deleted = effects
+  if deleted:
+    return True
+  returned = [returndef[0] for returndef in command.get_return_paramdefs()]
+  if PF_DRAWABLE in returned:
+    returned += [PF_LAYER, PF_CHANNEL]
+  for a_type in created:
+    if a_type not in returned:
+      return True
+  return False
+  
+  
+def make_wrapping_main_body(commands, analysis, indent=optimize.INDENT):
+  ''' Generate seq of command invocations for body of wrapping plugin main, indented. '''
+  statements = []
+  for position in range(0, len(commands)):
+    statements.extend(make_invocation(commands, position, analysis))
+  if OPTIMIZE_WRAPPING_MAIN_BODY:
+    statements = optimize.optimize(statements)
+  return optimize.emit(statements, indent)
+
 
-def make_invocation(commands, position):
+def make_invocation(commands, position, analysis):
   ''' 
-  Return Python code for an invocation  (call) of a command. 
+  Return statements (see optimize.py) for an invocation  (call) of a command. 
   It may include lines of code before and after call.
   '''
-  script = ""
-  if commands.has_ephemeral_params() :
-    # Each command must be preceded by because any prior command may have created ephemera
-    # TODO we might be able to forego this, if we knew which commands created ephemera
-    script += INTER_COMMAND_RUNTIME
+  statements = []
+  is_runtime = analysis.is_need_runtime
+  if is_runtime and position > 0 and analysis.is_updates_needed_after[position - 1]:
+    # Preceded by because the prior command may have created or deleted ephemera, unknown to us.
+    # Not the first command: the runtime was just initialized.
+    if get_effects(commands.get_command_for(position - 1)) is None:
+      statements.extend(optimize.statements_of(optimize.UPDATE, INTER_COMMAND_RUNTIME))
+    else:
+      statements.extend(optimize.statements_of(optimize.UPDATE, INTER_COMMAND_RUNTIME_KNOWN_EFFECTS))
   
   # Generate a comment that indicates what menu item was chosen by author-user
-  script += "  # " + commands.get_command_for(position).pathstring + '\n'
+  statements.append(optimize.Statement(optimize.COMMENT, "# " + commands.get_command_for(position).pathstring))
   
   # Generate call
-  script += "  "  # Indent to standard depth: two spaces.  Must match template.
   # Since two commands may have same name, get parms for them by position
-  script += make_call_string(commands, position) # , commands.get_parms_for(position))
-  script += '\n'  # trail newline.  Note this is platform independent, Python accepts all terminators.
-  return script
+  statements.extend(optimize.statements_of(optimize.CALL, make_call_string(commands, position, analysis)))
+  if is_runtime:
+    statements.extend(optimize.statements_of(optimize.PUSH, make_push_string(commands.get_command_for(position))))
+  return statements
   
   
-def make_call_string(commands, position):
+def make_call_string(commands, position, analysis):
   '''
   Make Python code for a call to named procedure or macro, with parameters.
   !!! For internal procedure, plugin, or macro.  But there are subtle differences.
@@ -522,13 +666,13 @@ def make_call_string(commands, position):
   But Pygimp requires run-mode as a keyword arg
   '''
   command = commands.get_command_for(position)
-  parms = commands.get_parms_for(position)
+  parms = analysis.parms[position]
   
   # transliterate _ => - in name
   # Because in Python, - is subtraction operator, can't be used in names.
   underbar_name = command.name.replace("-", "_")
   
-  wrapping_type = what_wrapping_type(command, parms)
+  wrapping_type = analysis.wrapping_types[position]
   
   if parse_params.has_runmode(parms):
     # PDB procedure of type Plugin except for those whose name begins with 'file-'
@@ -682,7 +826,6 @@ def generate_macro_call(name, parms):
     raise RuntimeError("Placeholders in GimpScripter macros must be valid Python identifiers" + str(details) )
   except KeyError as details:
     raise RuntimeError("Missing substitute for a placeholder in a GimpScripter macro" + str(details) )
-  print "Macro result is", result
   return result
   
   
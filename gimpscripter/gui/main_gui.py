@@ -22,13 +22,15 @@ Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 import pygtk
 pygtk.require("2.0")
 import gtk
+import gobject
+import gimp
 
 # Our own sub modules, installed in same directory as this file.
 # These are independent of db
 from gimpscripter.mockmenu import db_treemodel
-from gimpscripter.mockmenu import path_treemodel
 from gimpscripter import generate
 from gimpscripter import specification  # bundle of data drives generation
+from gimpscripter import specfile
 from gimpscripter.gui import param_dialog
 
 
@@ -41,8 +43,14 @@ UI_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gimpscri
 
 
 class gimpscripterApp(object): 
+  '''
+  If load_db is given, it is a function that loads the dbs of dictofviews.
+  Then the window is shown immediately, and loading the dbs and populating the mock menu
+  happen later, in idle callbacks, while the mock menu shows progress.
+  Otherwise the dbs must already be loaded.
+  '''
   
-  def __init__(self, dictofviews):
+  def __init__(self, dictofviews, load_db=None):
     
     # Note: use self for all variables accessed across class methods,
     # but not passed into a method, eg in a callback.
@@ -56,10 +64,12 @@ class gimpscripterApp(object):
     '''
     One treemodel, a menu tree of plugins.
     Data driven construction of a set of treemodels as specified by a dictofviews.
-    Also populates and sorts treemodels.
+    Also populates and sorts treemodels, unless loading is deferred.
     Note: ignore any treestore model from glade, don't: model = builder.get_object("treestore1")
     '''
-    self.models = db_treemodel.TreeModelDictionary(self.dictofviews)
+    self.load_db = load_db
+    self.progressmodel = None # while loading is deferred, model of mock menu
+    self.models = db_treemodel.TreeModelDictionary(self.dictofviews, is_populate = load_db is None)
     
     self.spec = specification.GimpScripterSpec()
     
@@ -73,10 +83,30 @@ class gimpscripterApp(object):
     self.mockmenu =       self.safe_build(builder, "treeview1")
     self.command_seq_listview = self.safe_build(builder, "treeview2")
     self.name_textentry = self.safe_build(builder, "entry1")
+    self.search_textentry = self.safe_build(builder, "entry2")
+    
+    # Undo mode of wrapper, beside its name.  Items in order of modes, see specification.UNDO_FOO
+    self.undo_combobox = gtk.combo_box_new_text()
+    for label in specification.UNDO_MODE_LABELS:
+      self.undo_combobox.append_text(label)
+    self.undo_combobox.set_active(self.spec.wrapping.undo_mode)
+    self.undo_combobox.show()
+    self.safe_build(builder, "hbox1").pack_start(self.undo_combobox, expand=False, padding=2)
+    
+    # Open the spec of a wrapper generated earlier, to change it
+    # Insensitive while the db is loading: the spec's commands are looked up in it.
+    self.open_button = gtk.Button("Open...")
+    self.open_button.connect("clicked", self.on_open_clicked)
+    self.open_button.set_sensitive(load_db is None)
+    self.open_button.show()
+    self.safe_build(builder, "hbox1").pack_start(self.open_button, expand=False, padding=2)
     
     # parent of parameter_widgets
     self.parameter_box = builder.get_object("vbox1")
-    self.parameter_widgets = []   # built dynamically
+    self.parameter_widgets = []   # built dynamically, those displayed
+    # Command => its parameter widget (or None if no parameters), built the first time it is displayed,
+    # then hidden and shown, so switching between commands builds no widgets.
+    self.parameter_widget_cache = {}
     
     # Initial internal GUI state.
     self.OKbutton.set_sensitive(False)
@@ -96,10 +126,17 @@ class gimpscripterApp(object):
     self.command_seq_listview.get_selection().set_select_function(self.filter_select_command) # Filtered: any row can be selected except
         
     # Set model of treeview to the treemodel of the current viewspec
-    self.mockmenu.set_model(self.models[self.currentviewname].treemodel)
+    if load_db is None:
+      self.mockmenu.set_model(self.models[self.currentviewname].filteredmodel)
+    else:
+      # Until loaded, mock menu is a single row showing progress. Empty column 1 so not selectable.
+      self.progressmodel = gtk.TreeStore(str, str, str)
+      self.progressrow = self.progressmodel.append(None, ["Loading menu...", "", ""])
+      self.mockmenu.set_model(self.progressmodel)
     
-    # Set tooltips to be blurb column
-    self.mockmenu.set_tooltip_column(2)
+    # Tooltips show blurb, fetched from the db only for rows the user hovers.
+    self.mockmenu.set_has_tooltip(True)
+    self.mockmenu.connect("query-tooltip", self.on_mockmenu_query_tooltip)
     
     builder.connect_signals(self)
 
@@ -118,7 +155,47 @@ class gimpscripterApp(object):
     
   def main(self):
     self.mainwidget.show_all() # April 2011 WAS show()
+    if self.load_db is not None:
+      self.start_deferred_load()
     gtk.main()  # event loop
+  
+  
+  def start_deferred_load(self):
+    '''
+    Load dbs and populate mock menu in idle callbacks, one step per callback.
+    Idle priority is lower than redraw, so the window stays responsive and shows progress.
+    '''
+    steps = self.deferred_load_steps()
+    
+    def on_idle():
+      try:
+        steps.next()
+      except StopIteration:
+        return False  # done, remove idle callback
+      return True # more to do
+      
+    gobject.idle_add(on_idle)
+    
+    
+  def deferred_load_steps(self):
+    ''' Generator: steps of deferred loading. '''
+    yield # Let window show first
+    self.load_db()
+    self.set_load_progress(0.0)
+    yield
+    for fraction in self.models.populate_steps():
+      self.set_load_progress(fraction)
+      yield
+    self.mockmenu.set_model(self.models[self.currentviewname].filteredmodel)
+    self.progressmodel = None
+    self.open_button.set_sensitive(True)
+    # User may have typed a search while loading
+    self.search(self.search_textentry.get_text())
+      
+  
+  def set_load_progress(self, fraction):
+    ''' Show progress of loading in mock menu '''
+    self.progressmodel.set_value(self.progressrow, 0, "Loading menu... %d%%" % int(fraction * 100))
     
     
   '''
@@ -133,6 +210,45 @@ class gimpscripterApp(object):
     print "OK button"
     self.apply()
     
+  def on_open_clicked(self, widget):
+    ''' Let user choose a spec file (saved beside a wrapper when generated) and open it. '''
+    if self.progressmodel is not None:
+      self.message_dialog("You can't open a wrapper plugin until the menu is loaded.")
+      return
+    dialog = gtk.FileChooserDialog("Open wrapper plugin", self.mainwidget, gtk.FILE_CHOOSER_ACTION_OPEN,
+      (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL, gtk.STOCK_OPEN, gtk.RESPONSE_OK))
+    dialog.set_current_folder(os.path.join(gimp.directory, "plug-ins"))
+    spec_filter = gtk.FileFilter()
+    spec_filter.set_name("GimpScripter wrapper plugins")
+    spec_filter.add_pattern("*" + specfile.SPEC_FILE_SUFFIX)
+    dialog.add_filter(spec_filter)
+    response = dialog.run()
+    filepath = dialog.get_filename()
+    dialog.destroy()
+    if response != gtk.RESPONSE_OK:
+      return
+    try:
+      spec = specfile.load(filepath)
+    except (IOError, specfile.SpecFileError), e:
+      param_dialog.warning_dialog(self.mainwidget, "GimpScripter can't open the wrapper plugin.", str(e))
+      return
+    self.open_spec(spec)
+    
+  def open_spec(self, spec):
+    ''' Replace the spec (user's choices so far) with spec, and show it. '''
+    self.destroy_old_parameter_widgets()
+    self.selected_command_index = None # Not capture parameters into the spec being replaced
+    self.is_settings_valid = True
+    self.spec = spec
+    self.name_textentry.set_text(spec.wrapping.menuname)
+    self.undo_combobox.set_active(spec.wrapping.undo_mode)
+    model = self.command_seq_listview.get_model()
+    model.clear()
+    for command in spec.commands.command_list:
+      model.append([command.pathstring])
+    self.prepare_parameter_page(spec.commands, 0)
+    self.set_sensitive_completion()
+    
   def on_buttonCancel_clicked(self, widget):
     ''' TODO confirm'''
     gtk.main_quit()
@@ -161,6 +277,7 @@ class gimpscripterApp(object):
     '''
     self.validate_and_capture_parameters(self.selected_command_index) # Capture parameters for selected command
     self.spec.wrapping.set_menu_name(self.name_textentry.get_text()) # Put final name in  spec
+    self.spec.wrapping.set_undo_mode(self.undo_combobox.get_active())
     print self.spec.commands.param_list
     generate.generate(self.spec)
     self.mainwidget.destroy()
@@ -181,12 +298,24 @@ class gimpscripterApp(object):
   """  
   
   def destroy_old_parameter_widgets(self):
-    ''' Destroy old widgets, really only one, a GtkTable '''
-    if self.parameter_widgets:
-      for widget in self.parameter_widgets:
-        print "Destroy", widget
+    ''' Destroy all parameter widgets, displayed and cached, e.g. when the spec is replaced. '''
+    for widget in self.parameter_widget_cache.values():
+      if widget is not None:
         widget.destroy()
-        self.parameter_widgets.remove(widget)
+    self.parameter_widget_cache.clear()
+    self.parameter_widgets = []
+    
+  def hide_parameter_widgets(self):
+    ''' Hide displayed widgets, really only one, a GtkTable.  They stay cached. '''
+    for widget in self.parameter_widgets:
+      widget.hide()
+    self.parameter_widgets = []
+    
+  def forget_parameter_widget(self, command):
+    ''' Destroy cached parameter widget of command, e.g. when command is removed. '''
+    widget = self.parameter_widget_cache.pop(command, None)
+    if widget is not None:
+      widget.destroy()
     
   def create_parameter_widget(self, pdefs, defaults, toggles):
     ''' 
@@ -213,42 +342,59 @@ class gimpscripterApp(object):
     Its parent and window is the parameter page (a scrolling window child of assistant)
     Index is the index of the newly selected command.
     is_first_time: whether this is a new command, use defaults instead of user-entered values
+    
+    Widgets of a command are built the first time it is displayed, then only hidden and shown:
+    a procedure can have dozens of parameters, too many widgets to build on every click.
     '''
     assert commands # should not get here with empty commands
     
-    if self.selected_command_index is not None: # If parameters for some command are displayed
-        self.validate_and_capture_parameters(self.selected_command_index) # capture displayed parameters
-        self.destroy_old_parameter_widgets()
-        
+    self.release_parameter_page()
     self.selected_command_index = index
-
-    """
-    # Create a set of parameter widgets, one for each command, packed into a vbox.
-    for i in range(0, len(commands)):
-      command = commands.get_command_for(i)
-      print "Param widget for", command.name
-      
-      # Then: commands.param_list.get_nonhidden_pdefs_for(i)
-    """
     
-    pdefs = commands.param_list.get_nonhidden_pdefs_for(index)
-    if pdefs:
-      if is_first_time: # if first time displaying parameters for this command
-        values = commands.param_list.get_nonhidden_defaults_for(index)  # Display defaults
-        toggles = [False for i in range(len(values))]  # Toggles all initially False, not deferred
-      else:
-        # Restore widget to previous appearance when user last viewed it
-        values = commands.param_list.get_nonhidden_values_for(index) # Display values user entered previously
-        toggles = commands.param_list.get_defers_for(index)  # Display previous toggle values
-        print "Len toggles", len(toggles)
-      # Put nonhidden parameters of indexth command into new widget
-      self.parameter_widgets.append(self.create_parameter_widget(pdefs, values, toggles))
+    command = commands.get_command_for(index)
+    if command in self.parameter_widget_cache:
+      # Cached widget shows what user last entered
+      widget = self.parameter_widget_cache[command]
+      if widget is not None:
+        widget.show()
+    else:
+      widget = self.create_parameter_widget_for(commands, index, is_first_time)
+      self.parameter_widget_cache[command] = widget
+    if widget is not None:
+      self.parameter_widgets.append(widget)
     # else no parameters to show
     
     # Must capture parameters before generating in case this is last command and user never touches it
 
 
 
+  def create_parameter_widget_for(self, commands, index, is_first_time):
+    ''' Return new parameter widget for command at index, or None if it has no parameters to show. '''
+    pdefs = commands.param_list.get_nonhidden_pdefs_for(index)
+    if not pdefs:
+      return None
+    if is_first_time: # if first time displaying parameters for this command
+      values = commands.param_list.get_nonhidden_defaults_for(index)  # Display defaults
+      toggles = [False for i in range(len(values))]  # Toggles all initially False, not deferred
+    else:
+      # Restore widget to previous appearance when user last viewed it, e.g. in an opened spec
+      values = commands.param_list.get_nonhidden_values_for(index) # Display values user entered previously
+      toggles = commands.param_list.get_defers_for(index)  # Display previous toggle values
+    # Put nonhidden parameters of indexth command into new widget
+    return self.create_parameter_widget(pdefs, values, toggles)
+
+
+  def release_parameter_page(self):
+    '''
+    If parameters for some command are displayed, capture them and hide their widgets.
+    After, no command is selected: do this before commands change position.
+    '''
+    if self.selected_command_index is not None:
+      self.validate_and_capture_parameters(self.selected_command_index) # capture displayed parameters
+      self.hide_parameter_widgets()
+      self.selected_command_index = None
+
+
   def validate_and_capture_parameters(self, index):
     '''
     Validate user entered parameters and capture to the spec.
@@ -308,6 +454,19 @@ class gimpscripterApp(object):
     self.set_sensitive_completion()
  
  
+  def on_entry2_changed(self, widget):
+    ''' Signal when user changes search text. '''
+    if self.progressmodel is None: # not still loading
+      self.search(widget.get_text())
+      
+  
+  def search(self, pattern):
+    ''' Filter mock menu to items matching pattern. Incremental: cheap per keystroke. '''
+    self.models[self.currentviewname].rebuild(pattern)
+    if pattern:
+      self.mockmenu.expand_all() # show the hits
+ 
+ 
   def on_mockmenu_selection_changed(self, theSelection):
     '''
     Callback for mockmenu to choose a target command.
@@ -327,7 +486,7 @@ class gimpscripterApp(object):
     if path: # if selection was made
       # Alternative: column 1 (hidden?) drives selection (ie is the model value)
       name = model.get_value(path, 1) # column 1 is procname
-      menupath = path_treemodel.get_path_string(model, path)
+      menupath = model.get_value(path, db_treemodel.COLUMN_PATH) # hidden column, filled when loading
     else:
       name = None
       menupath = None
@@ -335,18 +494,22 @@ class gimpscripterApp(object):
     if name:
       try:
         # Every click, add a command
-        # For now, append
-        # TODO insert in position selected in the command list widget
+        # After the command whose parameters are displayed, else append
+        if self.selected_command_index is None:
+          position = len(self.spec.commands)
+        else:
+          position = self.selected_command_index + 1
         command = specification.CommandSpec(name, menupath)
-        self.spec.commands.append(command)
+        self.release_parameter_page() # before positions change
+        self.spec.commands.insert(position, command)
         # Feed it back
-        self.command_seq_listview.get_model().append([menupath])  # tuple of column values
+        self.command_seq_listview.get_model().insert(position, [menupath])  # tuple of column values
         
-        # It is focused in the mock menu.  Unselect anything in the command list.  OR select the newly appended command.
+        # It is focused in the mock menu.  Unselect anything in the command list.  OR select the newly inserted command.
         self.command_seq_listview.get_selection().unselect_all()
         
         # Show parameters, for the first time
-        self.prepare_parameter_page(self.spec.commands, len(self.spec.commands)-1, is_first_time = True)
+        self.prepare_parameter_page(self.spec.commands, position, is_first_time = True)
       except:
         '''
         Certain plugins raise KeyError on parameters e.g. image/colors/map/rearrange on INT8ARRAY
@@ -359,6 +522,25 @@ class gimpscripterApp(object):
         self.set_sensitive_completion() # Possibly allow user to complete
   
   
+  def on_mockmenu_query_tooltip(self, treeview, x, y, keyboard_mode, tooltip):
+    '''
+    Callback for mockmenu tooltip: name and blurb of a leaf.
+    Return whether to show tooltip.
+    '''
+    context = treeview.get_tooltip_context(x, y, keyboard_mode)
+    if not context:
+      return False
+    model, path, iter = context
+    name = model.get_value(iter, 1) # column 1 is procname, empty if not a leaf
+    if not name:
+      return False
+    # Blurb is lazy: a round-trip to Gimp the first time this row is hovered
+    db = self.models[self.currentviewname].viewspec.db
+    tooltip.set_text(name + ": " + db[name].blurb)
+    treeview.set_tooltip_row(tooltip, path)
+    return True
+  
+  
   def on_commands_selection_changed(self, theSelection):
     '''
     Callback for commands list to select a target command.
@@ -374,7 +556,9 @@ class gimpscripterApp(object):
       intpath = model.get_path(path)  # get [int,int] form of path
       index = intpath[0]  # index of theSelection
     else:
-      pass
+      return # e.g. unselected, or list cleared
+    if index == self.selected_command_index:
+      return # already displayed, e.g. selected again after moving it
       
     # unselect in the mock menu
     self.mockmenu.get_selection().unselect_all()
@@ -382,6 +566,49 @@ class gimpscripterApp(object):
     self.prepare_parameter_page(self.spec.commands, index )
      
   
+  def on_buttonUp_clicked(self, widget):
+    ''' Move selected command up one in command list '''
+    self.move_selected_command(-1)
+    
+  def on_buttonDown_clicked(self, widget):
+    ''' Move selected command down one in command list '''
+    self.move_selected_command(1)
+    
+  def move_selected_command(self, offset):
+    ''' Move selected command by offset in command list, and keep it selected. '''
+    index = self.selected_command_index
+    if index is None or not 0 <= index + offset < len(self.spec.commands):
+      return
+    if not self.is_settings_valid:
+      self.message_dialog("You can't move a command while settings are invalid for the current command.")
+      return
+    self.release_parameter_page() # before positions change
+    self.spec.commands.move(index, index + offset)
+    self.prepare_parameter_page(self.spec.commands, index + offset)
+    model = self.command_seq_listview.get_model()
+    model.swap(model.get_iter((index,)), model.get_iter((index + offset,)))
+    self.command_seq_listview.get_selection().select_path((index + offset,))
+    
+  def on_buttonRemove_clicked(self, widget):
+    ''' Remove selected command from command list, and select the command that takes its place. '''
+    index = self.selected_command_index
+    if index is None:
+      return
+    # Don't capture parameters of the removed command, and its invalid settings don't matter.
+    self.hide_parameter_widgets()
+    self.forget_parameter_widget(self.spec.commands.get_command_for(index))
+    self.selected_command_index = None
+    self.is_settings_valid = True
+    self.spec.commands.remove(index)
+    model = self.command_seq_listview.get_model()
+    model.remove(model.get_iter((index,)))
+    if self.spec.commands:
+      index = min(index, len(self.spec.commands) - 1)
+      self.prepare_parameter_page(self.spec.commands, index)
+      self.command_seq_listview.get_selection().select_path((index,))
+    self.set_sensitive_completion()
+  
+  
   ''' Callbacks when user clicks in a treeview.  Return whether to allow selection. '''
      
   def filter_select_menu_item(self, path):
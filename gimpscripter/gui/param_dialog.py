@@ -386,6 +386,12 @@ class GimpParamWidget(object):
   def destroy(self):
     self.table_wid.destroy()
     
+  def show(self):
+    self.table_wid.show()
+    
+  def hide(self):
+    self.table_wid.hide()
+    
   def set_sensitive(self, truth):
     self.table_wid.set_sensitive(truth)
     
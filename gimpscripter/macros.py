@@ -34,6 +34,7 @@ Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 '''
 
 from gimpfu import *  # for PF types
+from gimpscripter.mockmenu.map_procedures import PURE
 
 ''' A macro definition comprises:
 "macro-name" :              # use dash or underbar, usually name matches an entry in map_procedures.py
@@ -41,7 +42,8 @@ from gimpfu import *  # for PF types
   (                          # a tuple of one or more...
     (type, parameterName, desc), ... # ParamDef
   ),
-  "blurb"                      # quoted blurb
+  "blurb",                     # quoted blurb
+  (created, deleted)          # effects on the set of Gimp objects, see map_procedures.procname_to_effects
 )
 
 !!! Note the comma after the first ParamDef is always needed else it is not a tuple!!!
@@ -51,6 +53,7 @@ from gimpfu import *  # for PF types
 !!! Any sequence should have proper indentation (2 spaces) between statements (after a newline) NOT inside a raw string.
 !!! Any procedure names should use underbar, not dash
 !!! Any procedure names should be prefixed with "pdb."
+!!! Macros return nothing, so objects a macro creates are in its effects, found by querying Gimp.
 
 '''
 
@@ -60,29 +63,35 @@ from string import Template
 macros = { \
 "macro-channel-new" : ("pdb.gimp_image_add_channel(ephemera.top(PF_IMAGE), pdb.gimp_channel_new_from_component(ephemera.top(PF_IMAGE), 0, $channelName ), 1)", # macro text
 ((PF_STRING, 'channelName', 'The name to give to the channel'), ),  # macro pdef tuple
-"Create new channel and add it to image."), # macro blurb
+"Create new channel and add it to image.", # macro blurb
+((PF_CHANNEL,), ())), # macro effects
 "macro-layer-copy" : ("pdb.gimp_layer_copy(ephemera.top(PF_LAYER), $addAlpha)\n  pdb.gimp_displays_flush()", ((PF_INT32, 'addAlpha', 'Add an alpha channel?'), ),
-"Copy layer and add it to image BROKEN?"),
+"Copy layer and add it to image BROKEN?",
+((PF_LAYER,), ())),
 # Add layer from visible then nested add to image.  User must name the layer
 "macro-layer-new-visible" : ("pdb.gimp_image_add_layer(ephemera.top(PF_IMAGE), pdb.gimp_layer_new_from_visible(ephemera.top(PF_IMAGE), ephemera.top(PF_IMAGE), $layerName), 0)", 
 ((PF_STRING, 'layerName', 'Layer name'), ),
-"Create layer from visible and add it to image on top."),
+"Create layer from visible and add it to image on top.",
+((PF_LAYER,), ())),
 # I also tried to lookup the layer later, but it is not in ephemera unless it is attached to image.
 # Add layer blank then nested add to image.  User must name the layer.
 # Note the mode comes from the active layer, not image?  Opacity 100, combination mode 0 for normal
 "macro-layer-new-blank-attached" : ("pdb.gimp_image_add_layer(ephemera.top(PF_IMAGE), pdb.gimp_layer_new(ephemera.top(PF_IMAGE), ephemera.top(PF_IMAGE).width, ephemera.top(PF_IMAGE).height, ephemera.top(PF_LAYER).mode, $layerName, 100, 0), 0)", 
 ((PF_STRING, 'layerName', 'Layer name'), ),
-"Create blank layer like the image and add it to image on top."),
+"Create blank layer like the image and add it to image on top.",
+((PF_LAYER,), ())),
 # New display then flush. Justification: rarely a reason to create a  display without flushing it.
 "macro-display-new" : ("pdb.gimp_display_new(ephemera.top(PF_IMAGE))\n  pdb.gimp_displays_flush()", 
 (), # Empty pdefs
-"Create new display from current image and flush it so user can see it."),
+"Create new display from current image and flush it so user can see it.",
+PURE),
 # Context set brush with chooser.  
 # !!! This upconverts the parameter type:
 # at generation time and runtime, author-user or user sees a brushChooser widget instead of a stringEntry
 "macro-context-choose-brush" : ("pdb.gimp_context_set_brush($brush)", 
 ((PF_BRUSH, 'brush', 'Brush'), ),
-"Create layer from visible and add it to image on top."),
+"Create layer from visible and add it to image on top.",
+PURE),
 }
 
 """
@@ -115,6 +124,13 @@ def get_pdefs_for(name):
 
 def get_blurb(name):
   return macros[name][2]
+
+def get_effects(name):
+  return macros[name][3]
+
+def uses_ephemera(name):
+  ''' Does macro refer to ephemera (the runtime), e.g. ephemera.top(PF_IMAGE)? '''
+  return "ephemera." in macros[name][0]
   
 def template_for(name):
   ''' Return the template for macro name '''
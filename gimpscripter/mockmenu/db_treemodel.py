@@ -34,6 +34,8 @@ import gtk
 
 import types
 import string # for maketrans
+import locale # for collation order of rows
+import operator # for attrgetter
 
 # our own sub module, must be installed alongside
 from gimpscripter.mockmenu import path_treemodel  # load tree by set of paths
@@ -47,6 +49,98 @@ VIEW_TYPE_SLASHPATH = "SlashPath" # hierarchal view on attribute having values t
 VIEW_TYPE_CATEGORY = "Category" # hierarchal view on attribute having values that name sets of types
 # TBD use these
 
+# Count of db items per step, when populating a model in steps.
+POPULATE_STEP_SIZE = 200
+
+# Columns of all treemodels.  See also path_treemodel.py
+COLUMN_LABEL = 0  # displayed
+COLUMN_NAME = 1   # hidden, name (key in db) of a leaf, empty for branches
+COLUMN_PATH = 2   # hidden, slash delimited path of a leaf (labels of it and its ancestors), empty for branches
+COLUMN_VISIBLE = 3  # hidden, whether row passes filter
+COLUMN_VISIBLE_COUNT = 4 # hidden, count of visible leaves in the subtree rooted at the row
+
+# GTK_TREE_SORTABLE_UNSORTED_SORT_COLUMN_ID, not wrapped by pygtk
+UNSORTED_SORT_COLUMN_ID = -2
+
+# Sort key of labels, approximating the collation GTK uses to sort a str column (g_utf8_collate)
+# GTK has already set the locale.
+SORT_KEY = locale.strxfrm
+
+
+class FilterDict(dict):
+  '''
+  Boolean valued dictionary with same keys as a db: whether an item passes a search filter.
+  
+  Filtering is incremental: filter() returns keys whose value changed,
+  so views need only update rows for those keys.
+  
+  attrnames: attributes of items in the db (besides their key) to search in.
+  index: optional searchindex.SearchIndex over the db.
+    If given, search uses the index (and the index decides what text is searched),
+    else search scans the db matching the key and attrnames.
+  '''
+  def __init__(self, attrnames=(), index=None):
+    dict.__init__(self)
+    self.attrnames = attrnames
+    self.index = index
+    self.pattern = ""
+    self.matched = None # set of keys matching pattern, None means all
+    
+  def filter(self, db, pattern):
+    '''
+    Set self to whether each item of db matches pattern (case insensitive substring.)
+    Return list of keys whose value changed.
+    '''
+    pattern = pattern.lower()
+    if pattern == self.pattern:
+      return []
+    if self.index is not None:
+      return self._filter_indexed(db, pattern)
+    if self.pattern in pattern:
+      # Narrowing: items not matching the old pattern can't match the new one.
+      candidates = [name for name, truth in self.iteritems() if truth]
+    else:
+      candidates = db.keys()
+    changed = []
+    for name in candidates:
+      truth = self._matches(name, db[name], pattern)
+      if truth != self.get(name, True):
+        dict.__setitem__(self, name, truth)
+        changed.append(name)
+    self.pattern = pattern
+    return changed
+    
+  def _filter_indexed(self, db, pattern):
+    '''
+    Filter using the index.
+    Only keys in the symmetric difference of the old and new matches can change.
+    '''
+    if pattern:
+      matched = self.index.search(pattern)
+    else:
+      matched = None # all
+    if matched is None or self.matched is None:
+      candidates = db.iterkeys()
+    else:
+      candidates = self.matched ^ matched
+    changed = []
+    for name in candidates:
+      truth = matched is None or name in matched
+      if truth != self.get(name, True):
+        dict.__setitem__(self, name, truth)
+        changed.append(name)
+    self.pattern = pattern
+    self.matched = matched
+    return changed
+    
+  def _matches(self, name, thing, pattern):
+    if pattern in name.lower():
+      return True
+    for attrname in self.attrnames:
+      if pattern in getattr(thing, attrname).lower():
+        return True
+    return False
+
 
 class ViewSpec():
   '''
@@ -57,6 +151,9 @@ class ViewSpec():
     # TBD sanity checking, types are StringType and DictType
     self.viewname = viewname  # Displayed name of the view
     self.attrname = attrname  # Attribute of objects in db.  Attribute values populate treemodel of treeview.
+    # Function of an object in the db returning value of attrname (compiled once, called per row.)
+    # None if no attrname: the name itself is the value.
+    self.getter = attrname and operator.attrgetter(attrname) or None
     self.type = attrtype  # Type of the attribute (and thus of the treeview)
     self.typedict = typedict  # Dictionary of unique values in the attribute, maps to a string for display in treeview.
     self.db = db  # Dictionary of objects to be browsed/inspected
@@ -68,25 +165,69 @@ class MyModel():
   Wrapper for treemodel with other attributes: 
     a spec for a view
     a dict for filtering (in the viewspec)
+    
+  The treemodel is built once, with rows for all items in the db.
+  Searching only changes the visible column of rows whose visibility changed.
+  A treeview should show filteredmodel, which hides rows that are not visible.
+  Since populating replaces filteredmodel, get it after populating.
   '''
   def __init__(self, name, viewspec):
-    # all treemodels have the same structure: three columns of type string
-    self.treemodel = gtk.TreeStore(str, str, str)
-    # all sorted same way
-    self.treemodel.set_sort_column_id(0, gtk.SORT_ASCENDING)
+    # all treemodels have the same structure: three columns of type string, then visibility columns
+    self.treemodel = gtk.TreeStore(str, str, str, bool, int)
+    # Not sorted until populated, see bulk_load_steps()
+    self.filteredmodel = self._new_filteredmodel()
     self.viewspec = viewspec
+    self.leaves = {}  # name => list of treeiters of leaf rows for name.  TreeStore iters persist.
+    
+  def _new_filteredmodel(self):
+    filteredmodel = self.treemodel.filter_new()
+    filteredmodel.set_visible_column(COLUMN_VISIBLE)
+    return filteredmodel
+    
+  def populate(self, treeview=None):
+    ''' Populate in bulk, in one step.  See bulk_load_steps. '''
+    for count in self.bulk_load_steps(treeview):
+      pass
+    
+  def bulk_load_steps(self, treeview=None):
+    '''
+    Generator: populate in bulk, yielding count of db items done after each step.
+    
+    Performance Note: a sorted treestore re-sorts on every append,
+    and an attached filter and treeview handle a signal for every row inserted.
+    So while loading:
+    - detach the treeview (if it shows this model)
+    - disable sorting
+    - leave the old filter behind (a new one is made after loading)
+    Rows are appended in sorted order (sorted in Python), so turning sorting back on moves no rows.
+    '''
+    is_attached = treeview is not None and treeview.get_model() is self.filteredmodel
+    if is_attached:
+      treeview.set_model(None)
+    self.treemodel.set_sort_column_id(UNSORTED_SORT_COLUMN_ID, gtk.SORT_ASCENDING)
+    self.filteredmodel = None
+    
+    for count in _populate_model_steps(self):
+      yield count
+    
+    # all sorted same way
+    self.treemodel.set_sort_column_id(COLUMN_LABEL, gtk.SORT_ASCENDING)
+    self.filteredmodel = self._new_filteredmodel()
+    if is_attached:
+      treeview.set_model(self.filteredmodel)
     
   def rebuild(self, pattern):
     '''
     Search string changed.
-    Rebuild filterdict and repopulate model.
-  
-    Performance Note: No special measures (disconnecting treeview from treemodel, or setting sort funct to None)
-    since this seems fast enough.
+    Refilter filterdict and update visibility of rows that changed.
+    
+    Performance Note: cost is proportional to rows whose visibility changed (times depth),
+    not to the size of the db.
     I tried treeview fixed_height_mode yes on row height, it didn't work.
     '''
-    self.viewspec.filterdict.filter(self.viewspec.db, pattern)
-    _populateModel(self)   
+    for name in self.viewspec.filterdict.filter(self.viewspec.db, pattern):
+      for leaf in self.leaves.get(name, ()):
+        _set_leaf_visible(self.treemodel, leaf, self.viewspec.filterdict[name])
 
   def len(self):
     ''' The filtered length: count leaf rows: what user can select '''
@@ -98,9 +239,12 @@ class TreeModelDictionary(dict):
   '''
   A read only dictionary of gtk.treemodels
   Initializes itself with data passed in a dictofviews and you can't setitem.
+  
+  If not is_populate, the models are created empty,
+  e.g. because the db is not loaded yet: call populate_steps() later.
   '''
   
-  def __init__(self, dictofviews):
+  def __init__(self, dictofviews, is_populate=True):
     
     # Base class init
     dict.__init__(self)
@@ -114,7 +258,8 @@ class TreeModelDictionary(dict):
     '''
     for key, viewspec in dictofviews.iteritems():
       model = MyModel(key, viewspec)
-      _populateModel(model)
+      if is_populate:
+        model.populate()
       # put model in a dictionary by name of model
       dict.__setitem__(self, key, model)
 
@@ -122,6 +267,19 @@ class TreeModelDictionary(dict):
     
   def __setitem__(self):
     raise RuntimeError, "TreeModelDictionary is read-only"
+    
+  def populate_steps(self, treeview=None):
+    '''
+    Generator: populate all models in steps, yielding fraction done (0.0 to 1.0) after each step.
+    Lets a GUI populate in the background (e.g. in idle callbacks) and show progress.
+    Treeview, if given, is detached while the model it shows is populated.
+    '''
+    total = sum([len(model.viewspec.db) for model in self.itervalues()])
+    done = 0
+    for model in self.itervalues():
+      for count in model.bulk_load_steps(treeview):
+        yield float(done + count) / max(total, 1)
+      done += len(model.viewspec.db)
 
 
 def _populateModel(model):
@@ -130,12 +288,14 @@ def _populateModel(model):
   These type names are hardcoded, used in the viewspec.
   This understands which types use which building method.
   Future: some types might need parsing into slashed paths during building.
+  
+  Rows are built for all items in the db, whether or not they pass the filter.
   '''
   # Model is empty, put in a single row telling empty.
-  if not model.len():
+  if not model.viewspec.db:
     model.treemodel.clear()
-    db = model.viewspec.db
-    model.treemodel.append(None, ["<None>", ""])   # second, hidden column empty so not clickable
+    model.leaves = {}
+    model.treemodel.append(None, ["<None>", "", "", True, 0])   # second, hidden column empty so not clickable
     return
     
   if model.viewspec.type == "List":
@@ -148,6 +308,61 @@ def _populateModel(model):
     _build_type_tree(model)  
   else:
     raise RuntimeError, "Unknown model type: " + model.viewspec.type
+  
+
+def _index_leaves(model):
+  '''
+  After building, index leaf rows by name and set visibility columns from the filterdict.
+  One pass over the rows.
+  '''
+  model.leaves = {}
+  _index_subtree(model, model.treemodel.get_iter_first())
+
+
+def _index_subtree(model, iter):
+  '''
+  Index leaves and set visibility of rows from iter and its siblings, and their subtrees.
+  Return count of visible leaves.
+  '''
+  treestore = model.treemodel
+  total = 0
+  while iter:
+    count = _index_subtree(model, treestore.iter_children(iter))
+    name = treestore.get_value(iter, COLUMN_NAME)
+    if name: # a leaf
+      model.leaves.setdefault(name, []).append(iter)
+      if model.viewspec.filterdict.get(name, True):
+        count += 1
+    treestore.set(iter, COLUMN_VISIBLE, count > 0, COLUMN_VISIBLE_COUNT, count)
+    total += count
+    iter = treestore.iter_next(iter)
+  return total
+
+
+def _set_leaf_visible(treestore, leaf, truth):
+  '''
+  Change visibility of leaf row, updating visible counts of it and its ancestors.
+  Ancestors are visible while they have any visible leaf.
+  '''
+  delta = truth and 1 or -1
+  iter = leaf
+  while iter:
+    count = treestore.get_value(iter, COLUMN_VISIBLE_COUNT) + delta
+    treestore.set(iter, COLUMN_VISIBLE, count > 0, COLUMN_VISIBLE_COUNT, count)
+    iter = treestore.iter_parent(iter)
+
+
+def _populate_model_steps(model):
+  '''
+  Generator: populate model in steps, yielding count of db items done after each step.
+  Only path trees (the large ones) are built in many steps, other types in one step.
+  '''
+  if model.viewspec.type == "SlashPath" and model.viewspec.db:
+    for count in _build_path_tree_steps(model):
+      yield count
+  else:
+    _populateModel(model)
+    yield len(model.viewspec.db)
 
 
 def _build_list_tree(model):
@@ -158,10 +373,10 @@ def _build_list_tree(model):
   '''
   model.treemodel.clear()
   db = model.viewspec.db
-  for name in db.keys():
-    if model.viewspec.filterdict[name]:  # is filtered out by search string?
-      # append to treemodel in order, no parents
-      piter = model.treemodel.append(None, [name, name])   # second, hidden column non-empty so clickable
+  for name in sorted(db.keys(), key=SORT_KEY):
+    # append to treemodel in order, no parents
+    piter = model.treemodel.append(None, [name, name, name, True, 0])   # second, hidden column non-empty so clickable
+  _index_leaves(model)
 
 
   
@@ -205,20 +420,20 @@ def _build_type_tree(model):
   # add parent rows to treemodel, remembering the tree path.
   # treerowreferences are persistent, treeiters and treepaths are not, so convert back and forth
   # do parents first, then children, so can raise exceptions for missing parents.
-  for parent in model.viewspec.typedict.keys():  # for each unique value of the type
+  # In order of displayed type, then name, see MyModel.bulk_load_steps()
+  typedict = model.viewspec.typedict
+  for parent in sorted(typedict.keys(), key=lambda parent: SORT_KEY(typedict[parent])):  # for each unique value of the type
     # Parent means parent row in the treemodel.
     # Translate to friendly displayed string, different from type strings in the db
     displayedtype = model.viewspec.typedict[parent]
-    piter = model.treemodel.append(None, [displayedtype, ""])   # second, hidden column empty
+    piter = model.treemodel.append(None, [displayedtype, "", "", True, 0])   # second, hidden column empty
     row = gtk.TreeRowReference(model.treemodel, model.treemodel.get_path(piter))
     type_to_row[parent] = row
   # add child rows to treemodel, looking up parent tree path
-  for name, thing in db.iteritems(): # EG key is name, value is an object with an attribute that is a type.
-    if not model.viewspec.filterdict[name]:  # is filtered out by search string?
-      continue
+  for name in sorted(db.keys(), key=SORT_KEY): # EG key is name, value is an object with an attribute that is a type.
     # Get the value of the thing's attribute.  The value is 'of the type'.
     # The name of the attribute is given in the viewspec for the model.
-    value = eval("thing." + model.viewspec.attrname)
+    value = model.viewspec.getter(db[name])
     # !!! Value can be a list of type names (a category)
     if model.viewspec.type == "Category":
       # For now, categories cannot be encoded, must be str
@@ -232,16 +447,17 @@ def _build_type_tree(model):
         try:
           parentrow = type_to_row[avalue]
           piter = model.treemodel.get_iter(parentrow.get_path())
-          model.treemodel.append(piter, [name, name]) # second use is as ID of procedure   
+          model.treemodel.append(piter, [name, name, typedict[avalue] + "/" + name, True, 0]) # second use is as ID of procedure   
         except KeyError:
           print "Key error: type not found in viewspec.typedict: ", avalue
     else: # viewtype is Type. 
       try:
         parentrow = type_to_row[value]
         piter = model.treemodel.get_iter(parentrow.get_path())
-        model.treemodel.append(piter, [name, name]) # second use is as ID of procedure   
+        model.treemodel.append(piter, [name, name, typedict[value] + "/" + name, True, 0]) # second use is as ID of procedure   
       except KeyError:
         print "Key error: type not found in viewspec.typedict"
+  _index_leaves(model)
  
 
         
@@ -288,33 +504,122 @@ def _build_path_tree(model):
   tree is given as a db of things having paths
   thing names installed at the path tree leaves (alternative).
   '''
+  for step in _build_path_tree_steps(model):
+    pass
+    
+
+def _build_path_tree_steps(model):
+  '''
+  Generator that builds path tree, yielding count of db items done every POPULATE_STEP_SIZE items.
+  
+  Builds in two phases:
+  - a pure Python tree of paths (fast, hash lookup per path item)
+  - load the treestore in one pass, one append per row (yields during this phase)
+  '''
   print "Building path tree model"
   model.treemodel.clear()
   db = model.viewspec.db
   count = 0
+  tree = path_treemodel.PathTree()
   
   # For each (name, thing) in the db
   # Load tree from db[name].attrname.menupath
+  getter = model.viewspec.getter
   for name, thing in db.iteritems():
-    if model.viewspec.filterdict[name]:  # is filtered in by search string?
-      if model.viewspec.attrname: # names are unique and attribute gives a path
-        try:
-          pathvalue = eval("thing." + model.viewspec.attrname)
-        except:
-          # Likely source of configuration errors, print more info.
-          print "Inspect db must contain objects having repr method and attribute holding a path" 
-          raise
-      else:
-        pathvalue = name  # the name itself is a path 
-      assert pathvalue != ""  # !!! Each must have a path, even if just <Unknown>
-      
-      # Add thing to the treemodel
-      # Formerly,we just adding the name of the thing.
-      # Now we pass the thing along, and extract thing.name and more attributes, later
-      if not path_treemodel.add_path(model.treemodel, thing, pathvalue):
-        print "Duplicate path:", pathvalue, "to ID:", name
-        # raise RuntimeError
-      else:
-        count += 1
+    # All things, whether or not filtered in by search string.  Visibility is set when loading.
+    if getter: # names are unique and attribute gives a path
+      try:
+        pathvalue = getter(thing)
+      except:
+        # Likely source of configuration errors, print more info.
+        print "Inspect db must contain objects having repr method and attribute holding a path" 
+        raise
+    else:
+      pathvalue = name  # the name itself is a path 
+    assert pathvalue != ""  # !!! Each must have a path, even if just <Unknown>
+    
+    # Add thing to the tree
+    # Formerly,we just adding the name of the thing.
+    # Now we pass the thing along, and extract thing.name and more attributes, later
+    if not tree.add_path(thing, pathvalue):
+      print "Duplicate path:", pathvalue, "to ID:", name
+      # raise RuntimeError
+    else:
+      count += 1
   print "Count path tree model: ", count
-
+  
+  # Progress is reported in db items, so scale rows loaded
+  model.leaves = {}
+  scale = float(len(db)) / max(tree.rowcount, 1)
+  for rows in tree.load_steps(model.treemodel, POPULATE_STEP_SIZE,
+      lambda name: model.viewspec.filterdict.get(name, True), model.leaves, SORT_KEY):
+    yield int(rows * scale)
+
+
+
+if __name__ == "__main__":
+  # Benchmark: populating a path tree model in bulk, versus sorted, filtered, and viewed while appending.
+  # And getting attribute values by precompiled getter, versus eval.
+  # Usage: python db_treemodel.py [count of procedures]
+  import sys
+  import time
+  import random
+  
+  class Thing(object):
+    def __init__(self, name, menupath):
+      self.name = name
+      self.menupath = menupath
+  
+  def synthetic_db(count):
+    ''' Db of count things with menu paths of realistic shape: a few menus, many submenus. '''
+    random.seed(0)
+    db = {}
+    for i in range(count):
+      name = "plug-in-synthetic-%d" % i
+      path = "<Image>/Menu%d/Submenu%d/Item %d" % (random.randint(0, 10), random.randint(0, 40), i)
+      db[name] = Thing(name, path)
+    return db
+  
+  def populate_current(viewspec):
+    ''' As before bulk loading: sorting on, filter and treeview attached, appending in hash order. '''
+    model = MyModel("current", viewspec)
+    model.treemodel.set_sort_column_id(COLUMN_LABEL, gtk.SORT_ASCENDING)
+    treeview = gtk.TreeView(model.filteredmodel)
+    tree = path_treemodel.PathTree()
+    for name, thing in viewspec.db.iteritems():
+      tree.add_path(thing, thing.menupath)
+    tree.load(model.treemodel, None, model.leaves)
+    return model
+    
+  def populate_bulk(viewspec):
+    model = MyModel("bulk", viewspec)
+    treeview = gtk.TreeView(model.filteredmodel)
+    model.populate(treeview)
+    return model
+    
+  def populate_bulk_eval(viewspec):
+    ''' As bulk, but getting attribute values by eval of an expression per row, as before ViewSpec.getter '''
+    attrname = viewspec.attrname
+    viewspec.getter = lambda thing: eval("thing." + attrname)
+    try:
+      return populate_bulk(viewspec)
+    finally:
+      viewspec.getter = operator.attrgetter(attrname)
+  
+  count = len(sys.argv) > 1 and int(sys.argv[1]) or 5000
+  db = synthetic_db(count)
+  viewspec = ViewSpec("Benchmark", "menupath", "SlashPath", None, db, FilterDict(("menupath",)))
+  for populate in (populate_current, populate_bulk_eval, populate_bulk):
+    start = time.time()
+    model = populate(viewspec)
+    print "%s: %d procedures, %d leaf rows, %.3f seconds" % (populate.__name__, count,
+      len(model.leaves), time.time() - start)
+  
+  # Accessor alone, without GTK costs
+  things = db.values()
+  for accessor in (lambda thing: eval("thing.menupath"), viewspec.getter):
+    start = time.time()
+    for thing in things:
+      accessor(thing)
+    print "accessor %s: %d procedures, %.4f seconds" % (accessor is viewspec.getter and "attrgetter" or "eval",
+      count, time.time() - start)
@@ -41,6 +41,8 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 '''
 
+from gimpfu import PF_IMAGE, PF_LAYER, PF_CHANNEL, PF_VECTORS  # for effects
+
 
 menu_to_procname = { \
 "Layer/Transform/Offset" : "gimp-drawable-offset",
@@ -162,3 +164,106 @@ menu_to_procname = { \
 "Path/Export" : "gimp-vectors-export-to-file",
 }
 
+
+
+'''
+Effects of commands on the set of Gimp objects (images, layers, channels, vectors.)
+
+So a generated wrapper queries Gimp for created and deleted objects (ephemera.update())
+only after commands that can change the set, unbeknownst to the wrapper.
+Created objects a procedure returns, the wrapper knows (see generate.make_push_string.)
+
+procname => (created, deleted), each a tuple of types (PF_foo) of objects.
+Covers the procedures above, and those that macros call.
+Adding an item to an image counts as creating it: the wrapper learns its image by querying Gimp.
+Displays are not objects here: the runtime doesn't track them.
+Procedures not in this table, e.g. plugins and scripts, have unknown effects.
+Macros declare their effects in macros.py.
+'''
+PURE = ((), ()) # changes no object, e.g. a filter or a selection op
+
+ALL_TYPES = (PF_IMAGE, PF_LAYER, PF_CHANNEL, PF_VECTORS)
+
+procname_to_effects = { \
+"gimp-drawable-offset" : PURE,
+"gimp-edit-clear" : PURE,
+"gimp-edit-copy" : PURE,
+"gimp-edit-copy-visible" : PURE,
+"gimp-edit-cut" : PURE,
+"gimp-edit-paste" : ((PF_LAYER,), ()),  # floating selection
+"gimp-edit-paste-as-new" : ((PF_IMAGE, PF_LAYER), ()),
+"gimp-edit-fill" : PURE,
+"gimp-edit-named-copy" : PURE,
+"gimp-edit-named-copy-visible" : PURE,
+"gimp-edit-named-cut" : PURE,
+"gimp-edit-named-paste" : ((PF_LAYER,), ()),  # floating selection
+"gimp-edit-stroke-vectors" : PURE,
+"gimp-file-save" : PURE,
+"gimp-image-convert-grayscale" : PURE,
+"gimp-image-convert-indexed" : PURE,
+"gimp-image-convert-rgb" : PURE,
+"gimp-image-crop" : PURE,
+"gimp-image-new" : ((PF_IMAGE,), ()),
+"gimp-image-duplicate" : (ALL_TYPES, ()),
+"gimp-display-new" : PURE,
+"gimp-image-delete" : ((), ALL_TYPES),
+"gimp-image-flatten" : ((PF_LAYER,), (PF_LAYER,)),
+"gimp-image-resize" : PURE,
+"gimp-image-resize-to-layers" : PURE,
+"gimp-image-scale" : PURE,
+"gimp-image-flip" : PURE,
+"gimp-image-rotate" : PURE,
+"gimp-image-add-layer" : ((PF_LAYER,), ()),
+"gimp-image-add-channel" : ((PF_CHANNEL,), ()),
+"gimp-threshold" : PURE,
+"plug-in-threshold-alpha" : PURE,
+"gimp-levels" : PURE,
+"gimp-levels-stretch" : PURE,
+"gimp-layer-new" : ((PF_LAYER,), ()),
+"gimp-image-remove-layer" : ((), (PF_LAYER,)),
+"gimp-layer-resize" : PURE,
+"gimp-layer-resize-to-image-size" : PURE,
+"gimp-layer-scale" : PURE,
+"gimp-layer-set-mode" : PURE,
+"gimp-layer-translate" : PURE,
+"gimp-layer-add-alpha" : PURE,
+"gimp-layer-flatten" : PURE,
+"gimp-layer-copy" : ((PF_LAYER,), ()),
+"gimp-layer-new-from-drawable" : ((PF_LAYER,), ()),
+"gimp-layer-new-from-visible" : ((PF_LAYER,), ()),
+"gimp-image-set-active-layer" : PURE,
+"gimp-image-get-active-layer" : PURE,
+"gimp-floating-sel-anchor" : ((), (PF_LAYER,)),
+"gimp-selection-all" : PURE,
+"gimp-selection-float" : ((PF_LAYER,), ()),  # floating selection
+"gimp-selection-invert" : PURE,
+"gimp-selection-none" : PURE,
+"gimp-by-color-select" : PURE,
+"gimp-selection-border" : PURE,
+"gimp-selection-feather" : PURE,
+"gimp-selection-grow" : PURE,
+"gimp-selection-sharpen" : PURE,
+"gimp-selection-shrink" : PURE,
+"gimp-selection-save" : ((PF_CHANNEL,), ()),
+"gimp-vectors-to-selection" : PURE,
+"plug-in-sel2path" : ((PF_VECTORS,), ()),
+"gimp-selection-load" : PURE,
+"gimp-drawable-transform-flip-simple" : ((PF_LAYER,), ()),  # floating selection, if a selection
+"gimp-drawable-transform-rotate-simple" : ((PF_LAYER,), ()),  # ditto
+"gimp-drawable-fill" : PURE,
+"gimp-context-pop" : PURE,
+"gimp-context-push" : PURE,
+"gimp-context-set-foreground" : PURE,
+"gimp-context-set-brush" : PURE,
+"gimp-channel-new" : ((PF_CHANNEL,), ()),
+"gimp-channel-new-from-component" : ((PF_CHANNEL,), ()),
+"gimp-image-remove_channel" : ((), (PF_CHANNEL,)),
+"gimp-channel-copy" : ((PF_CHANNEL,), ()),
+"gimp-image-set-active-channel" : PURE,
+"gimp-displays-flush" : PURE,
+"gimp-path-delete" : ((), (PF_VECTORS,)),
+"gimp-image-remove-vectors" : ((), (PF_VECTORS,)),
+"gimp-vectors-copy" : ((PF_VECTORS,), ()),
+"gimp-vectors-import-from-file" : ((PF_VECTORS,), ()),  # returns IDs, not objects
+"gimp-vectors-export-to-file" : PURE,
+}
@@ -19,6 +19,9 @@ That is, the path is user strings, but the ID is internal.
 If your app doesn't make a distinction, just redundantly use the last item in path for leaf value.
 This does NOT allow multiple rows with the same path, and different leaf values.
 Column two might well be hidden from user view.
+Columns three and four (visible, count of visible leaves) are for filtering.
+
+Paths are first built into a pure Python tree (PathTree), then loaded into the treestore in one pass.
 
 Copyright 2010  Lloyd Konneker
 
@@ -66,117 +69,187 @@ import warnings
 # for any paths that are not known
 UNKNOWN_PATH_STRING = "<Unknown>"
 
-def add_path(model, leaf, path):
+
+class _PathNode(object):
   '''
-  Add path to treestore, if not already there.
-  Here, the path is a slash delimited string.
-  Leaf is an object to added.
-  Leaf must have a name attribute.
-  Returns True if path was added, False if already exists.
+  Node of a PathTree: one path item.
+  leaf: object the path leads to, or None for a branch.
+  children: path item => _PathNode
+  unknown_leaves: more leaves lacking a meaningful path, only under the UNKNOWN_PATH_STRING node.
+  visible_count: count of visible leaves in subtree, computed just before loading.
   '''
-  # print leaf, path
-  items = path.split('/') # parse path into items
-  if len(items) < 1:
-    warnings.warn("Empty path for leaf " + str(leaf))
-    return False
-  # Sanity checking for "//" in path
-  for item in items:
-    if not item:
-      warnings.warn("Empty submenu in path: %s" % path)
-  # In beginning, don't have a parent.
-  return __add_path_from_node(model, None, items, leaf)
+  __slots__ = ("leaf", "children", "unknown_leaves", "visible_count")
+  
+  def __init__(self):
+    self.leaf = None
+    self.children = {}
+    self.unknown_leaves = []
+    self.visible_count = 0
 
 
-def get_path_string(model, iter):
-  ''' Get a slash delimited string for a path given by iter, a treeIter. '''
-  iter_string = model.get_string_from_iter(iter)
-  node_strings = iter_string.split(':')
-  slashpath = ""
-  pathstring = ""
-  for node in node_strings:
-    pathstring += node
-    path = model.get_iter_from_string(pathstring)
-    node_label = model.get_value(path, 0)
-    slashpath += node_label
-    pathstring += ':'
-    slashpath += '/'
-  slashpath = slashpath[0:len(slashpath)-1] # elide last slash
-  return slashpath
-
-"""
-def __model_append(node, values):
-  ''' Put a row in the model. This hides the number and type of columns we are adding'''
-  in progress refactoring
-"""
-  
-def __add_path_from_node(model, parent, pathitems, leaf):
+class PathTree(object):
   '''
-  Add path below parent, if not already there.
-  This is private, recursive.
-  Parent can be None
-  Path is a list of items, not a string.
-  Leaf is object to add as leaf.
+  Tree of paths built in pure Python (nested dictionaries), then loaded into a treestore in one pass.
+  
+  Finding a child by path item is a hash lookup,
+  instead of iterating siblings in the treestore through the GTK C boundary.
+  So building is linear in the count of paths, and loading costs one append per row.
   '''
-  if not parent:  # first call in recursion
-    iternode = model.get_iter_first()
-  else:
-    iternode = model.iter_children(parent)
-  while iternode:
-    if pathitems[0] == model.get_value(iternode, column=0): # if match
-      if len(pathitems) <= 1:
-        # Found the complete path
-        if pathitems[0] == UNKNOWN_PATH_STRING : # if lacking a meaningful path
-          # New child here (under <None or Unknow> at top level.)  
-          # Note this makes the treeview leaves appear to user as two kinds:
-          # 1) real leaf path items, 2) and names of things without path
-          model.append(iternode, [leaf.name, leaf.name, leaf.blurb])
-          return True
-        elif model.get_value(iternode, 1) != leaf.name: # column 2
-          # This is a collision, two different things want the same path
-          # TBD print a warning only if the viewspec specifies single occupancy
-          print "Differing leaf names for same path:", leaf.name, ":", model.get_value(iternode, 1)
-          return False
+  def __init__(self):
+    self.root = _PathNode()
+    self.rowcount = 0 # count of rows that load() will append
+    
+  def add_path(self, leaf, path):
+    '''
+    Add path to tree, if not already there.
+    Here, the path is a slash delimited string.
+    Leaf is an object to added.
+    Leaf must have a name attribute.
+    Returns True if path was added, False if already exists.
+    '''
+    items = path.split('/') # parse path into items
+    if len(items) < 1:
+      warnings.warn("Empty path for leaf " + str(leaf))
+      return False
+    # Sanity checking for "//" in path
+    for item in items:
+      if not item:
+        warnings.warn("Empty submenu in path: %s" % path)
+    
+    node = self.root
+    for item in items[:-1]:
+      child = node.children.get(item)
+      if child is None:
+        child = node.children[item] = _PathNode()
+        self.rowcount += 1
+      node = child
+    
+    item = items[-1]
+    child = node.children.get(item)
+    if child is None:
+      # New path. Leaf value goes in hidden column of last row.
+      child = node.children[item] = _PathNode()
+      child.leaf = leaf
+      self.rowcount += 1
+      return True
+    # Found the complete path
+    if item == UNKNOWN_PATH_STRING : # if lacking a meaningful path
+      # New child here (under <None or Unknow> at top level.)  
+      # Note this makes the treeview leaves appear to user as two kinds:
+      # 1) real leaf path items, 2) and names of things without path
+      child.unknown_leaves.append(leaf)
+      self.rowcount += 1
+      return True
+    elif child.leaf is None or child.leaf.name != leaf.name:
+      # This is a collision, two different things want the same path (or a path is a prefix of another)
+      # TBD print a warning only if the viewspec specifies single occupancy
+      print "Differing leaf names for same path:", leaf.name, ":", child.leaf and child.leaf.name
+      return False
+    else:
+      # This is a duplicate, the same named thing wants a path item twice.
+      # Could be a different version?
+      # Whether this is unexpected depends on the conceptual model of things,
+      # and on enforcement earlier.
+      print "Same leaf value requested path twice", str(leaf)
+      return False
+  
+  
+  def load(self, model, is_visible=None, leaves=None, sort_key=None):
+    ''' Append all rows to empty treestore model. See load_steps. '''
+    for count in self.load_steps(model, self.rowcount + 1, is_visible, leaves, sort_key):
+      pass
+  
+  
+  def load_steps(self, model, step_size, is_visible=None, leaves=None, sort_key=None):
+    '''
+    Generator that appends all rows to treestore model, yielding count of rows appended every step_size rows.
+    Depth first, without recursion, so it can yield.
+    
+    is_visible: function of leaf name returning whether the leaf passes a filter, default all visible.
+    Visibility columns are computed here, in Python, so no second pass over the rows is needed.
+    leaves: dictionary to fill: leaf name => list of treeiters of leaf rows.
+    sort_key: if given, siblings are appended in order of sort_key(label),
+      so a model whose sorting is disabled while loading is already in order.
+    '''
+    if is_visible is None:
+      is_visible = lambda name: True
+    if leaves is None:
+      leaves = {}
+    if sort_key is None:
+      children_of = lambda node: node.children.iteritems()
+      unknown_leaves_of = lambda node: node.unknown_leaves
+    else:
+      children_of = lambda node: sorted(node.children.iteritems(), key=lambda (item, child): sort_key(item))
+      unknown_leaves_of = lambda node: sorted(node.unknown_leaves, key=lambda leaf: sort_key(leaf.name))
+    _count_visible(self.root, is_visible)
+    
+    count = 0
+    next_yield = step_size
+    # (treeiter of parent row, node whose children to append, path of node with trailing slash)
+    stack = [(None, self.root, "")]
+    while stack:
+      parent, node, prefix = stack.pop()
+      for item, child in children_of(node):
+        path = prefix + item
+        if child.leaf is None:
+          row = model.append(parent, _make_row(item, "", "", child.visible_count))
         else:
-          # This is a duplicate, the same named thing wants a path item twice.
-          # Could be a different version?
-          # Whether this is unexpected depends on the conceptual model of things,
-          # and on enforcement earlier.
-          print "Same leaf value requested path twice", str(leaf)
-          return False
-      # Else, match but more path to match
-      del pathitems[0]  # advance in suffix
-      # recurse on suffix of path, matching child
-      return __add_path_from_node(model, iternode, pathitems, leaf)
-      break
-    else: # no match, next sibling
-      iternode = model.iter_next(iternode)
-  else: # no break (not matched) and iternode is None (no more siblings)
-    # Add new path at this level, below parent, with any sibling
-    # !!! If tree is empty, parent is None
-    __add_path_suffix(model, parent, pathitems, leaf)
-    return True
- 
-
-def __add_path_suffix(model, parent, pathsuffix, leaf):
+          row = model.append(parent, _make_row(item, child.leaf.name, path, child.visible_count))
+          leaves.setdefault(child.leaf.name, []).append(row)
+        for leaf in unknown_leaves_of(child):
+          leafrow = model.append(row, _make_row(leaf.name, leaf.name, path + "/" + leaf.name,
+            int(is_visible(leaf.name))))
+          leaves.setdefault(leaf.name, []).append(leafrow)
+        count += 1 + len(child.unknown_leaves)
+        if child.children:
+          stack.append((row, child, path + "/"))
+        if count >= next_yield:
+          yield count
+          next_yield = count + step_size
+    yield count
+
+
+def _count_visible(node, is_visible):
+  ''' Compute visible_count of node and its subtree.  Return it. '''
+  count = 0
+  if node.leaf is not None and is_visible(node.leaf.name):
+    count += 1
+  for leaf in node.unknown_leaves:
+    if is_visible(leaf.name):
+      count += 1
+  for child in node.children.itervalues():
+    count += _count_visible(child, is_visible)
+  node.visible_count = count
+  return count
+    
+
+def _make_row(item, leafname, leafpath, visible_count):
+  '''
+  Values of a row in the model. This hides the number and type of columns we are adding.
+  First column the path item, second column the leaf value or empty for non-leaf.
+  Third column the slash delimited path of a leaf, or empty for non-leaf, see get_path_string().
+  !!! Tooltip (name and blurb) is NOT put in the model, the GUI gets it on demand.
+  Last columns whether visible, and count of visible leaves in subtree.
+  '''
+  return [item, leafname, leafpath, visible_count > 0, visible_count]
+
+
+def get_path_string(model, iter):
   '''
-  Add new path suffix to treestore below parent.
-  Parent can be None for case: at a row at top level. 
-  Path suffix is list of items, not a path string.
+  Get a slash delimited string for a path given by iter, a treeIter.
+  
+  Leaf rows hold their path in a hidden column (filled when loading): one read.
+  Otherwise (a branch) join the labels of the row and its ancestors.
   '''
-  assert pathsuffix # Pathsuffix CANNOT be empty.
-  # Add rows in model for the path
-  for item in pathsuffix:
-    # parent becomes the new row for next iteration.
-    # See gtk doc: append(parent,..) means below parent or at toplevel if parent None.
-    # First column the path item, second column empty.
-    parent = model.append(parent, [item, "", ""]) 
-  # Change row in model for leaf.  
-  # Note we just added it above, but with null values
-  # Second (hidden?) column holds leaf value.
-  model.set_value(parent, 1, leaf.name)  # column 2
-  # !!! This is where we make col 3 (which is tooltip) a cat of name and blurb
-  # TODO this should be decided elsewhere?
-  model.set_value(parent, 2, leaf.name + ": " + leaf.blurb)  # column 3
+  slashpath = model.get_value(iter, 2)
+  if slashpath:
+    return slashpath
+  labels = []
+  while iter:
+    labels.append(model.get_value(iter, 0))
+    iter = model.iter_parent(iter)
+  labels.reverse()
+  return "/".join(labels)
 
 
 if __name__ == "__main__":
@@ -184,11 +257,18 @@ if __name__ == "__main__":
   import pygtk
   pygtk.require("2.0")
   import gtk
-  treemodel = gtk.TreeStore(str, str)  # note use Python type, not GTK constant
-  add_path(treemodel, "foo/bar", "foo")
-  add_path(treemodel, "foo", "foo")
-  add_path(treemodel, "bar", "foo")
-  print treemodel
+  
+  class Leaf(object):
+    def __init__(self, name):
+      self.name = name
+      
+  treemodel = gtk.TreeStore(str, str, str, bool, int)  # note use Python type, not GTK constant
+  tree = PathTree()
+  print tree.add_path(Leaf("foo"), "foo/bar")
+  print tree.add_path(Leaf("foo"), "foo") # prefix of another path, not added
+  print tree.add_path(Leaf("zed"), "bar")
+  tree.load(treemodel)
+  print len(treemodel), tree.rowcount
   
 
   
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+'''
+Persistent, on-disk cache of the plugin database (see plugindb.py.)
+
+Building the plugin database from Gimp costs one wire round-trip per procedure
+(to get its blurb etc.), which dominates startup when many plugins are installed.
+This remembers, between sessions, the attributes of procedures that cost a round-trip.
+
+The cache is one pickled file in the user's Gimp directory, read in one read.
+It is versioned:
+  - by our own format version (bump it when the records change)
+  - by the Gimp version (a new Gimp has new internal procedures)
+A stale cache is ignored as a whole.
+
+Each record is keyed by procedure name and by a freshness key.
+For plugins, the freshness key is the plugin file's location and time (from gimp_plugins_query.)
+When a plugin file changes, only its record is refreshed.
+For Gimp internal procedures, the Gimp version is the freshness key.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import gimp
+
+import os
+import cPickle
+
+from gimpscripter import atomicfile
+
+
+# Bump this whenever the layout of a record changes, so old caches are ignored.
+CACHE_FORMAT_VERSION = 3
+
+CACHE_FILENAME = "gimpscripter-pdb.cache"
+
+# Freshness key for procedures that are not plugin files (internal procedures and macros.)
+INTERNAL_KEY = "internal"
+
+
+def default_cache_path(filename=CACHE_FILENAME):
+  ''' The cache (and files alongside it) live in the user's Gimp directory e.g. ~/.gimp-2.6 '''
+  return os.path.join(gimp.directory, filename)
+
+
+class PdbCache(object):
+  '''
+  Cache of records of procedures, keyed by procedure name.
+  A record is a dictionary of attribute name to value, for those attributes
+  that are expensive to get from Gimp (see plugindb.PROC_INFO_ATTRS.)
+  Since those attributes are fetched lazily, only procedures whose attributes
+  were fetched in some session have records.
+  '''
+
+  def __init__(self, filepath=None):
+    if filepath is None:
+      filepath = default_cache_path()
+    self.filepath = filepath
+    self.gimp_version = gimp.version
+    self.records = {}  # name => (freshness key, record)
+    self.is_dirty = False
+    self.hits = 0
+    self.misses = 0
+    # Not loaded from disk until load(), so creating a cache is cheap e.g. at import time.
+
+  def load(self):
+    '''
+    Load cache from disk, in one read.
+    Any failure to read, or a version mismatch, leaves the cache empty (all misses.)
+    '''
+    try:
+      with open(self.filepath, "rb") as f:
+        format_version, gimp_version, records = cPickle.load(f)
+    except IOError:
+      return  # No cache yet, e.g. first run
+    except Exception, details:
+      # Corrupt or foreign cache file.  Not fatal, just rebuild.
+      print "Ignoring unreadable PDB cache", self.filepath, details
+      return
+    if format_version != CACHE_FORMAT_VERSION or gimp_version != self.gimp_version:
+      print "Ignoring stale PDB cache", self.filepath
+      return
+    self.records = records
+
+  def lookup(self, name, key):
+    '''
+    Return record for named procedure, if cached and fresh, else None.
+    Key is the freshness key, e.g. (location, time) of a plugin file.
+    '''
+    try:
+      cached_key, record = self.records[name]
+    except KeyError:
+      self.misses += 1
+      return None
+    if cached_key != key:
+      self.misses += 1
+      return None
+    self.hits += 1
+    return record
+
+  def store(self, name, key, record):
+    ''' Store record for named procedure, with freshness key. '''
+    if self.records.get(name) == (key, record):
+      return  # unchanged, don't save needlessly
+    self.records[name] = (key, record)
+    self.is_dirty = True
+
+  def prune(self, names):
+    '''
+    Discard records for procedures not in names (e.g. uninstalled plugins.)
+    So the cache doesn't grow without bound.
+    '''
+    for name in self.records.keys():
+      if name not in names:
+        del self.records[name]
+        self.is_dirty = True
+
+  def save(self):
+    '''
+    Save cache to disk, if changed.
+    Write atomically: a crash while writing must not leave a corrupt cache.
+    Failure to save is not fatal, the cache is only an optimization.
+    '''
+    if not self.is_dirty:
+      return
+    try:
+      atomicfile.write(self.filepath, lambda f: cPickle.dump((CACHE_FORMAT_VERSION, self.gimp_version, self.records),
+        f, cPickle.HIGHEST_PROTOCOL))
+    except (IOError, OSError), details:
+      print "Failed to save PDB cache", self.filepath, details
+      return
+    self.is_dirty = False
+    print "Saved PDB cache, hits:", self.hits, " misses:", self.misses
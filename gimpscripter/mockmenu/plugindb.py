@@ -46,9 +46,15 @@ import time
 # our own submodules
 from gimpscripter.mockmenu import db_treemodel
 from gimpscripter.mockmenu import map_procedures
+from gimpscripter.mockmenu import pdbcache
+from gimpscripter.mockmenu import searchindex
 from gimpscripter import macros
+from gimpscripter import parameters
 
 
+# File alongside the db cache
+INDEX_FILENAME = "gimpscripter-search.index"
+
 # Dictionaries of types in the conceptual model
 
 '''
@@ -67,52 +73,102 @@ proctypedict = {
 
 
 
-class Procedure:
+# Attributes of a Procedure returned by gimp_procedural_db_proc_info, i.e. that cost a wire round-trip.
+# They are fetched lazily, on first access, and persisted by pdbcache.
+PROC_INFO_ATTRS = ("blurb", "help", "author", "copyright", "date", "proctype", "params", "return_vals")
+
+# Attributes shown by repr, in order.
+REPR_ATTRS = ("name", "menupath", "accel", "loc", "imagetype", "time",
+  "blurb", "help", "author", "copyright", "date", "type", "filename", "language")
+
+
+def intern_strings(value):
+  '''
+  Return value with its strings interned, also in tuples (e.g. paramdefs.)
+  Many attribute values repeat across procedures (author, date, imagetype, param names and descs),
+  but each comes from Gimp (or the cache) as a new string.  Interned, they are stored once.
+  '''
+  if isinstance(value, str):
+    return intern(value)
+  if isinstance(value, tuple):
+    return tuple([intern_strings(item) for item in value])
+  return value
+
+
+class Procedure(object):
   '''
   Procedures in the Gimp PDB.
   Mimics the attributes exposed by the PDB.
   Unifies ALL the exposed attributes of any type of procedure.
   Even attributes that aren't readily available from Gimp.
   Implements repr for str()
+  
+  Attributes in PROC_INFO_ATTRS (and type, derived from proctype) are lazy:
+  if not passed to init, they are fetched from Gimp on first access, then memoized.
+  So startup cost scales with what the user touches, not with the size of the PDB.
+  
+  There are thousands: slots instead of a __dict__ per procedure, and string values interned.
   '''
+  __slots__ = ("name", "menupath", "accel", "loc", "imagetype", "time", "type", "filename", "language") \
+    + PROC_INFO_ATTRS
   # TBD catch ValueError on decode ?
   
   # Note it is important to properly default those attributes that we build views on
+  # Attributes passed as None are lazy.
   def __init__(self, name, accel, loc, time, menupath = "<Unknown>", imagetype="<Unknown>",
-      blurb="missing", help="", author="", copyright="", date="", proctype=-1 ):
-      
-    # global proctypedict
+      blurb=None, help=None, author=None, copyright=None, date=None, proctype=None, params=None, return_vals=None ):
     
     # attributes returned by gimp_plugin_query
-    self.name = name
-    self.menupath = menupath
-    self.accel = accel
-    self.loc = loc
-    self.imagetype = imagetype
-    self.time = time
-    # attributes returned by gimp_procedural_db_proc_info
-    self.blurb = blurb
-    self.help = help
-    self.author = author
-    self.copyright = copyright
-    self.date = date
-    self.type = proctypedict[proctype]
+    self.name = intern_strings(name)
+    self.menupath = intern_strings(menupath)
+    self.accel = intern_strings(accel)
+    self.loc = intern_strings(loc)
+    self.imagetype = intern_strings(imagetype)
+    self.time = intern_strings(time)
+    # attributes returned by gimp_procedural_db_proc_info, if known
+    self.set_proc_info( { "blurb" : blurb, "help" : help, "author" : author,
+      "copyright" : copyright, "date" : date, "proctype" : proctype, "params" : params,
+      "return_vals" : return_vals } )
     # other attributes that can be discerned, eg by inference or parsing source files
     self.filename = "Unknown"
     self.language = "Unknown"
     
   
+  def __getattr__(self, attrname):
+    '''
+    Called only when attrname is not (yet) an attribute.
+    Fetch lazy attributes from Gimp, memoizing them as ordinary attributes.
+    One fetch gets all of PROC_INFO_ATTRS.
+    '''
+    if attrname == "type":
+      self.type = proctypedict.get(self.proctype, "Unknown")
+    elif attrname in PROC_INFO_ATTRS:
+      self.set_proc_info(get_proc_info(self.name))
+    else:
+      raise AttributeError(attrname)
+    return object.__getattribute__(self, attrname)
+  
+  def _is_known(self, attrname):
+    ''' Whether attribute is set, without fetching it. '''
+    try:
+      object.__getattribute__(self, attrname)
+    except AttributeError:
+      return False
+    return True
+  
+  
   def __repr__(self):
     '''
     Return text describing procedure.
+    !!! Fetches lazy attributes.
     
     Future: different formats for different types
     Future: formatted
     Future: highlight the search hits
     '''
-    # print self.__dict__
     text = ""
-    for attrname, attrvalue in self.__dict__.iteritems():
+    for attrname in REPR_ATTRS:
+      attrvalue = getattr(self, attrname)
       if attrvalue is None: # Don't know why pygimp didn't do this earlier?
         attrvalue = ""  # Must be a string
       if not isinstance(attrvalue, types.StringType) :
@@ -133,6 +189,52 @@ class Procedure:
     self.copyright = copyright
     self.date = date
     self.type = proctypedict[thetype]
+  
+  
+  def set_proc_info(self, proc_info):
+    '''
+    Set attributes from a dictionary keyed by names in PROC_INFO_ATTRS.
+    None values are not set, i.e. remain lazy.
+    '''
+    for attrname, attrvalue in proc_info.iteritems():
+      if attrvalue is not None:
+        setattr(self, attrname, intern_strings(attrvalue))
+    if proc_info.get("params") is not None:
+      parameters.forget_prototypes(self.name) # signature (re)set
+    if self._is_known("proctype") and self._is_known("type"):
+      del self.type # rederive
+  
+  
+  def get_known_proc_info(self):
+    ''' Return dictionary of those PROC_INFO_ATTRS already fetched, without fetching. '''
+    result = {}
+    for attrname in PROC_INFO_ATTRS:
+      if self._is_known(attrname):
+        result[attrname] = object.__getattribute__(self, attrname)
+    return result
+
+
+def get_proc_info(procname):
+  '''
+  Return dictionary of attributes of named procedure that cost a wire round-trip to Gimp.
+  Keys are PROC_INFO_ATTRS.
+  Note the attr in the gimpfu.pdb are named proc_foo.
+  '''
+  try:
+    proc = gimpfu.pdb[procname]
+  except KeyError:
+    # E.g. a procedure in map_procedures that this Gimp version lacks.
+    print "Procedure not in PDB:", procname
+    return { "blurb" : "missing", "help" : "", "author" : "", "copyright" : "", "date" : "",
+      "proctype" : -1, "params" : (), "return_vals" : () }
+  return { "blurb" : proc.proc_blurb,
+    "help" : proc.proc_help,
+    "author" : proc.proc_author,
+    "copyright" : proc.proc_copyright,
+    "date" : proc.proc_date,
+    "proctype" : proc.proc_type,
+    "params" : proc.params,
+    "return_vals" : proc.return_vals }
 
 
 def standardize_menu_path(path):
@@ -150,14 +252,28 @@ class Pdb(dict):
   A read only dictionary of objects of type Procedure mimicing the Gimp PDB.
   For now, it initializes itself with data.
   You can also add items.
+  
+  Cache is a PdbCache (or None.)
+  Procedures are seeded from the cache when their plugin file did not change,
+  else their proc info is fetched lazily.
+  
+  Initially empty: call load() to fill from Gimp (deferred so importing is cheap.)
   '''
   
-  def __init__(self):
+  def __init__(self, cache=None):
     
     # Base class init
     dict.__init__(self)
-   
-    # Fill self with data from Gimp PDB
+    
+    self.cache = cache
+    self.cachekeys = {} # name => freshness key in cache, for procedures that are cached
+    self.is_loaded = False
+    
+  def load(self):
+    ''' Fill self with data from Gimp PDB '''
+    parameters.forget_prototypes()  # signatures may have changed since last load
+    if self.cache is not None:
+      self.cache.load()
     
     # Query the plugins, which have different attributes exposed.
     # !!! Here we want the menupath.
@@ -167,18 +283,20 @@ class Pdb(dict):
     for i in range(0,len(name)):
 
       # Create new procedure object
+      # Additional fields from gimpfu.pdb are lazy.
       procedure = Procedure(name[i],  accel[i], loc[i],
         time.strftime("%c", time.localtime(times[i])),  # format time.  TBD convert to UTF8
         standardize_menu_path(menupath[i]),
-        imagetype[i],
-        blurb = gimpfu.pdb[name[i]].proc_blurb )  # Additional fields directly from gimpfu.pdb
-        # Note the attr in the gimpfu.pdb are named proc_foo.
+        imagetype[i])
         
       # Note about future development:
       # pygimp wraps pdb.gimp_procedural_db_get_data as gimp.pygimp_get_data(name[i])
       # data will be the default parameters for plugins written in C.
         
       dict.__setitem__(self, name[i], procedure)
+      # Plugin is fresh in cache if its file has the same location and time.
+      self.restore_from_cache(procedure, (loc[i], times[i]))
+    self.is_loaded = True
     
   def __setitem__(self, key, value):
     # This allows the Pdb to be supplemented
@@ -187,6 +305,31 @@ class Pdb(dict):
   
   # iterator methods, and all other special methods, inherited from base
   # No overriding is necessary.
+  
+  def restore_from_cache(self, procedure, key):
+    '''
+    Seed procedure with cached proc info, if fresh.
+    Remember its freshness key, for save_cache().
+    '''
+    self.cachekeys[procedure.name] = key
+    if self.cache is not None:
+      record = self.cache.lookup(procedure.name, key)
+      if record is not None:
+        procedure.set_proc_info(record)
+  
+  def save_cache(self):
+    '''
+    Store proc info fetched so far into cache, and save cache.
+    Call when done with self, e.g. when app quits, so lazily fetched attributes persist.
+    '''
+    if self.cache is None:
+      return
+    for name, key in self.cachekeys.iteritems():
+      record = self[name].get_known_proc_info()
+      if record:
+        self.cache.store(name, key, record)
+    self.cache.prune(self)
+    self.cache.save()
 
 
 
@@ -194,22 +337,24 @@ def append_gimp_internal_procedures(plugindb):
   '''
   Supplement given dictionary with a subset of gimp internal procedures.
   Subset is: only those most useful to plugin creators.
-  
+
   Cases for whether internal procedure have menupath presence in Gimp menus:
-  
+
   - No : we fabricate a menu item.
   - Yes: no programmatic way to discern, we hand coded corresponding Gimp menu item.
-  
+
   Minimal procedure descriptors: having at least:
-  
+
   - the attribute declared in viewspec: menupath
   - imagetype
-  
+
   Pygimp pdb does not expose the imagetype as attribute of a PDB function.
   gimp-procedural-db-query also does not return the imagetype.
   Imagetype blank or "*" means available for all image types.
   TODO decide whether some internal procedures have imagetype contraints.
   gimp-flatten does not apply when there IS no alpha, and throws an exception?
+
+  Internal procedures only change with the Gimp version, which the cache already checks.
   '''
   for menupath, procname in map_procedures.menu_to_procname.items():
     if procname in plugindb :
@@ -217,39 +362,89 @@ def append_gimp_internal_procedures(plugindb):
       # But go ahead and add it
 
     if macros.is_macro(procname):
-      plugindb[procname] = Procedure(procname, 
+      # Macros are not in the Gimp PDB: all fields known here, nothing lazy.
+      plugindb[procname] = Procedure(procname,
         "bar", "bar", "bar", # accel, loc, time all unknown
         menupath, # <= from the map
         imagetype="", # unknown
-        blurb = macros.get_blurb(procname) # lookup
+        blurb = macros.get_blurb(procname), # lookup
+        help = "", author = "", copyright = "", date = "",
+        proctype = -1,
+        params = macros.get_pdefs_for(procname),
+        return_vals = () # !!! Macros return nothing, whatever their text returns
         )
     else: # Gimp internal procedure
       # Many fields unknown for PDB procedures that are not plugins
-      plugindb[procname] = Procedure(procname, 
+      # Blurb etc. are lazy, or restored from cache.
+      procedure = Procedure(procname,
         "bar", "bar", "bar", # accel, loc, time all unknown
         menupath, # <= from the map
-        imagetype="", # unknown
-        blurb = gimpfu.pdb[procname].proc_blurb # lookup
+        imagetype="" # unknown
         )
-    
+      plugindb[procname] = procedure
+      plugindb.restore_from_cache(procedure, pdbcache.INTERNAL_KEY)
+
+
+
+def load():
+  '''
+  Load the exported products (plugindb and pluginfilterdict) from Gimp.
+  Fills them in place, so views already referring to them see the data.
+  Not done at import time, so an app can show its window first and load later
+  (e.g. in an idle callback.)
+  '''
+  if plugindb.is_loaded:
+    return
+  plugindb.load()
+  append_gimp_internal_procedures(plugindb) 
+  
+  # TBD make it show only plugins that are not shortcuts !
+  # ie no need for a shortcut to a shortcut.
+  for name in plugindb.iterkeys():
+    pluginfilterdict[name] = True # show all
+  
+  # Reindex only procedures whose text changed since the index was saved.
+  pluginindex.load()
+  pluginindex.update(plugindb)
+  pluginindex.save()
+
+
+def save():
+  '''
+  Persist what was learned this session: lazily fetched proc info.
+  Call when app quits.
+  '''
+  if not plugindb.is_loaded:
+    return
+  plugindb.save_cache()
+
+
+def _search_text(name, procedure):
+  '''
+  Text of a procedure searched by the user: name and menupath.
+  Not the blurb: it is lazy, known only for procedures already fetched (e.g. by hovering),
+  and fetching every blurb to index it is what lazy avoids.
+  '''
+  return name + "\n" + procedure.menupath
 
 
 '''
 This is the meat of this glue module:
 define views on an augmented PDB.
+Views are defined at import time, but on an empty db until load() is called.
 '''
 # make a dictionary of plugin descriptors, keyed by name
-plugindb = Pdb() # db of plugins, exported, a main product
-append_gimp_internal_procedures(plugindb) 
+# Cache avoids most round-trips to Gimp on all but the first startup.
+plugindb = Pdb(pdbcache.PdbCache()) # db of plugins, exported, a main product
 
 # TODO the rest of this should be in another module
 
+# Index for search-as-you-type, persisted alongside the cache of the db.
+pluginindex = searchindex.SearchIndex(_search_text, pdbcache.default_cache_path(INDEX_FILENAME))
+
 # A map that defines what rows appear in the gtk.treeview
-# TBD make it show only plugins that are not shortcuts !
-# ie no need for a shortcut to a shortcut.
-pluginfilterdict = {}
-for name, value in plugindb.iteritems():
-  pluginfilterdict[name] = True # show all
+# Search uses the index, matching procedure name or menupath.
+pluginfilterdict = db_treemodel.FilterDict(("menupath",), pluginindex)
 
 dictofviews = {}  # Exported, a main product
 
@@ -270,6 +465,7 @@ if __name__ == "__main__":
   
   # test 
   mypdb = Pdb()
+  mypdb.load()
   
       
     
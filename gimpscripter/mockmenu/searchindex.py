@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+'''
+Inverted index for searching a db (a dictionary of objects) as the user types.
+
+Indexes some text of each object in the db (e.g. name and menupath.)
+The caller gives a function returning the text for an object.
+
+A pattern matches any substring of the text (case insensitive), whatever its length.
+Postings map trigram => set of names (keys in the db.)
+A search for three or more characters intersects the postings of the pattern's trigrams,
+then verifies the few candidates against their text.
+So a search costs in proportion to the hits, not to the size of the db.
+Shorter patterns have no trigram: they scan the texts, which is cheap for one or two characters.
+
+Updating is incremental (by name), and the index can be persisted,
+so only objects whose text changed since the last session are reindexed.
+
+This is independent of the application, ie generic.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import cPickle
+
+from gimpscripter import atomicfile
+
+
+# Bump this whenever the layout of the persisted index changes.
+INDEX_FORMAT_VERSION = 2
+
+# Patterns shorter than this are matched by scanning, else by trigrams.
+TRIGRAM_LENGTH = 3
+
+
+def trigrams(text):
+  ''' Return set of substrings of length three of text. '''
+  return set([text[i:i+TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)])
+
+
+class SearchIndex(object):
+  '''
+  Inverted index of the text of objects in a db.
+
+  text_of: function(name, thing) returning the text to index for a thing in the db.
+  filepath: where to persist, or None.
+  '''
+
+  def __init__(self, text_of, filepath=None):
+    self.text_of = text_of
+    self.filepath = filepath
+    self.texts = {}  # name => lowercased indexed text
+    self.trigrams = {} # trigram => set of names
+    self.is_dirty = False
+
+  def __len__(self):
+    return len(self.texts)
+
+  def add(self, name, text):
+    ''' Index name under text.  Name must not already be indexed. '''
+    text = text.lower()
+    self.texts[name] = text
+    for trigram in trigrams(text):
+      self.trigrams.setdefault(trigram, set()).add(name)
+    self.is_dirty = True
+
+  def remove(self, name):
+    ''' Remove name from index, if indexed. '''
+    text = self.texts.pop(name, None)
+    if text is None:
+      return
+    self._discard(self.trigrams, trigrams(text), name)
+    self.is_dirty = True
+
+  def _discard(self, postings, keys, name):
+    for key in keys:
+      names = postings.get(key)
+      if names is not None:
+        names.discard(name)
+        if not names:
+          del postings[key]
+
+  def update(self, db):
+    '''
+    Make index match db: reindex only things whose text changed, drop things no longer in db.
+    '''
+    for name, thing in db.iteritems():
+      text = self.text_of(name, thing)
+      if self.texts.get(name) != text.lower():
+        self.remove(name)
+        self.add(name, text)
+    for name in self.texts.keys():
+      if name not in db:
+        self.remove(name)
+
+  def search(self, pattern):
+    '''
+    Return set of names whose text contains pattern.
+    '''
+    pattern = pattern.lower()
+    if len(pattern) < TRIGRAM_LENGTH:
+      return self._search_scan(pattern)
+    # Intersect postings, smallest first, so the intersection is small from the start.
+    postings = []
+    for trigram in trigrams(pattern):
+      names = self.trigrams.get(trigram)
+      if not names:
+        return set()
+      postings.append(names)
+    postings.sort(key=len)
+    candidates = set(postings[0])
+    for names in postings[1:]:
+      candidates &= names
+      if not candidates:
+        return candidates
+    # Trigrams can all be present without the whole pattern being present: verify.
+    return set([name for name in candidates if pattern in self.texts[name]])
+
+  def _search_scan(self, pattern):
+    ''' Return set of names whose text contains pattern, by scanning every text. '''
+    return set([name for name, text in self.texts.iteritems() if pattern in text])
+
+  def load(self):
+    '''
+    Load persisted index, in one read.
+    Failure to read or a version mismatch leaves the index empty, to be rebuilt by update().
+    '''
+    if self.filepath is None:
+      return
+    try:
+      with open(self.filepath, "rb") as f:
+        format_version, texts, trigram_postings = cPickle.load(f)
+    except IOError:
+      return  # Not saved yet
+    except Exception, details:
+      print "Ignoring unreadable search index", self.filepath, details
+      return
+    if format_version != INDEX_FORMAT_VERSION:
+      return
+    self.texts, self.trigrams = texts, trigram_postings
+    self.is_dirty = False
+
+  def save(self):
+    ''' Persist index atomically, if changed. Failure is not fatal. '''
+    if self.filepath is None or not self.is_dirty:
+      return
+    try:
+      atomicfile.write(self.filepath, lambda f: cPickle.dump((INDEX_FORMAT_VERSION, self.texts, self.trigrams),
+        f, cPickle.HIGHEST_PROTOCOL))
+    except (IOError, OSError), details:
+      print "Failed to save search index", self.filepath, details
+      return
+    self.is_dirty = False
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+'''
+Optimize the body of a wrapping plugin's plugin_main.
+
+Between the Commands and the emitted text is a small intermediate representation (IR):
+a list of Statement, each one line of code, with what the passes need to know about it.
+generate.py makes the statements, optimize() rewrites them, emit() makes the text.
+
+Passes:
+  coalesce display flushes: one flush at the end, instead of after each command (or macro.)
+  drop context push/pop pairs with nothing between them.
+  hoist stack top reads: ephemera.top(PF_FOO) read more than once is read once into a local,
+    until the stack changes.
+  bind PDB procedures once: pygimp fetches the proc info of a PDB procedure (a round-trip to Gimp)
+    on every attribute lookup pdb.foo, so bind each called more than once to a local at the start of the body.
+
+The passes work on the text of statements, using regular expressions.
+!!! They assume the code of statements is as generated (and as macros are written, see macros.py):
+pdb procedures referenced as pdb.foo(, stack tops as ephemera.top(PF_FOO).
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import re
+
+# Kinds of statements
+CALL = 1      # calls procedures (or a macro statement), may read stack tops
+UPDATE = 2    # ephemera.update(): changes stacks
+PUSH = 3      # ephemera.push(): changes stacks
+COMMENT = 4
+BINDING = 5   # assignment to a local, made by a pass
+
+# Indent of statements in body of plugin_main.  Must match template.
+# (Deeper when the body is in a try: for an undo mode, see generate.py)
+INDENT = "  "
+
+STACK_TOP = re.compile(r"ephemera\.top\((PF_[A-Z]+)\)")
+STACK_PUSH = re.compile(r"ephemera\.push\((PF_[A-Z]+)")
+PDB_PROCEDURE = re.compile(r"\bpdb\.(\w+)(?=\()")
+DISPLAYS_FLUSH = re.compile(r"^pdb\.gimp_displays_flush\(\s*\)$")
+CONTEXT_PUSH = re.compile(r"^pdb\.gimp_context_push\(\s*\)$")
+CONTEXT_POP = re.compile(r"^pdb\.gimp_context_pop\(\s*\)$")
+
+
+class Statement(object):
+  ''' A line of code in the body of plugin_main, without indent or newline. '''
+
+  def __init__(self, kind, text):
+    self.kind = kind
+    self.text = text
+
+  def __repr__(self):
+    return "Statement(%d, %r)" % (self.kind, self.text)
+
+
+def statements_of(kind, text):
+  '''
+  Return list of statements for text of code, one per line.
+  Text of a macro can be many lines (see macros.py), with indent after newlines.
+  '''
+  return [Statement(kind, line.strip()) for line in text.split("\n") if line.strip()]
+
+
+def emit(statements, indent=INDENT):
+  ''' Return text of code for statements, indented. '''
+  return "".join([indent + statement.text + "\n" for statement in statements])
+
+
+def coalesce_flushes(statements):
+  ''' Remove display flushes, and if any, flush once at the end. '''
+  result = [statement for statement in statements if not DISPLAYS_FLUSH.match(statement.text)]
+  if len(result) < len(statements):
+    result.append(Statement(CALL, "pdb.gimp_displays_flush()"))
+  return result
+
+
+def drop_context_pairs(statements):
+  '''
+  Remove a context push followed by a context pop, with only comments between: it restores what it saved.
+  Repeat, so nested pairs go too.
+  '''
+  result = []
+  for statement in statements:
+    if CONTEXT_POP.match(statement.text):
+      calls = [index for index in range(len(result)) if result[index].kind != COMMENT]
+      if calls and CONTEXT_PUSH.match(result[calls[-1]].text):
+        del result[calls[-1]]
+        continue
+    result.append(statement)
+  return result
+
+
+def _top_local(pftype):
+  ''' Name of local holding stack top of type e.g. PF_IMAGE => top_image '''
+  return "top_" + pftype[len("PF_"):].lower()
+
+# Type pushed => types of stacks a push changes.  See GimpEphemera.push()
+_PUSHED_STACKS = {
+  "PF_LAYER" : ("PF_LAYER", "PF_DRAWABLE"),
+  "PF_CHANNEL" : ("PF_CHANNEL", "PF_DRAWABLE"),
+  "PF_DRAWABLE" : ("PF_DRAWABLE", "PF_LAYER", "PF_CHANNEL"),
+  }
+
+def _stacks_changed(statement, epochs):
+  ''' Count a change, in epochs (pftype => count of changes), of stacks the statement changes. '''
+  if statement.kind == UPDATE:
+    for pftype in epochs.keys():
+      epochs[pftype] += 1
+  elif statement.kind == PUSH:
+    for pushed in STACK_PUSH.findall(statement.text):
+      for pftype in _PUSHED_STACKS.get(pushed, (pushed,)):
+        epochs[pftype] = epochs.get(pftype, 0) + 1
+
+def hoist_stack_tops(statements):
+  '''
+  Read a stack top that is read more than once between changes of the stack
+  into a local, just before first use, and reuse it until the stack changes.
+  Stacks change only by UPDATE (all) and PUSH (of a type) statements.
+  Also once means one touch (see GimpEphemera._touch) of the image, which is enough.
+  '''
+  # First pass: count reads of each stack top (pftype, epoch)
+  reads = {}
+  epochs = dict([(pftype, 0) for pftype in _PUSHED_STACKS])
+  for statement in statements:
+    _stacks_changed(statement, epochs)
+    if statement.kind == CALL:
+      for pftype in STACK_TOP.findall(statement.text):
+        key = (pftype, epochs.setdefault(pftype, 0))
+        reads[key] = reads.get(key, 0) + 1
+  
+  # Second pass: hoist those read more than once
+  result = []
+  hoisted = set()
+  epochs = dict([(pftype, 0) for pftype in _PUSHED_STACKS])
+  for statement in statements:
+    _stacks_changed(statement, epochs)
+    if statement.kind == CALL:
+      local_types = set()
+      for pftype in STACK_TOP.findall(statement.text):
+        key = (pftype, epochs.setdefault(pftype, 0))
+        if reads[key] > 1:
+          local_types.add(pftype)
+          if key not in hoisted:
+            hoisted.add(key)
+            result.append(Statement(BINDING, "%s = ephemera.top(%s)" % (_top_local(pftype), pftype)))
+      if local_types:
+        def replace(match):
+          if match.group(1) in local_types:
+            return _top_local(match.group(1))
+          return match.group(0)
+        statement = Statement(statement.kind, STACK_TOP.sub(replace, statement.text))
+    result.append(statement)
+  return result
+
+
+def _procedure_local(name):
+  return "pdb_" + name
+
+def bind_procedures(statements):
+  '''
+  Bind each PDB procedure called more than once to a local, once at the start, and call the local.
+  A procedure called once is looked up once anyway.
+  '''
+  names = []  # in order of first call
+  counts = {}
+  for statement in statements:
+    if statement.kind == CALL:
+      for name in PDB_PROCEDURE.findall(statement.text):
+        if name not in counts:
+          names.append(name)
+        counts[name] = counts.get(name, 0) + 1
+  names = [name for name in names if counts[name] > 1]
+  if not names:
+    return statements
+  bindings = [Statement(BINDING, "%s = pdb.%s" % (_procedure_local(name), name)) for name in names]
+  def replace(match):
+    if match.group(1) in names:
+      return _procedure_local(match.group(1))
+    return match.group(0)
+  result = []
+  for statement in statements:
+    if statement.kind == CALL:
+      statement = Statement(statement.kind, PDB_PROCEDURE.sub(replace, statement.text))
+    result.append(statement)
+  return bindings + result
+
+
+# Passes in order.  Flushes and context pairs first: they remove calls, and so bindings.
+PASSES = (coalesce_flushes, drop_context_pairs, hoist_stack_tops, bind_procedures)
+
+def optimize(statements):
+  ''' Return statements rewritten by all passes. '''
+  for a_pass in PASSES:
+    statements = a_pass(statements)
+  return statements
+
@@ -72,6 +72,7 @@ Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 
 from gimpfu import *
 import gimpcolor
+import itertools
 
 from gimpscripter import constantmaps
 from gimpscripter import parse_params
@@ -79,11 +80,12 @@ from gimpscripter import parse_params
 
 
 
-class Param(object):
+class FormalParam(object):
   '''
-  A parameter definition and declaration, i.e. formal and actual.
-  More attributes than a Gimp ParamDef, but encloses same named attributes (name, type, desc)
+  The formal part of a parameter: what the PDB declares, and what we compute from that alone.
+  Shared, read-only, by the Params of every command of the same procedure (see prototype_of.)
   '''
+  __slots__ = ("type", "name", "desc", "pdef", "hidden", "default")
   
   def __init__(self, gimp_pdef, hidden):
     '''
@@ -91,13 +93,12 @@ class Param(object):
     
     hiddenness depends on order in a list, can't be computed just from the gimp_pdef
     '''
-    # Formal attributes
     self.type = gimp_pdef[0]
     self.name = gimp_pdef[1]
     self.desc = gimp_pdef[2]
     # !!! A desc can be very long.  It is a problem for our GUI, but not here.
     self.pdef = gimp_pdef   # Keep it for convenience
-    self._hidden = hidden
+    self.hidden = hidden
     # does user see it.  Not computed just from type, but from position.
     
     '''
@@ -114,6 +115,54 @@ class Param(object):
       self.default = constantmaps._default_map[gimp_pdef[0]]
     else: 
       self.default = None # Hidden params don't have defaults
+
+
+# Procedure name => tuple of FormalParam, its signature parsed once.  See prototype_of()
+_prototypes = {}
+
+def prototype_of(command):
+  '''
+  Return tuple of FormalParam for the formal parameters of the PDB procedure (or macro) of command.
+  Memoized by name: a sequence that repeats a procedure fetches and parses its signature once.
+  The plugin db forgets the memo when it (re)loads a signature, see forget_prototypes().
+  '''
+  try:
+    return _prototypes[command.name]
+  except KeyError:
+    pass
+  formals = [FormalParam(x, hidden=False) for x in command.get_paramdefs()]  # temporarily hidden is False
+  # Determine which params are hidden, a leading prefix.
+  # Gimpfu does something similar to hide image, drawable parameters.
+  for formal in formals[:parse_params.count_hidden_params(formals)]:
+    formal.hidden = True
+  prototype = tuple(formals)
+  _prototypes[command.name] = prototype
+  return prototype
+
+def forget_prototypes(name=None):
+  '''
+  Forget the memoized prototype of the named procedure, or of all procedures if name is None.
+  Call when a signature may have changed, e.g. a plugin was reinstalled and the db reloaded.
+  Params already made keep their (old) FormalParams.
+  '''
+  if name is None:
+    _prototypes.clear()
+  else:
+    _prototypes.pop(name, None)
+
+
+class Param(object):
+  '''
+  A parameter definition and declaration, i.e. formal and actual.
+  More attributes than a Gimp ParamDef, but encloses same named attributes (name, type, desc)
+  
+  The formal attributes are those of a FormalParam, shared.  Only the actual attributes are per command.
+  One per parameter of every command: slots, not a __dict__.
+  '''
+  __slots__ = ("formal", "is_deferred", "value", "unique_name")
+  
+  def __init__(self, formal):
+    self.formal = formal
     
     # Attributes of actual.  Initially unknown until user interaction
     self.is_deferred = False
@@ -124,6 +173,13 @@ class Param(object):
     # and before unique_name is accessed.
     self.unique_name = None
     
+  # Formal attributes, read-only
+  type = property(lambda self: self.formal.type)
+  name = property(lambda self: self.formal.name)
+  desc = property(lambda self: self.formal.desc)
+  pdef = property(lambda self: self.formal.pdef)
+  default = property(lambda self: self.formal.default)
+    
   
   def __str__(self):
     return str(self.type) + " " + self.name + " " + self.desc + " " + str(self.value)
@@ -135,7 +191,7 @@ class Param(object):
     return is_ephemeral_type(self.type)
   
   def is_hidden(self):
-    return self._hidden
+    return self.formal.hidden
 
   def get_evaluable_value(self):
     '''
@@ -149,71 +205,63 @@ class Param(object):
     return repr(self.value)
 
 
-class ParamList(list):
+class ParamList(object):
   '''
-  A container of Paramdefs.
+  A container of Params, in segments: one segment (a list of Param) per command, by position of command.
   
-  Slices are sequences of parameters for a named procedure.
-  Slices can be inserted and removed by position or name.
+  Segments can be inserted, removed, and moved by position of command,
+  without touching the Params of other commands.
+  Iterating (and len()) is over all Params, in order of commands.
   
   Has a state: whether user entered actual values.
   '''
 
   def __init__(self):
+    self.segments = []
+    # Unique names are kept incrementally, see uniquify_names()
+    self._names = {}  # name => count of uses, over the leading segments that are uniquified
+    self._logs = []   # for each uniquified segment, its changes to _names: (name, count before or None)
+    
+  def __iter__(self):
+    return itertools.chain(*self.segments)
   
-    self.procedure_start_index = [0]
-    # List of indexes of first parm of procedures
-    # !!! Also used to find the end parm of a procedures
-    # so it is post-incremented
+  def __len__(self):
+    return sum([len(segment) for segment in self.segments])
+  
+  def __str__(self):
+    return "\n".join([str(param) for param in self])
     
     
-  def delete_params_of(self, procname):
-    pass  #TODO
+  def delete_params_of(self, position):
+    ''' Remove segment of parameters of command at position. '''
+    self._invalidate_names(position)
+    del self.segments[position]
+    
+  def move_params_of(self, position, new_position):
+    ''' Move segment of parameters of command at position to new_position. '''
+    self._invalidate_names(min(position, new_position))
+    self.segments.insert(new_position, self.segments.pop(position))
 
   def insert_params_of(self, command, position):
     '''
-    Insert slice of formal parameters of PDB procedure.
-    Mainly, copy and convert from Gimp ParamDef to our Param.
+    Insert segment of parameters of PDB procedure, for command at position.
+    Formal parts are shared with other commands of the same procedure, see prototype_of().
     '''
-    inparamdefs = command.get_paramdefs()
     # TODO We don't need the return values since we are inferring creation of objects.
     # Scheme scripts don't have return values, and most returned objects are inferrable.
     # returnparamdefs = pdb[procname].return_vals
     
-    # Assert start of params for this command position is already captured in procedure_start_index
-    # TODO more general, if we insert anywhere but at the end.
-    start = self.procedure_start_index[-1]
-    
-    for x in inparamdefs:
-      param = Param(x, hidden=False)  # temporarily hidden is False
-      self.append(param)
-    
-    # Remember end of params for this command position
-    self.procedure_start_index.append(len(self))
-    end = self.procedure_start_index[-1]
-    
-    # Determine which params are hidden, a leading prefix.
-    # Gimpfu does something similar to hide image, drawable parameters.
-    print start, end
-    count = parse_params.count_hidden_params(self[start:end])
-    for param in self[start: start+count]:
-      param._hidden = True  # TODO setter
+    segment = [Param(formal) for formal in prototype_of(command)]
     
-    print "Total count params", len(self)
+    self._invalidate_names(position)
+    self.segments.insert(position, segment)
     # After insert, must uniquify names again
 
-
-  def _get_range_for_position(self, position):
-    ''' Get the range for parameters of command at position. '''
-    start, end = self.procedure_start_index[position], self.procedure_start_index[position+1]
-    print "Range of parameters for position", position, " is ", start, end
-    return start, end
     
   def get_parms_for(self, position):
-    ''' Return slice of parms for command at position '''
+    ''' Return parms for command at position.  Not a copy: don't change it. '''
     # TODO for ease of use, link parm values to earlier parms ???
-    start_parm, end_parm = self._get_range_for_position(position)
-    return self[start_parm:end_parm]
+    return self.segments[position]
 
 
   def preset(self, userentered, defers, command_index=None):
@@ -222,16 +270,12 @@ class ParamList(list):
     Userentered means the user at least reviewed the initial values and possibly entered them.
     Index is the command whose parameters the user changed.
     '''
-    print "Validating", userentered, defers
     # Userentered and defers must be the length of nonhidden.
     assert len(userentered) == len(defers)
     
-    # In the range of parameters for command_index
-    start_parm, end_parm = self._get_range_for_position(command_index)
-    
-    # Shuffle values from userentered, defers into self
+    # Shuffle values from userentered, defers into params of command_index
     source_index = 0
-    for item in self[start_parm:end_parm]:
+    for item in self.segments[command_index]:
       if not item.is_hidden():
         item.is_deferred = defers[source_index]
         item.value = userentered[source_index]  # Note referring to an object, possibly not a string
@@ -248,12 +292,9 @@ class ParamList(list):
     TODO there is more to this, it depends on the type of the procedure.
     '''
     # Iterate by procedure
-    for index in self.procedure_start_index:
-      second_parameter_index = index + 1
-      if second_parameter_index < len(self):
-        # TODO and less than the end of the parameters for this procedure
-        if self[second_parameter_index].type == PF_IMAGE:
-          return True
+    for segment in self.segments:
+      if len(segment) > 1 and segment[1].type == PF_IMAGE:
+        return True
     return False
     
     
@@ -273,23 +314,19 @@ class ParamList(list):
   
   def get_nonhidden_pdefs_for(self, position):
     ''' Return slice of nonhidden pdefs for command at position '''
-    start_parm, end_parm = self._get_range_for_position(position)
-    return [x.pdef for x in self[start_parm:end_parm] if not x.is_hidden()]
+    return [x.pdef for x in self.segments[position] if not x.is_hidden()]
   
   def get_nonhidden_defaults_for(self, position):
     ''' Return slice of nonhidden defaults for command at position '''
-    start_parm, end_parm = self._get_range_for_position(position)
-    return [x.default for x in self[start_parm:end_parm] if not x.is_hidden()]
+    return [x.default for x in self.segments[position] if not x.is_hidden()]
     
   def get_nonhidden_values_for(self, position):
     ''' Return slice of nonhidden userentered values for command at position '''
-    start_parm, end_parm = self._get_range_for_position(position)
-    return [x.value for x in self[start_parm:end_parm] if not x.is_hidden()] 
+    return [x.value for x in self.segments[position] if not x.is_hidden()] 
     
   def get_defers_for(self, position):
     ''' Return is_deferred for slice of nonhidden parameters. '''
-    start_parm, end_parm = self._get_range_for_position(position)
-    return [x.is_deferred for x in self[start_parm:end_parm] if not x.is_hidden()] 
+    return [x.is_deferred for x in self.segments[position] if not x.is_hidden()] 
 
   def nonhiddenpdefs(self):
     ''' Return slice of pdefs of nonhidden Params 
@@ -314,33 +351,53 @@ class ParamList(list):
     !!! Also insure names are Pythonic: no dash.
     Note this computes an attribute and must be called before the attribute is accessed.
     
-    TODO doctest this
-    n, n, n, n_1 => n, n_1, n_2, n_1_1
-    n_1, n, n_1 => n_1, n, n_1_1
+    Incremental: only segments from the first one inserted, removed or moved since the last call
+    are uniquified again (e.g. only the last, when commands are only appended.)
+    
+    For example (see tests/test_parameters.py)
+    n, n, n, n_1 => n, n_2, n_3, n_1
+    n_1, n, n_1 => n_1, n, n_1_2
     '''
-    names = {}  # name => count of uses
+    names = self._names  # name => count of uses
     
-    for param in self:
-      original_name = param.pdef[1]
-      
-      # Since these names will be used in Python code, transliterate dash to underbar
-      original_name = original_name.replace("-", "_")
-      
-      if original_name in names:
-        count = names[original_name] + 1
-        names[original_name] = count
-        # generate unique name, use _
-        # Note generated name may clash with name yet to be seen,
-        # but the yet to be seen name will get a new name.
-        unique_name = original_name + "_" + str(count)
-        # !!! Put the unique name in names also
-        names[unique_name] = 1  # first use of unique name
-      else: # first use
-        names[original_name] = 1
-        unique_name = original_name
-      
-      param.unique_name = unique_name # store computed attribute
+    for segment in self.segments[len(self._logs):]:
+      log = []
+      for param in segment:
+        original_name = param.pdef[1]
+        
+        # Since these names will be used in Python code, transliterate dash to underbar
+        original_name = original_name.replace("-", "_")
+        
+        if original_name in names:
+          count = names[original_name] + 1
+          log.append((original_name, names[original_name]))
+          names[original_name] = count
+          # generate unique name, use _
+          # Note generated name may clash with name yet to be seen,
+          # but the yet to be seen name will get a new name.
+          unique_name = original_name + "_" + str(count)
+          # !!! Put the unique name in names also
+          log.append((unique_name, names.get(unique_name)))
+          names[unique_name] = 1  # first use of unique name
+        else: # first use
+          log.append((original_name, None))
+          names[original_name] = 1
+          unique_name = original_name
+        
+        param.unique_name = unique_name # store computed attribute
+      self._logs.append(log)
   
+  def _invalidate_names(self, position):
+    '''
+    Segments from position on will change: undo their uses of names,
+    so uniquify_names() uniquifies them again.
+    '''
+    while len(self._logs) > position:
+      for name, count in reversed(self._logs.pop()):
+        if count is None:
+          del self._names[name]
+        else:
+          self._names[name] = count
     
     
 def any_parms_deferred(parms):
@@ -370,10 +427,7 @@ def get_parms_nonhidden(parms):
   
 def get_parms_hidden(parms):
   ''' Return the hidden parms, including run-mode. '''
-  result = [x for x in parms if x.is_hidden()]
-  for parm in result:
-    print "Hidden parms", parm
-  return result 
+  return [x for x in parms if x.is_hidden()]
 
 
 def is_ephemeral_type(paramtype):
@@ -384,10 +438,6 @@ def is_ephemeral_type(paramtype):
   In other words, use the name of the object as a pseudo UID (universal ID) spanning sessions with Gimp.
   '''
   return paramtype in (PF_DISPLAY, PF_IMAGE, PF_LAYER, PF_CHANNEL, PF_DRAWABLE, PF_VECTORS)   
-  
-def get_return_parms(procname):
-  #TODO
-  return []
       
 
       
@@ -108,7 +108,6 @@ def count_hidden_params(paramlist):
     scanner.advance()
   if scanner.get_next_type() == PF_VECTORS:
     scanner.advance()
-  print "Count hidden params is ", scanner.get_count()
   return scanner.get_count()
 
 
@@ -132,7 +131,6 @@ def count_nonrunmode_hidden_params(paramlist):
     scanner.advance()
   if scanner.get_next_type() == PF_VECTORS:
     scanner.advance()
-  print "Count hidden params is ", scanner.get_count()
   return scanner.get_count() 
 
   
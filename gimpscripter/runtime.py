@@ -12,46 +12,72 @@ from gimpfu import *
 Classes for shadowing Gimp objects so that we can infer their creation and deletion
 by commands in the wrapper plugin
 and maintain a stack whose top can be referred to by commands.
+
+We hold Gimp objects by ID (an integer), not by pygimp object, making a pygimp object only to hand to a command.
+Gimp doesn't reuse IDs, and gives IDs in increasing order: one sequence for images,
+another for items (layers, channels, and vectors.)
+So the objects a command created are those with IDs above a watermark, the greatest ID seen before the command.
+And an object a command deleted is one whose ID is no longer valid.
 '''
 
+# Types of ephemera on stacks.  !!! this list must match the one in parameters.py
+EPHEMERAL_TYPES = (PF_IMAGE, PF_DRAWABLE, PF_LAYER, PF_CHANNEL, PF_VECTORS)
+
+# Types having a name index, ie the types of Gimp objects.  Drawable is the super class for layers and channels.
+INDEXED_TYPES = (PF_IMAGE, PF_LAYER, PF_CHANNEL, PF_VECTORS)
+# Type looked up => indexes to look in
+LOOKUP_INDEXES = {
+  PF_IMAGE : (PF_IMAGE,),
+  PF_DRAWABLE : (PF_LAYER, PF_CHANNEL),
+  PF_LAYER : (PF_LAYER,),
+  PF_CHANNEL : (PF_CHANNEL,),
+  PF_VECTORS : (PF_VECTORS,),
+  }
+
+
 class GimpStack(list):
-  ''' GimpScripter stack of active Gimp objects.'''
+  ''' GimpScripter stack of IDs of active Gimp objects.'''
 
-  def __init__(self, type_on_stack, an_object=None):
+  def __init__(self, type_on_stack, an_ID=None):
     self.type_on_stack = type_on_stack
     # Readable  type, not the encoding PF_foo
     
-    # For init, an_object MUST be a formal parameter of wrapper plugin.
-    # Otherwise, what would an_object refer to?
-    if an_object:
-      self.append(an_object)  
-      self.stack_top = 0
-    else:
-      # At initialization time, there is no object of this type known to be active.
-      self.stack_top = -1
+    # For init, an_ID MUST be of a formal parameter of wrapper plugin.
+    # Otherwise, what would an_ID refer to?
+    # Else at initialization time, there is no object of this type known to be active.
+    if an_ID is not None:
+      self.append(an_ID)
   
   def __str__(self):
     return "GimpStack type " + self.type_on_stack
     
-  def push(self, an_object):
-    self.stack_top += 1  # preincrement
-    self.append(an_object)
-    print "Pushed ", an_object.name, " to stack type", self.type_on_stack, " position ", self.stack_top
-  
-  def pop(self):
+  def push(self, an_ID):
     '''
-    assert the top object has been deleted from Gimp
-    Ours may be the last reference to it.
-    Can we still get its name?
-    If so, for robustness we should check we are deleting the name we inferred is gone.
+    Make an_ID the top.
+    An ID already on the stack (e.g. an existing layer returned by gimp_image_get_active_layer)
+    is moved to the top, not copied: IDs leave the stack only by remove_invalid(), which removes every copy,
+    so only the most recent position of an ID matters, and copies would only lengthen the scans.
     '''
-    del(self[self.stack_top]) # NOT remove, we don't need the object
-    self.stack_top -= 1
-    print "Popped. New top is ", self[self.stack_top].name, " at position ", self.stack_top
+    if self and self[-1] == an_ID:
+      return # already the top
+    if an_ID in self:
+      self.remove(an_ID)
+    self.append(an_ID)
+    print "Pushed ID", an_ID, " to stack type", self.type_on_stack, " position ", len(self) - 1
+
+  def remove_invalid(self, is_valid):
+    '''
+    Remove IDs of objects deleted from Gimp, not just from the top:
+    a command can delete objects other than the active one.
+    '''
+    valid = [an_ID for an_ID in self if is_valid(an_ID)]
+    if len(valid) != len(self):
+      self[:] = valid
+      print "Popped. New top of stack type", self.type_on_stack, " is ", valid and valid[-1]
 
   def top(self):
     try:
-      return self[self.stack_top]
+      return self[-1]
     except IndexError:
       # Probably the stack is empty. Rather than return None, abort.
       pdb.gimp_message("This wrapper plugin can't find active object of type: %s." % self.type_on_stack)
@@ -61,7 +87,18 @@ class GimpStack(list):
 
 
 class GimpEphemera(object):
-  ''' GimpScripter's shadow of Gimp objects '''
+  '''
+  GimpScripter's shadow of Gimp objects
+  
+  Updated incrementally: querying the layers, channels, and vectors of an image costs round-trips to Gimp,
+  so an update rescans only images that are new, or were touched since the last update.
+  Touched means an object of (or in) the image was handed to a command, by top() or lookup().
+  Assumes a command changes only the images passed to it, besides creating or deleting images.
+  A rescan gets only IDs, and fetches names only of objects new to us,
+  unless the command's effects are unknown (e.g. a plugin or script, which may rename objects):
+  then it fetches names of all items of the touched images, see update().
+  Thus the cost of an update grows with the count of objects created or touched, not with the count of open images.
+  '''
   
   def __init__(self, a_image, a_drawable):
     
@@ -76,27 +113,36 @@ class GimpEphemera(object):
     FUTURE: revisit this, possibly call gimp_image_get_foo to initialize stacks,
     if Gimp also is reliably using a stack model, with an active instance for each type.
     '''
-    self.ephemera = {}
-    self._update_ephemera()
-    self.prior_ephemera = self._copy_ephemera_keys()
-    # prior_ephemera is keys only, the values are not ephemeral Gimp objects
-    # since those may be deleted by commands in wrapper plugin
+    self.images = {}  # image ID => name
+    self.items = {}   # item ID => (type, name, image ID).  Type is PF_LAYER, PF_CHANNEL, or PF_VECTORS
+    self.image_items = {}  # image ID => set of IDs of its items
+    self.names = dict([(a_type, {}) for a_type in INDEXED_TYPES])  # type => name => set of IDs, for lookup
+    self.touched = set() # IDs of images handed to commands since last update
+    self.image_watermark = 0  # greatest image ID seen
+    self.item_watermark = 0   # greatest item ID seen
+    # PDB procedures an update calls, bound once: pygimp fetches proc info on every pdb.foo
+    self._image_list = pdb.gimp_image_list
+    self._item_getters = (
+      (PF_LAYER, pdb.gimp_image_get_layers),
+      (PF_CHANNEL, pdb.gimp_image_get_channels),
+      (PF_VECTORS, pdb.gimp_image_get_vectors)) # vector aka path
+    self._update_ephemera() # all images are new.  Ignore what was created.
     
     # Dictionary of stacks, one for each type of ephemeral
     self.stacks = {}
     self.stacks[PF_VECTORS] = GimpStack("Path") # Path stack always empty
     # The other stacks are initialized by passed image and drawable, or empty.
-    self.stacks[PF_IMAGE] = GimpStack("Image", a_image)
-    self.stacks[PF_DRAWABLE] = GimpStack("Drawable", a_drawable)
+    self.stacks[PF_IMAGE] = GimpStack("Image", a_image.ID)
+    self.stacks[PF_DRAWABLE] = GimpStack("Drawable", a_drawable.ID)
     # We put a drawable on two stacks
     if pdb.gimp_drawable_is_layer(a_drawable):
       # a_drawable.type == PDB_LAYER: # Doesn't work??
-      self.stacks[PF_LAYER] = GimpStack("Layer", a_drawable)
+      self.stacks[PF_LAYER] = GimpStack("Layer", a_drawable.ID)
       # If a layer was passed in, channel stack is empty
       self.stacks[PF_CHANNEL] = GimpStack("Channel")
     elif pdb.gimp_drawable_is_channel(a_drawable):
       # a_drawable.type == PF_CHANNEL:
-      self.stacks[PF_CHANNEL] = GimpStack("Channel", a_drawable)
+      self.stacks[PF_CHANNEL] = GimpStack("Channel", a_drawable.ID)
       self.stacks[PF_LAYER] = GimpStack("Layer")
     else:
       print "Unknown drawable type", a_drawable.type
@@ -104,93 +150,205 @@ class GimpEphemera(object):
       
     # TODO other ephemerals??, etc.
   
-  def _update_ephemera(self):
-    ''' Update our dictionary of ephemera.  '''
-    self.ephemera = {}  # clear, start anew
-    images = gimp.image_list()  # what exists now
-    for image in images:
-      # !!! Note layers, channels, vectors belong to images
-      # but we chunk them all into ephemera together,
-      # not distinguishing two names of the same type on different images.
-      # TODO could be a problem for some wrapper use cases
-      print image.name
-      # !!! Note name is often "Untitled" and image.filename is None
-      # At one time, I used filename but why??
-      self.ephemera[(image.name, PF_IMAGE)] = image
-      for layer in image.layers:
-        print "Layer ", layer.name
-        # !!!! Two entries.  Each will go on their own stack.
-        self.ephemera[(layer.name, PF_LAYER)] = layer
-        self.ephemera[(layer.name, PF_DRAWABLE)] = layer  
-      for channel in image.channels:
-        print "Channel ", channel.name
-        self.ephemera[(channel.name, PF_CHANNEL)] = channel
-        self.ephemera[(channel.name, PF_DRAWABLE)] = channel  # !!!! Two entries
-      # vector aka path
-      for vector in image.vectors:
-        print "Path ", vector.name
-        self.ephemera[(vector.name, PF_VECTORS)] = vector # !!! VECTORS with an S
-  
-  def _update_stack(self, a_type):
-    ''' Update our stack of the given type'''
-    
-    # make dictionaries by name for objects of type, from ephemera now and then
-    now = self._dict_by_name(self.ephemera, a_type)
-    then = self._dict_by_name(self.prior_ephemera, a_type)
-    
-    # Diff to find a recently created object
-    diff_name = set(now)-set(then) # difference dictionary keys using sets
-    if len(diff_name) == 1: # TODO filename for images???
-      for name in diff_name:  # Only one, but can't index sets
-        self.stacks[a_type].push(now[name]) # push recently created object
-    elif len(diff_name) > 1:
-      print diff_name
-      raise RuntimeError("Many ephemera of same type created by one command")
-    # else zero, pass
+  def _update_ephemera(self, refresh_names=True):
+    '''
+    Update our tables of ephemera, from new, deleted, and touched images.
+    If refresh_names, also names of items of touched images (else only new items are named.)
+    Return list of (type, ID) of ephemera created, in order of creation.
+    '''
+    created = []
+    num_images, image_IDs = self._image_list()  # what exists now, one round-trip, IDs only
+    for imageID in set(self.images) - set(image_IDs): # image deleted, and its layers etc. with it
+      self._forget_image(imageID)
+    for imageID in sorted(image_IDs):
+      if imageID > self.image_watermark:
+        created.append((PF_IMAGE, imageID))
+      if imageID not in self.images or imageID in self.touched:
+        created.extend(self._scan_image(imageID, refresh_names))
+    self.touched = set()
+    for a_type, an_ID in created:
+      if a_type == PF_IMAGE:
+        self.image_watermark = max(self.image_watermark, an_ID)
+      else:
+        self.item_watermark = max(self.item_watermark, an_ID)
+    return created
+  
+  def _scan_image(self, imageID, refresh_names):
+    '''
+    Query Gimp for IDs of items of image, updating our tables.
+    If refresh_names, also query names of items already known, reindexing those renamed.
+    Return list of (type, ID) of items created (above watermark), in order of creation.
+    '''
+    image = gimp._id2image(imageID)
+    # !!! Note name is often "Untitled" and image.filename is None
+    # At one time, I used filename but why??
+    self._name_image(imageID, image.name)
+    print image.name
+    created = []
+    now = set()
+    for a_type, get_IDs in self._item_getters:
+      count, item_IDs = get_IDs(image)
+      now.update(item_IDs)
+      for an_ID in item_IDs:
+        known = self.items.get(an_ID)
+        if known is None or refresh_names: # a round-trip, for the name
+          name = self._object_of(a_type, an_ID).name
+        else:
+          name = known[1]
+        if known is None or known[1] != name: # new, or renamed
+          if known is not None:
+            self._unindex(known[0], known[1], an_ID)
+          self.items[an_ID] = (a_type, name, imageID)
+          self._index(a_type, name, an_ID)
+        elif known[2] != imageID: # moved from another image
+          self.items[an_ID] = (known[0], known[1], imageID)
+        if an_ID > self.item_watermark:
+          created.append((a_type, an_ID))
+        # !!! An item not yet in any image (e.g. by gimp_layer_new) is not seen, and not created
+        # if a later created item raised the watermark above it before it was added to an image.
+    for an_ID in self.image_items.get(imageID, ()):
+      if an_ID not in now:
+        # Deleted, or moved to another image (then scanning that image restores it.)
+        self._forget_item(an_ID, imageID)
+    self.image_items[imageID] = now
+    created.sort(key=lambda (a_type, an_ID): an_ID)
+    return created
+  
+  def _name_image(self, imageID, name):
+    ''' Enter image into our tables, or rename it. '''
+    if self.images.get(imageID) != name:
+      if imageID in self.images:
+        self._unindex(PF_IMAGE, self.images[imageID], imageID)
+      self.images[imageID] = name
+      self._index(PF_IMAGE, name, imageID)
+  
+  def _forget_image(self, imageID):
+    ''' Remove deleted image and its items from our tables. '''
+    self._unindex(PF_IMAGE, self.images.pop(imageID), imageID)
+    for an_ID in self.image_items.pop(imageID, ()):
+      self._forget_item(an_ID, imageID)
+  
+  def _forget_item(self, an_ID, imageID):
+    ''' Remove item gone from image from our tables, unless since found in another image. '''
+    a_type, name, item_imageID = self.items.get(an_ID, (None, None, None))
+    if item_imageID == imageID:
+      del self.items[an_ID]
+      self._unindex(a_type, name, an_ID)
+  
+  def _index(self, a_type, name, an_ID):
+    self.names[a_type].setdefault(name, set()).add(an_ID)
+  
+  def _unindex(self, a_type, name, an_ID):
+    IDs = self.names[a_type][name]
+    IDs.discard(an_ID)
+    if not IDs:
+      del self.names[a_type][name]
+  
+  def _is_valid(self, a_type, an_ID):
+    ''' Does object still exist?  Cheap: our tables are up to date with every image a command could change. '''
+    if a_type == PF_IMAGE:
+      return an_ID in self.images
+    else:
+      return an_ID in self.items
+  
+  def _object_of(self, a_type, an_ID):
+    ''' pygimp object for ID, to hand to a command. '''
+    if a_type == PF_IMAGE:
+      return gimp._id2image(an_ID)
+    elif a_type == PF_VECTORS:
+      return gimp._id2vectors(an_ID)
+    else: # Layer, channel, drawable
+      return gimp._id2drawable(an_ID)
+  
+  def _touch(self, a_type, an_ID):
+    ''' Remember the image of an object handed to a command, to rescan at next update. '''
+    if a_type == PF_IMAGE:
+      self.touched.add(an_ID)
+    elif an_ID in self.items and self.items[an_ID][2] is not None:
+      self.touched.add(self.items[an_ID][2])
+  
+  def _update_stacks(self, created):
+    ''' Update our stacks of ephemera: drop deleted, push created.  '''
+    for a_type in EPHEMERAL_TYPES:
+      self.stacks[a_type].remove_invalid(lambda an_ID: self._is_valid(a_type, an_ID))
+    self._push_created(created)
+  
+  def _push_created(self, created):
+    ''' Push (type, ID) of created objects on our stacks. '''
+    # A command can create many objects of a type, e.g. duplicating an image.  The last created is active.
+    for a_type, an_ID in created:
+      self.stacks[a_type].push(an_ID) # push recently created object
+      if a_type in (PF_LAYER, PF_CHANNEL):
+        self.stacks[PF_DRAWABLE].push(an_ID) # !!!! Two stacks
     
-    # Diff to find recently deleted object
-    diff_name = set(then)-set(now) # difference dictionary keys using sets
-    if len(diff_name) == 1:
-      for name in diff_name:  # Only one, but can't index sets
-        self.stacks[a_type].pop() # pop recently deleted object then[name]
-    elif len(diff_name) > 1:
-      print diff_name
-      raise RuntimeError("Many ephemera deleted by one command")
-      
-  def _update_stacks(self):
-    ''' Update our stacks of ephemera.  '''
-    # !!! this list must match the one in parameters.py
-    for a_type in (PF_IMAGE, PF_DRAWABLE, PF_LAYER, PF_CHANNEL, PF_VECTORS):
-      self._update_stack(a_type)
-      
-  def _copy_ephemera_keys(self):
-    ''' Return a dictionary whose keys are copy of ephemera. Values are not needed. '''
-    result = {}
-    for (keyname, keytype) in self.ephemera.iterkeys():
-      result[(keyname, keytype)] = True
-    return result
+  def update(self, refresh_names=True):
+    '''
+    Refresh ephemera by querying Gimp, after a command.
+    refresh_names False means the command's effects are known, and don't rename objects
+    (see map_procedures.procname_to_effects): names of known items are not fetched again.
+    '''
+    self._update_stacks(self._update_ephemera(refresh_names))
+  
+  def push(self, a_type, an_object):
+    '''
+    Make an object returned by a command the active object of its type.  Return the object.
     
-  def update(self):
-    ''' Refresh ephemera by querying Gimp '''
-    self._update_ephemera()
-    self._update_stacks() # diff ephemera and prior_ephemera
-    # !!! Remember keys of prior_ephemera for the next update
-    self.prior_ephemera = self._copy_ephemera_keys()
-      
-  def _dict_by_name(self, a_ephemera, a_type):
-    ''' Return dict keyed by name of ephemera of type '''
-    result = {}
-    for (keyname, keytype) in a_ephemera.iterkeys():
-      if keytype == a_type:
-        result[keyname] = a_ephemera[(keyname, keytype)]
-    return result
+    The wrapper calls this with the ephemeral return values of a command,
+    instead of inferring created objects by update(), i.e. by querying Gimp.
+    The object might not be in an image yet, e.g. as returned by gimp_layer_new.
+    !!! Such an object deleted before it is added to an image stays on our stacks.
+    '''
+    if an_object is None: # Gimp returned -1, e.g. there is no active layer
+      return None
+    an_ID = an_object.ID
+    if a_type == PF_IMAGE:
+      self._name_image(an_ID, an_object.name)
+      self.touched.add(an_ID) # so the next update, if any, finds its items, e.g. of a duplicated image
+      self.image_watermark = max(self.image_watermark, an_ID)
+    else:
+      if a_type == PF_DRAWABLE: # stacked by its subtype
+        if pdb.gimp_drawable_is_layer(an_object):
+          a_type = PF_LAYER
+        else:
+          a_type = PF_CHANNEL
+      if an_ID not in self.items:
+        image = getattr(an_object, "image", None)
+        imageID = image and image.ID
+        self.items[an_ID] = (a_type, an_object.name, imageID)
+        self._index(a_type, an_object.name, an_ID)
+        if imageID is not None:
+          self.image_items.setdefault(imageID, set()).add(an_ID)
+      self.item_watermark = max(self.item_watermark, an_ID)
+    self._push_created([(a_type, an_ID)])
+    return an_object
       
 
   def top(self, a_type):
     ''' Return ephemeral object for stack of active object of given type. '''
-    result = self.stacks[a_type].top()
-    print "Top ", str(self.stacks[a_type]), result.name
-    return result
+    an_ID = self.stacks[a_type].top()
+    print "Top ", str(self.stacks[a_type]), an_ID
+    self._touch(a_type, an_ID)
+    return self._object_of(a_type, an_ID)
+
+  def _find(self, a_type, a_name):
+    '''
+    Return ID of ephemeral object having given name and type, or None.
+    Constant time, by our name indexes: looking up a drawable looks in the layer and channel indexes.
+    
+    Same named objects can be in different images, e.g. "Background".
+    Prefer the one in the active image, else the most recently created.
+    '''
+    found = []
+    for indexed_type in LOOKUP_INDEXES.get(a_type, ()):
+      found.extend(self.names[indexed_type].get(a_name, ()))
+    if len(found) <= 1:  # usual
+      return found and found[0] or None
+    if a_type != PF_IMAGE:
+      active_images = self.stacks[PF_IMAGE][-1:]
+      in_active = [an_ID for an_ID in found if self.items[an_ID][2] in active_images]
+      if in_active:
+        return max(in_active)
+    return max(found)
 
   def lookup(self, a_type, a_name):
     ''' 
@@ -202,14 +360,10 @@ class GimpEphemera(object):
     If looking up more specifically a layer (or channel)
     return only a layer or channel of given name
     '''
-    for (keyname, keytype) in self.ephemera.iterkeys():
-      if a_name == keyname:
-        if a_type == keytype or (
-          a_type == PF_DRAWABLE and (
-            keytype == PF_LAYER or
-            keytype == PF_CHANNEL
-          )):
-          return self.ephemera[(keyname, keytype)]
+    an_ID = self._find(a_type, a_name)
+    if an_ID is not None:
+      self._touch(a_type, an_ID)
+      return self._object_of(a_type, an_ID)
     '''
     !!! Note we omit REGION and DISPLAY, no need for them in wrapper plugins?
     !!! Note that PF_REGION is deprecated since gimp-2.7 ??
@@ -229,6 +383,3 @@ class GimpEphemera(object):
     # TODO the user can  miss this.  Make it a dialog, but how? raise RuntimeError also is silent
     
 
-
-
-  
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+'''
+Spec files: a GimpScripterSpec (see specification.py) in a file,
+so wrappers can be generated without the GUI, e.g. many at once by tools/batch_generate.py,
+and a wrapper can be reopened in the GUI and changed, without choosing its commands again.
+generate.py saves one beside each wrapper it generates (see path_for_wrapper()),
+which loads back to an equal spec.
+
+A spec file is a Python literal (read by ast.literal_eval, never executed), a dictionary:
+
+  {
+  "version" : 1,
+  "menuname" : "Blur twice",          # of the wrapper, as the user enters it in the GUI
+  "undo_mode" : 0,                    # optional, see specification.UNDO_FOO
+  "commands" : [                      # in order
+    {
+    "name" : "plug-in-gauss",         # PDB name, or name of a macro
+    "pathstring" : "Filters/Blur/Gaussian Blur...", # optional: menu path user chose it by, else the command's
+    "values" : [5.0, 5.0, 0],         # optional: values of nonhidden parameters in order, else defaults
+    "defers" : [False, True, False],  # optional: which nonhidden parameters are deferred, else none
+    "is_use_last" : False,            # optional
+    },
+    ],
+  }
+
+Values of ephemeral parameters (image, layer, ...) are names, as the user enters them in the GUI.
+Colors are tuples, or as the GUI enters them, gimpcolor.RGB saved as a dictionary { "RGB" : (r, g, b, a) }.
+The plugin db (see mockmenu/plugindb.py) must be loaded: the parameters of commands come from it.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import os
+import ast
+import gimpcolor
+
+from gimpscripter import specification
+from gimpscripter.mockmenu import plugindb
+
+
+# Bump this whenever the layout of a spec file changes.
+FORMAT_VERSION = 1
+
+SPEC_FILE_SUFFIX = ".gsspec"
+
+
+class SpecFileError(RuntimeError): pass
+
+
+def path_for_wrapper(wrapperpath):
+  ''' Path of spec file beside a wrapper: same name, different suffix. '''
+  return os.path.splitext(wrapperpath)[0] + SPEC_FILE_SUFFIX
+
+
+def dumps(spec):
+  '''
+  Return text of spec file for spec.
+  Same spec, same text (no dictionary order), one line per command.
+  '''
+  commands = spec.commands
+  lines = []
+  for position, command in enumerate(commands.command_list):
+    lines.append('  {"name" : %r, "pathstring" : %r, "values" : %r, "defers" : %r, "is_use_last" : %r},' % (
+      command.name, command.pathstring,
+      [_encode_value(value) for value in commands.param_list.get_nonhidden_values_for(position)],
+      commands.param_list.get_defers_for(position),
+      command.is_use_last))
+  return '{\n"version" : %r,\n"menuname" : %r,\n"undo_mode" : %r,\n"commands" : [\n%s\n  ],\n}\n' % (
+    FORMAT_VERSION, spec.wrapping.menuname, spec.wrapping.undo_mode, "\n".join(lines))
+
+def _encode_value(value):
+  if isinstance(value, gimpcolor.RGB):
+    return { "RGB" : (value.r, value.g, value.b, value.a) }
+  return value
+
+def _decode_value(value):
+  if isinstance(value, dict) and value.keys() == ["RGB"]:
+    return gimpcolor.RGB(*value["RGB"])
+  return value
+
+
+def load(filepath):
+  ''' Return GimpScripterSpec read from spec file at filepath.  Raise SpecFileError if invalid. '''
+  with open(filepath, "r") as f:
+    text = f.read()
+  try:
+    definition = ast.literal_eval(text)
+  except (SyntaxError, ValueError), e:
+    raise SpecFileError("%s: not a Python literal: %s" % (filepath, e))
+  try:
+    return spec_of(definition)
+  except SpecFileError, e:
+    raise SpecFileError("%s: %s" % (filepath, e))
+
+
+def spec_of(definition):
+  ''' Return GimpScripterSpec for definition, a dictionary as in a spec file. '''
+  if not isinstance(definition, dict):
+    raise SpecFileError("not a dictionary")
+  if definition.get("version") != FORMAT_VERSION:
+    raise SpecFileError("format version %r, expected %r" % (definition.get("version"), FORMAT_VERSION))
+
+  spec = specification.GimpScripterSpec()
+  spec.wrapping.set_menu_name(definition.get("menuname", ""))
+  if not spec.wrapping.menuname:
+    raise SpecFileError("no menuname")
+  spec.wrapping.set_undo_mode(definition.get("undo_mode", specification.UNDO_STEPS))
+  if spec.wrapping.undo_mode not in range(len(specification.UNDO_MODE_LABELS)):
+    raise SpecFileError("unknown undo_mode %r" % spec.wrapping.undo_mode)
+
+  commands = definition.get("commands")
+  if not commands:
+    raise SpecFileError("no commands")
+  for position, command_definition in enumerate(commands):
+    append_command(spec.commands, position, command_definition)
+  return spec
+
+
+def append_command(commands, position, definition):
+  ''' Append to commands a command for definition, a dictionary as in a spec file. '''
+  name = definition.get("name")
+  if name not in plugindb.plugindb:
+    raise SpecFileError("command %d: unknown command %r" % (position, name))
+  command = specification.CommandSpec(name, definition.get("pathstring", plugindb.plugindb[name].menupath))
+  command.set_is_use_last(bool(definition.get("is_use_last", False)))
+  commands.append(command)
+
+  param_list = commands.param_list
+  values = [_decode_value(value) for value in definition.get("values", param_list.get_nonhidden_defaults_for(position))]
+  defers = list(definition.get("defers", [False] * len(values)))
+  expected = len(param_list.get_nonhidden_pdefs_for(position))
+  if len(values) != expected or len(defers) != expected:
+    raise SpecFileError("command %d (%s): %d values and %d defers, expected %d of each"
+      % (position, name, len(values), len(defers), expected))
+  param_list.preset(values, defers, command_index=position)
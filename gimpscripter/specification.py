@@ -25,6 +25,16 @@ from gimpfu import *
 from gimpscripter import parameters
 from gimpscripter import parse_params
 from gimpscripter import macros
+from gimpscripter.mockmenu import plugindb
+
+# Undo modes of a wrapping plugin, see WrappingPluginSpec.
+UNDO_STEPS = 0    # as Gimp does: undo steps for each command
+UNDO_GROUP = 1    # one undo step for all commands
+UNDO_DISABLED = 2 # no undo steps at all, for batch use: faster and less memory
+# Modes other than UNDO_STEPS affect only the image the wrapper is run on, not images its commands create.
+# Labels, by mode, for the GUI
+UNDO_MODE_LABELS = ("Undo each command", "Undo all commands at once, in the current image",
+  "No undo in the current image (batch)")
 
 class GimpScripterSpec(object):
   '''
@@ -54,15 +64,20 @@ class WrappingPluginSpec(object):
 
   wrappingmenuitem: of wrapping plugin, user chose.
   wrappingmenupath: TODO
+  undo_mode: how the wrapping plugin's commands are undone, one of UNDO_FOO above.
   '''
   def __init__(self):
     self.menuname = ""
     self.name = "bar"  # TODO User given name
     self.blurb = "zed"  # TODO User given blurb
+    self.undo_mode = UNDO_STEPS
     
   def set_menu_name(self, name):
     self.menuname = name
     
+  def set_undo_mode(self, mode):
+    self.undo_mode = mode
+    
 
 
 class Commands(object):
@@ -82,12 +97,30 @@ class Commands(object):
   
   def append(self, command):
     ''' Append command to command list '''
-    self.param_list.insert_params_of(command, len(self))
-    command.position = len(self)
-    self.command_list.append(command)
+    self.insert(len(self), command)
     
-  
-  # TODO insert, remove
+  def insert(self, position, command):
+    ''' Insert command in command list before position '''
+    self.param_list.insert_params_of(command, position)
+    self.command_list.insert(position, command)
+    self._renumber(position)
+    
+  def remove(self, position):
+    ''' Remove command at position from command list '''
+    self.param_list.delete_params_of(position)
+    del self.command_list[position]
+    self._renumber(position)
+    
+  def move(self, position, new_position):
+    ''' Move command at position to new_position in command list, e.g. up one is new_position = position - 1 '''
+    self.param_list.move_params_of(position, new_position)
+    self.command_list.insert(new_position, self.command_list.pop(position))
+    self._renumber(min(position, new_position))
+    
+  def _renumber(self, position):
+    ''' Commands from position on have changed position. '''
+    for index in range(position, len(self)):
+      self.command_list[index].position = index
   
   def get_parms_for(self, position):
     ''' Return list of parms for command at position'''
@@ -107,10 +140,11 @@ class Commands(object):
     This must be command by command, it can't be just over the aggregate parameter list.
     '''
     for command in self.command_list:
-      # Assume all macros access hidden params
+      # Assume macros that use the runtime access hidden params
       # TODO take all this special case code out, just ask the command and have subclasses.
       if macros.is_macro(command.name):
-        return True
+        if macros.uses_ephemera(command.name):
+          return True
       else:
         # Not a macro, look at the params for this command
         # Alternatively we could call the pdb for the pdefs
@@ -139,10 +173,9 @@ class Commands(object):
     '''
     Does any command in sequence have ephemeral parameters?
     Or use ephemeral parameters internally to a macro?
-    For now, assume all macros use ephemeral parameters internally.
-    TODO relax this assumption
     '''
-    return self.param_list.has_ephemeral_params() or self.has_macros()
+    return self.param_list.has_ephemeral_params() or any(
+      [macros.uses_ephemera(command.name) for command in self.command_list if command.is_macro()])
   
   
   def has_user_enterable_params(self):
@@ -165,6 +198,8 @@ class CommandSpec(object):
   
   name: command name for which user chose menu item
   '''
+  __slots__ = ("name", "is_use_last", "position", "pathstring")
+  
   def __init__(self, name, pathstring):
     self.name = name
     self.is_use_last = False
@@ -194,7 +229,16 @@ class CommandSpec(object):
       print "A Macro"
       return macros.get_pdefs_for(self.name)
     else:
-      return pdb[self.name].params
+      # Lazy, memoized in our db, fetched from Gimp pdb[self.name].params on first use
+      return plugindb.plugindb[self.name].params
+  
+  def get_return_paramdefs(self):
+    ''' Get the paramdefs of the return values of this command. '''
+    if macros.macros.has_key(self.name):
+      return ()
+    else:
+      # Lazy as params
+      return plugindb.plugindb[self.name].return_vals
       
   def is_macro(self):
     # TODO refactor using classes
@@ -47,9 +47,11 @@ def plugin_main($wrappingmainformalparams): # <= formal parameters
   # Any other non-constant arguments have names which match formal parameters to plugin_main above 
   # and paramdefs in register() below: they are deferred and a Gimp dialog will ask user for values.
 $prelude # <= prelude
+$undoprelude # <= undo mode
   #
 $wrappingmainbody # <= body
   #
+$undopostlude # <= undo mode
 $postlude # <= postlude
 
   
@@ -85,15 +87,15 @@ Template for the summary.
 '''
 summarytemplate = Template(
 r'''
-Created wrapper plugin: $wrappingmenupath.
+$wrappingstatus wrapper plugin: $wrappingmenupath.
   
 Its description is: $wrappingblurb
   
 It requires an open image of mode: any.
   
-To change the wrapper plugin later, create a wrapper plugin with the same name.
+To change the wrapper plugin later, open its spec file $specpath (Open... in GimpScripter), change it, and create it again.
   
-To remove the wrapper plugin, delete the file: $filepath. To distribute the wrapper plugin, distribute the same file.
+To remove the wrapper plugin, delete the file: $filepath and its spec file. To distribute the wrapper plugin, distribute the same file.
   
 The wrapper plugin will appear in Gimp menus after you restart Gimp.
 '''
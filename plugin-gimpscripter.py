@@ -82,8 +82,13 @@ def plugin_main():
     from gimpscripter.mockmenu import plugindb # glue to the Gimp PDB
     dictofviews = plugindb.dictofviews.copy()
     
-    app = main_gui.gimpscripterApp(dictofviews)  # create instance of gtkBuilder app
+    # Views are on an empty db until plugindb.load().
+    # App loads it after its window shows, so the user isn't kept waiting.
+    app = main_gui.gimpscripterApp(dictofviews, load_db=plugindb.load)  # create instance of gtkBuilder app
     app.main()  # event loop for app
+    
+    # Persist whatever was lazily fetched from the PDB this session
+    plugindb.save()
 
 
 
@@ -0,0 +1,60 @@
+'''
+Set up tests to run without Gimp, on the fake modules of tools/fakegimp (see fakegimp/fakepdb.py.)
+Import this before anything that imports gimp, gimpfu, or gimpscripter.
+
+The fake PDB is synthetic, small and seeded, with the Gimp internal procedures the mock menu offers,
+and the user's Gimp directory is a new temporary directory.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import unittest
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.dirname(TESTS_DIRECTORY)
+TOOLS_DIRECTORY = os.path.join(SOURCE_DIRECTORY, "tools")
+
+# Configure fake PDB before it is imported
+os.environ.setdefault("FAKEGIMP_SIZE", "200")
+os.environ.setdefault("FAKEGIMP_SEED", "0")
+for directory in (TOOLS_DIRECTORY, os.path.join(TOOLS_DIRECTORY, "fakegimp"), SOURCE_DIRECTORY):
+  if directory not in sys.path:
+    sys.path.insert(0, directory)
+
+import gimp
+import fakepdb
+from gimpscripter.mockmenu import map_procedures
+gimp.pdb.set_procedures(fakepdb.synthetic_procedures(0, internal_names=map_procedures.menu_to_procname.values())
+  + gimp.pdb.procedures.values())
+
+# The plugin db imports db_treemodel, which imports PyGTK (but needs no display.)
+try:
+  import gtk
+  HAVE_GTK = True
+except ImportError:
+  HAVE_GTK = False
+
+requires_gtk = unittest.skipUnless(HAVE_GTK, "PyGTK not installed")
+
+
+def quietly(function, *args):
+  ''' Call function without GimpScripter's chatter on stdout.  Return its result. '''
+  saved = sys.stdout
+  sys.stdout = open(os.devnull, "w")
+  try:
+    return function(*args)
+  finally:
+    sys.stdout = saved
+
+def load_plugindb():
+  ''' Return the plugindb module, its db loaded (once per process.) '''
+  from gimpscripter.mockmenu import plugindb
+  quietly(plugindb.load)
+  return plugindb
@@ -0,0 +1,76 @@
+'''
+Tests of FilterDict: incremental filtering, narrowing and widening the pattern as the user types,
+with and without a search index, gives what filtering the whole db from scratch gives.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import unittest
+
+import offline
+
+# As typed: narrowing one character at a time, widening by backspace, replacing, changing case.
+PATTERNS = ["b", "bl", "blu", "blur", "blur/", "blu", "b", "", "/", "-", "_", "Blur/G", "blur/g",
+  "noise", "noise map", "zzz", "zz", "", "SYNTHETIC-1", "synthetic-12", "filters", ""]
+
+
+def scanned(db, pattern):
+  ''' Set of names of db whose name or menupath contains pattern, from scratch. '''
+  pattern = pattern.lower()
+  return set([name for name, procedure in db.iteritems()
+    if pattern in name.lower() or pattern in procedure.menupath.lower()])
+
+
+@offline.requires_gtk
+class FilterDictTest(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    cls.plugindb = offline.load_plugindb()
+
+  def new_filterdict(self, index):
+    from gimpscripter.mockmenu import db_treemodel
+
+    filterdict = db_treemodel.FilterDict(("menupath",), index)
+    filterdict.update(dict.fromkeys(self.plugindb.plugindb, True))  # all pass, as before any search
+    return filterdict
+
+  def check_patterns(self, filterdict):
+    db = self.plugindb.plugindb
+    before = dict(filterdict)
+    for pattern in PATTERNS:
+      changed = filterdict.filter(db, pattern)
+      self.assertEqual(set([name for name, truth in filterdict.iteritems() if truth]), scanned(db, pattern),
+        "pattern %r" % pattern)
+      self.assertEqual(len(filterdict), len(db))
+      # Changed keys are exactly those whose value changed, each once
+      self.assertEqual(sorted(changed), sorted([name for name in db if filterdict[name] != before[name]]),
+        "pattern %r" % pattern)
+      before = dict(filterdict)
+
+  def test_scan(self):
+    self.check_patterns(self.new_filterdict(None))
+
+  def test_indexed(self):
+    from gimpscripter.mockmenu import searchindex
+    from gimpscripter.mockmenu import plugindb
+
+    index = searchindex.SearchIndex(plugindb._search_text)
+    index.update(self.plugindb.plugindb)
+    self.check_patterns(self.new_filterdict(index))
+
+  def test_index_same_as_scan(self):
+    ''' Index of the loaded plugin db, including short patterns, which it scans. '''
+    db = self.plugindb.plugindb
+    for pattern in PATTERNS:
+      if pattern:
+        self.assertEqual(self.plugindb.pluginindex.search(pattern), scanned(db, pattern), "pattern %r" % pattern)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,87 @@
+'''
+Tests of writing generated files: a wrapper (or spec file) with unchanged text is not rewritten,
+so Gimp doesn't query it again, and a changed one is replaced whole, with its mode.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import stat
+import shutil
+import tempfile
+import unittest
+
+import offline
+
+PERMISSIONS = stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO
+EXECUTABLE = stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH
+
+
+@offline.requires_gtk
+class WriteIfChangedTest(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    cls.plugindb = offline.load_plugindb()
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp(prefix="gimpscripter-test-")
+    self.filepath = os.path.join(self.directory, "plugin-wrapper-test.py")
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def past(self, filepath):
+    ''' Set the file's mtime an hour back, so a rewrite would show.  Return it. '''
+    mtime = os.stat(filepath).st_mtime - 3600
+    os.utime(filepath, (mtime, mtime))
+    return os.stat(filepath).st_mtime
+
+  def test_unchanged_not_written(self):
+    from gimpscripter import generate
+
+    self.assertTrue(generate.write_if_changed(self.filepath, "text\n"))
+    mtime = self.past(self.filepath)
+    self.assertFalse(generate.write_if_changed(self.filepath, "text\n"))
+    self.assertEqual(os.stat(self.filepath).st_mtime, mtime)
+    self.assertEqual(os.listdir(self.directory), ["plugin-wrapper-test.py"])
+
+  def test_changed_replaced(self):
+    from gimpscripter import generate
+
+    self.assertTrue(generate.write_if_changed(self.filepath, "old\n", stat.S_IRUSR | stat.S_IWUSR))
+    self.past(self.filepath)
+    self.assertTrue(generate.write_if_changed(self.filepath, "new\n"))
+    with open(self.filepath) as f:
+      self.assertEqual(f.read(), "new\n")
+    self.assertEqual(os.stat(self.filepath).st_mode & PERMISSIONS, stat.S_IRWXU)
+    self.assertEqual(os.listdir(self.directory), ["plugin-wrapper-test.py"])  # no temporary file left
+
+  def test_generated_files(self):
+    ''' Generating a wrapper writes it executable, and its spec file not, and again writes neither. '''
+    import profile_offline
+    from gimpscripter import generate
+
+    names = sorted([name for name in self.plugindb.plugindb if name.startswith("plug-in-synthetic-")])[:2]
+    spec = offline.quietly(profile_offline.spec_of, self.plugindb, names, "Write test")
+    wrapperpath = offline.quietly(profile_offline.generate, spec)
+    specpath = generate.substitutions["specpath"]
+    self.assertTrue(os.stat(wrapperpath).st_mode & stat.S_IXUSR)
+    self.assertFalse(os.stat(specpath).st_mode & EXECUTABLE)
+    self.assertEqual([name for name in os.listdir(os.path.dirname(wrapperpath)) if name.endswith(".tmp")], [])
+
+    spec_mtime = self.past(specpath)
+    wrapper_mtime = self.past(wrapperpath)
+    offline.quietly(profile_offline.generate, spec)
+    self.assertEqual(generate.substitutions["wrappingstatus"], "Unchanged (file not rewritten)")
+    self.assertEqual(os.stat(wrapperpath).st_mtime, wrapper_mtime)
+    self.assertEqual(os.stat(specpath).st_mtime, spec_mtime)
+
+
+if __name__ == "__main__":
+  unittest.main()
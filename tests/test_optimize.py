@@ -0,0 +1,177 @@
+'''
+Tests of the passes of optimize.py, on statements as generate.py makes them.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import unittest
+
+import offline
+from gimpscripter import optimize
+from gimpscripter.optimize import Statement, CALL, UPDATE, PUSH, COMMENT, BINDING
+
+
+def pairs(statements):
+  ''' Comparable (kind, text) of statements '''
+  return [(statement.kind, statement.text) for statement in statements]
+
+def statements(*kind_texts):
+  return [Statement(kind, text) for kind, text in kind_texts]
+
+FLUSH = (CALL, "pdb.gimp_displays_flush()")
+CONTEXT_PUSH = (CALL, "pdb.gimp_context_push()")
+CONTEXT_POP = (CALL, "pdb.gimp_context_pop()")
+
+
+class StatementsTest(unittest.TestCase):
+
+  def test_statements_of_macro_text(self):
+    text = "  pdb.gimp_context_push()\n  pdb.gimp_context_set_brush(\"Circle\")\n\n  pdb.gimp_context_pop()\n"
+    self.assertEqual(pairs(optimize.statements_of(CALL, text)),
+      [CONTEXT_PUSH, (CALL, "pdb.gimp_context_set_brush(\"Circle\")"), CONTEXT_POP])
+
+  def test_emit_indents(self):
+    self.assertEqual(optimize.emit(statements((COMMENT, "# Blur"), FLUSH), "    "),
+      "    # Blur\n    pdb.gimp_displays_flush()\n")
+
+
+class CoalesceFlushesTest(unittest.TestCase):
+
+  def test_one_flush_at_end(self):
+    before = statements(
+      (CALL, "pdb.plug_in_blur(image, drawable)"),
+      FLUSH,
+      (UPDATE, "ephemera.update()"),
+      (CALL, "pdb.plug_in_sharpen(image, drawable, 10)"),
+      FLUSH)
+    after = [
+      (CALL, "pdb.plug_in_blur(image, drawable)"),
+      (UPDATE, "ephemera.update()"),
+      (CALL, "pdb.plug_in_sharpen(image, drawable, 10)"),
+      FLUSH]
+    self.assertEqual(pairs(optimize.coalesce_flushes(before)), after)
+
+  def test_no_flush_added(self):
+    before = statements((CALL, "pdb.plug_in_blur(image, drawable)"), (UPDATE, "ephemera.update()"))
+    self.assertEqual(pairs(optimize.coalesce_flushes(before)), pairs(before))
+
+
+class DropContextPairsTest(unittest.TestCase):
+
+  def test_pair_around_comment(self):
+    before = statements(CONTEXT_PUSH, (COMMENT, "# nothing"), CONTEXT_POP)
+    self.assertEqual(pairs(optimize.drop_context_pairs(before)), [(COMMENT, "# nothing")])
+
+  def test_nested_pairs(self):
+    before = statements((CALL, "pdb.plug_in_blur(image, drawable)"),
+      CONTEXT_PUSH, CONTEXT_PUSH, CONTEXT_POP, CONTEXT_POP)
+    self.assertEqual(pairs(optimize.drop_context_pairs(before)), [(CALL, "pdb.plug_in_blur(image, drawable)")])
+
+  def test_pair_around_call_kept(self):
+    before = statements(CONTEXT_PUSH, (CALL, "pdb.gimp_context_set_brush(\"Circle\")"), CONTEXT_POP)
+    self.assertEqual(pairs(optimize.drop_context_pairs(before)), pairs(before))
+
+
+class HoistStackTopsTest(unittest.TestCase):
+
+  def test_hoist_until_push(self):
+    before = statements(
+      (CALL, "pdb.plug_in_foo(ephemera.top(PF_LAYER))"),
+      (CALL, "pdb.plug_in_bar(ephemera.top(PF_LAYER), ephemera.top(PF_IMAGE))"),
+      (PUSH, "ephemera.push(PF_LAYER, layer0)"),
+      (CALL, "pdb.plug_in_baz(ephemera.top(PF_LAYER))"),
+      (CALL, "pdb.plug_in_foo(ephemera.top(PF_IMAGE))"))
+    after = [
+      (BINDING, "top_layer = ephemera.top(PF_LAYER)"),
+      (CALL, "pdb.plug_in_foo(top_layer)"),
+      (BINDING, "top_image = ephemera.top(PF_IMAGE)"),
+      (CALL, "pdb.plug_in_bar(top_layer, top_image)"),
+      (PUSH, "ephemera.push(PF_LAYER, layer0)"),
+      (CALL, "pdb.plug_in_baz(ephemera.top(PF_LAYER))"),  # read once since the push
+      (CALL, "pdb.plug_in_foo(top_image)")]  # a layer push doesn't change the image stack
+    self.assertEqual(pairs(optimize.hoist_stack_tops(before)), after)
+
+  def test_rebind_after_update(self):
+    before = statements(
+      (CALL, "pdb.plug_in_foo(ephemera.top(PF_DRAWABLE))"),
+      (CALL, "pdb.plug_in_foo(ephemera.top(PF_DRAWABLE))"),
+      (UPDATE, "ephemera.update()"),
+      (CALL, "pdb.plug_in_bar(ephemera.top(PF_DRAWABLE))"),
+      (CALL, "pdb.plug_in_bar(ephemera.top(PF_DRAWABLE))"))
+    after = [
+      (BINDING, "top_drawable = ephemera.top(PF_DRAWABLE)"),
+      (CALL, "pdb.plug_in_foo(top_drawable)"),
+      (CALL, "pdb.plug_in_foo(top_drawable)"),
+      (UPDATE, "ephemera.update()"),
+      (BINDING, "top_drawable = ephemera.top(PF_DRAWABLE)"),
+      (CALL, "pdb.plug_in_bar(top_drawable)"),
+      (CALL, "pdb.plug_in_bar(top_drawable)")]
+    self.assertEqual(pairs(optimize.hoist_stack_tops(before)), after)
+
+  def test_layer_push_changes_drawable(self):
+    before = statements(
+      (CALL, "pdb.plug_in_foo(ephemera.top(PF_DRAWABLE))"),
+      (PUSH, "ephemera.push(PF_LAYER, layer0)"),
+      (CALL, "pdb.plug_in_foo(ephemera.top(PF_DRAWABLE))"))
+    self.assertEqual(pairs(optimize.hoist_stack_tops(before)), pairs(before))
+
+
+class BindProceduresTest(unittest.TestCase):
+
+  def test_bind_repeated(self):
+    before = statements(
+      (CALL, "pdb.plug_in_foo(1)"),
+      (COMMENT, "# pdb.plug_in_bar(2)"),
+      (CALL, "pdb.plug_in_bar(2)"),
+      (CALL, "layer0 = pdb.plug_in_foo(3)"))
+    after = [
+      (BINDING, "pdb_plug_in_foo = pdb.plug_in_foo"),
+      (CALL, "pdb_plug_in_foo(1)"),
+      (COMMENT, "# pdb.plug_in_bar(2)"),  # comments are not calls
+      (CALL, "pdb.plug_in_bar(2)"),
+      (CALL, "layer0 = pdb_plug_in_foo(3)")]
+    self.assertEqual(pairs(optimize.bind_procedures(before)), after)
+
+  def test_none_repeated(self):
+    before = statements((CALL, "pdb.plug_in_foo(1)"), (CALL, "pdb.plug_in_bar(2)"))
+    self.assertEqual(pairs(optimize.bind_procedures(before)), pairs(before))
+
+
+class OptimizeTest(unittest.TestCase):
+
+  def test_all_passes(self):
+    ''' A flush per command coalesces across a push and an update, then the other passes see one flush. '''
+    before = statements(
+      (COMMENT, "# Layer>New Layer"),
+      (CALL, "layer0 = pdb.gimp_layer_new(ephemera.top(PF_IMAGE), 10, 10, 0, \"x\", 100, 0)"),
+      (CALL, "pdb.gimp_image_add_layer(ephemera.top(PF_IMAGE), layer0, 0)"),
+      FLUSH,
+      (PUSH, "ephemera.push(PF_LAYER, layer0)"),
+      (COMMENT, "# Filters>Blur>Blur"),
+      (CALL, "pdb.plug_in_blur(ephemera.top(PF_IMAGE), ephemera.top(PF_DRAWABLE))"),
+      FLUSH,
+      (UPDATE, "ephemera.update()"),
+      (CALL, "pdb.plug_in_blur(ephemera.top(PF_IMAGE), ephemera.top(PF_DRAWABLE))"),
+      FLUSH)
+    after = [
+      (BINDING, "pdb_plug_in_blur = pdb.plug_in_blur"),
+      (COMMENT, "# Layer>New Layer"),
+      (BINDING, "top_image = ephemera.top(PF_IMAGE)"),
+      (CALL, "layer0 = pdb.gimp_layer_new(top_image, 10, 10, 0, \"x\", 100, 0)"),
+      (CALL, "pdb.gimp_image_add_layer(top_image, layer0, 0)"),
+      (PUSH, "ephemera.push(PF_LAYER, layer0)"),
+      (COMMENT, "# Filters>Blur>Blur"),
+      (CALL, "pdb_plug_in_blur(top_image, ephemera.top(PF_DRAWABLE))"),
+      (UPDATE, "ephemera.update()"),
+      (CALL, "pdb_plug_in_blur(ephemera.top(PF_IMAGE), ephemera.top(PF_DRAWABLE))"),
+      FLUSH]
+    self.assertEqual(pairs(optimize.optimize(before)), after)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,147 @@
+'''
+Tests of ParamList: unique names, kept incrementally while segments are inserted, removed, and moved,
+are the same as uniquified from scratch.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import random
+import unittest
+
+import offline
+from gimpfu import PDB_INT32
+from gimpscripter import parameters
+
+
+class Command(object):
+  ''' Stands for a CommandSpec: just what ParamList asks of a command. '''
+
+  def __init__(self, name, paramnames):
+    self.name = name
+    self.paramdefs = tuple([(PDB_INT32, paramname, "") for paramname in paramnames])
+
+  def get_paramdefs(self):
+    return self.paramdefs
+
+# Names that clash with each other, and with names made unique (n_1), also after dash => underbar
+COMMANDS = [
+  Command("test-n", ["n"]),
+  Command("test-n-n", ["n", "n"]),
+  Command("test-n_1", ["n_1"]),
+  Command("test-n-1", ["n-1", "radius"]),
+  Command("test-run-mode", ["run-mode", "n", "radius"]),
+  Command("test-none", []),
+  ]
+
+def unique_names(param_list):
+  return [param.unique_name for param in param_list]
+
+def uniquified_from_scratch(segments):
+  ''' Unique names of a new ParamList of segments (Params are renamed.) '''
+  param_list = parameters.ParamList()
+  param_list.segments = list(segments)
+  param_list.uniquify_names()
+  return unique_names(param_list)
+
+def param_list_of(*commands):
+  param_list = parameters.ParamList()
+  for command in commands:
+    param_list.insert_params_of(command, len(param_list.segments))
+  return param_list
+
+
+class UniquifyNamesTest(unittest.TestCase):
+
+  def test_repeated_names(self):
+    ''' n, n, n, n_1 => n, n_2, n_3, n_1 '''
+    param_list = param_list_of(COMMANDS[1], COMMANDS[0], COMMANDS[2])
+    param_list.uniquify_names()
+    self.assertEqual(unique_names(param_list), ["n", "n_2", "n_3", "n_1"])
+
+  def test_unique_name_seen_first(self):
+    ''' n_1, n, n_1 => n_1, n, n_1_2 '''
+    param_list = param_list_of(COMMANDS[2], COMMANDS[0], COMMANDS[2])
+    param_list.uniquify_names()
+    self.assertEqual(unique_names(param_list), ["n_1", "n", "n_1_2"])
+
+  def test_dash_transliterated(self):
+    param_list = param_list_of(COMMANDS[3], COMMANDS[2])
+    param_list.uniquify_names()
+    self.assertEqual(unique_names(param_list), ["n_1", "radius", "n_1_2"])
+
+  def test_formals_shared(self):
+    param_list = param_list_of(COMMANDS[1], COMMANDS[1])
+    self.assertTrue(param_list.segments[0][0].formal is param_list.segments[1][0].formal)
+    self.assertFalse(param_list.segments[0][0] is param_list.segments[1][0])
+
+  def test_edits_same_as_from_scratch(self):
+    ''' Random inserts, removes and moves, uniquifying now and then. '''
+    rand = random.Random(0)
+    param_list = parameters.ParamList()
+    segments = []  # expected segments, by identity
+    for step in range(2000):
+      choice = rand.random()
+      if choice < 0.5 or len(segments) < 2:
+        position = rand.randint(0, len(segments))
+        param_list.insert_params_of(rand.choice(COMMANDS), position)
+        segments.insert(position, param_list.segments[position])
+      elif choice < 0.75:
+        position = rand.randrange(len(segments))
+        param_list.delete_params_of(position)
+        del segments[position]
+      else:
+        position, new_position = rand.randrange(len(segments)), rand.randrange(len(segments))
+        param_list.move_params_of(position, new_position)
+        segments.insert(new_position, segments.pop(position))
+      self.assertEqual(len(param_list.segments), len(segments))
+      for segment, expected in zip(param_list.segments, segments):
+        self.assertTrue(segment is expected)
+      if step % 7 == 0:
+        param_list.uniquify_names()
+        names = unique_names(param_list)
+        self.assertEqual(names, uniquified_from_scratch(segments))
+        self.assertEqual(len(set(names)), len(names))
+
+
+@offline.requires_gtk
+class CommandsTest(unittest.TestCase):
+  ''' Commands keep positions of commands, and their segments of params, in step. '''
+
+  @classmethod
+  def setUpClass(cls):
+    cls.plugindb = offline.load_plugindb()
+
+  def test_edits_renumber(self):
+    from gimpscripter import specification
+
+    names = sorted([name for name in self.plugindb.plugindb if name.startswith("plug-in-synthetic-")])[:20]
+    rand = random.Random(0)
+    commands = specification.Commands()
+    params_of = {}  # command => its segment, by identity
+    for step in range(500):
+      choice = rand.random()
+      if choice < 0.5 or len(commands) < 2:
+        name = rand.choice(names)
+        command = specification.CommandSpec(name, self.plugindb.plugindb[name].menupath)
+        position = rand.randint(0, len(commands))
+        offline.quietly(commands.insert, position, command)
+        params_of[command] = commands.get_parms_for(position)
+      elif choice < 0.75:
+        commands.remove(rand.randrange(len(commands)))
+      else:
+        commands.move(rand.randrange(len(commands)), rand.randrange(len(commands)))
+      self.assertEqual([command.position for command in commands.command_list], range(len(commands)))
+      for position, command in enumerate(commands.command_list):
+        self.assertTrue(commands.get_parms_for(position) is params_of[command])
+      if step % 7 == 0:
+        commands.param_list.uniquify_names()
+        self.assertEqual(unique_names(commands.param_list), uniquified_from_scratch(commands.param_list.segments))
+
+
+if __name__ == "__main__":
+  unittest.main()
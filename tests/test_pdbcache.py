@@ -0,0 +1,126 @@
+'''
+Tests of PdbCache: what it remembers between sessions, and what it must forget.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import shutil
+import cPickle
+import tempfile
+import unittest
+
+import offline
+from gimpscripter.mockmenu import pdbcache
+
+BLUR = { "blurb" : "Blur", "params" : ((0, "run-mode", "Interactive, non-interactive"),) }
+SHARPEN = { "blurb" : "Sharpen", "params" : () }
+
+
+class PdbCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    # The cache reports on stdout
+    self.stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    self.directory = tempfile.mkdtemp(prefix="gimpscripter-test-")
+    self.filepath = os.path.join(self.directory, pdbcache.CACHE_FILENAME)
+
+  def tearDown(self):
+    sys.stdout.close()
+    sys.stdout = self.stdout
+    shutil.rmtree(self.directory)
+
+  def saved_cache(self):
+    ''' Save a cache of two plugins, as a session would.  Return it. '''
+    cache = pdbcache.PdbCache(self.filepath)
+    cache.load()
+    cache.store("plug-in-blur", ("/plug-ins/blur", 100), BLUR)
+    cache.store("plug-in-sharpen", ("/plug-ins/sharpen", 200), SHARPEN)
+    cache.save()
+    return cache
+
+  def loaded_cache(self):
+    ''' The cache in the next session. '''
+    cache = pdbcache.PdbCache(self.filepath)
+    cache.load()
+    return cache
+
+  def test_fresh_hits(self):
+    self.saved_cache()
+    cache = self.loaded_cache()
+    self.assertEqual(cache.lookup("plug-in-blur", ("/plug-ins/blur", 100)), BLUR)
+    self.assertEqual(cache.lookup("plug-in-sharpen", ("/plug-ins/sharpen", 200)), SHARPEN)
+    self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+  def test_changed_key_misses(self):
+    ''' A plugin file reinstalled (new time) or moved misses; others still hit. '''
+    self.saved_cache()
+    cache = self.loaded_cache()
+    self.assertEqual(cache.lookup("plug-in-blur", ("/plug-ins/blur", 101)), None)
+    self.assertEqual(cache.lookup("plug-in-blur", ("/elsewhere/blur", 100)), None)
+    self.assertEqual(cache.lookup("plug-in-new", ("/plug-ins/new", 100)), None)
+    self.assertEqual(cache.lookup("plug-in-sharpen", ("/plug-ins/sharpen", 200)), SHARPEN)
+    self.assertEqual((cache.hits, cache.misses), (1, 3))
+    # Refreshed record replaces the stale one
+    cache.store("plug-in-blur", ("/plug-ins/blur", 101), SHARPEN)
+    cache.save()
+    self.assertEqual(self.loaded_cache().lookup("plug-in-blur", ("/plug-ins/blur", 101)), SHARPEN)
+
+  def test_gimp_version_mismatch(self):
+    cache = self.saved_cache()
+    next_cache = pdbcache.PdbCache(self.filepath)
+    next_cache.gimp_version = cache.gimp_version + (1,)  # as if a new Gimp
+    next_cache.load()
+    self.assertEqual(next_cache.records, {})
+    self.assertEqual(next_cache.lookup("plug-in-blur", ("/plug-ins/blur", 100)), None)
+
+  def test_format_version_mismatch(self):
+    cache = self.saved_cache()
+    with open(self.filepath, "wb") as f:
+      cPickle.dump((pdbcache.CACHE_FORMAT_VERSION - 1, cache.gimp_version, cache.records), f)
+    self.assertEqual(self.loaded_cache().records, {})
+
+  def test_prune(self):
+    ''' Records of uninstalled procedures are dropped. '''
+    cache = self.saved_cache()
+    cache.prune(["plug-in-sharpen"])
+    self.assertTrue(cache.is_dirty)
+    cache.save()
+    cache = self.loaded_cache()
+    self.assertEqual(cache.records.keys(), ["plug-in-sharpen"])
+    cache.prune(["plug-in-sharpen", "plug-in-other"])
+    self.assertFalse(cache.is_dirty)
+
+  def test_corrupt_loads_empty(self):
+    for contents in ("", "not a pickle", cPickle.dumps("a foreign pickle")):
+      with open(self.filepath, "wb") as f:
+        f.write(contents)
+      cache = self.loaded_cache()
+      self.assertEqual(cache.records, {})
+      self.assertEqual(cache.lookup("plug-in-blur", ("/plug-ins/blur", 100)), None)
+
+  def test_saved_again(self):
+    ''' A second session saves over the first's cache (also where rename doesn't replace), leaving no temporary file. '''
+    self.saved_cache()
+    cache = self.loaded_cache()
+    cache.store("plug-in-new", ("/plug-ins/new", 300), SHARPEN)
+    saved_name = os.name
+    os.name = "nt"
+    try:
+      cache.save()
+    finally:
+      os.name = saved_name
+    self.assertFalse(cache.is_dirty)
+    self.assertEqual(self.loaded_cache().lookup("plug-in-new", ("/plug-ins/new", 300)), SHARPEN)
+    self.assertEqual(os.listdir(self.directory), [pdbcache.CACHE_FILENAME])
+
+
+if __name__ == "__main__":
+  unittest.main()
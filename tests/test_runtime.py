@@ -0,0 +1,131 @@
+'''
+Tests of GimpEphemera, the runtime of wrappers: objects created and deleted by commands are found
+by querying the (fake) Gimp, objects returned by commands are pushed, and lookup by name finds the right one.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import unittest
+
+import offline
+import fakepdb
+from gimpfu import pdb, PF_IMAGE, PF_DRAWABLE, PF_LAYER, PF_CHANNEL
+from gimpscripter import runtime
+
+
+def new_layer(image, name):
+  ''' Layer added to image, as a command would. '''
+  layer = pdb.gimp_layer_new(image, 64, 64, 0, name, 100, 0)
+  pdb.gimp_image_add_layer(image, layer, 0)
+  return layer
+
+
+class GimpEphemeraTest(unittest.TestCase):
+
+  def setUp(self):
+    # The runtime chatters on stdout, as in a wrapper
+    self.stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+    fakepdb.clear_images()
+    self.image = pdb.gimp_image_new(640, 400, 0)
+    self.background = new_layer(self.image, "Background")
+    self.layer = new_layer(self.image, "Clipboard")
+    self.ephemera = runtime.GimpEphemera(self.image, self.layer)
+
+  def tearDown(self):
+    sys.stdout.close()
+    sys.stdout = self.stdout
+    fakepdb.clear_images()
+
+  def stack(self, a_type):
+    return list(self.ephemera.stacks[a_type])
+
+  def test_initial_stacks(self):
+    ''' Only the passed image and drawable are stacked, not other existing objects. '''
+    self.assertEqual(self.stack(PF_IMAGE), [self.image.ID])
+    self.assertEqual(self.stack(PF_LAYER), [self.layer.ID])
+    self.assertEqual(self.stack(PF_DRAWABLE), [self.layer.ID])
+    self.assertEqual(self.stack(PF_CHANNEL), [])
+
+  def test_created_above_watermark(self):
+    ''' A command creating many objects, e.g. duplicating an image: all stacked, the last created on top. '''
+    duplicate = pdb.gimp_image_duplicate(self.ephemera.top(PF_IMAGE))
+    self.ephemera.update()
+    copies = [layer.ID for layer in duplicate.layers]
+    self.assertEqual(len(copies), 2)
+    self.assertEqual(self.stack(PF_IMAGE), [self.image.ID, duplicate.ID])
+    self.assertEqual(self.stack(PF_LAYER), [self.layer.ID] + sorted(copies))
+    self.assertEqual(self.stack(PF_DRAWABLE), [self.layer.ID] + sorted(copies))
+    # Existing objects are not created again, by a later update
+    self.ephemera.top(PF_IMAGE)
+    self.ephemera.update()
+    self.assertEqual(self.stack(PF_LAYER), [self.layer.ID] + sorted(copies))
+
+  def test_deleted_deeper_in_stack(self):
+    first = new_layer(self.ephemera.top(PF_IMAGE), "First")
+    self.ephemera.update()
+    second = new_layer(self.ephemera.top(PF_IMAGE), "Second")
+    self.ephemera.update()
+    self.assertEqual(self.stack(PF_LAYER), [self.layer.ID, first.ID, second.ID])
+    # A command deletes a layer that is not the top
+    pdb.gimp_image_remove_layer(self.ephemera.top(PF_IMAGE), first)
+    self.ephemera.update()
+    self.assertEqual(self.stack(PF_LAYER), [self.layer.ID, second.ID])
+    self.assertEqual(self.stack(PF_DRAWABLE), [self.layer.ID, second.ID])
+    self.assertEqual(self.ephemera.lookup(PF_LAYER, "First"), None)
+    self.assertEqual(self.ephemera.lookup(PF_LAYER, "Second").ID, second.ID)
+
+  def test_push_not_in_image(self):
+    ''' A layer returned by gimp_layer_new, not yet added to an image. '''
+    layer = pdb.gimp_layer_new(self.ephemera.top(PF_IMAGE), 64, 64, 0, "Floating", 100, 0)
+    self.assertTrue(self.ephemera.push(PF_LAYER, layer) is layer)
+    self.assertEqual(self.ephemera.top(PF_LAYER).ID, layer.ID)
+    self.assertEqual(self.ephemera.top(PF_DRAWABLE).ID, layer.ID)
+    self.assertEqual(self.ephemera.lookup(PF_LAYER, "Floating").ID, layer.ID)
+    # Added to the image by a command of known effects: found in the image, not created again
+    pdb.gimp_image_add_layer(self.ephemera.top(PF_IMAGE), layer, 0)
+    self.ephemera.update(refresh_names=False)
+    self.assertEqual(self.stack(PF_LAYER), [self.layer.ID, layer.ID])
+    self.assertEqual(self.ephemera.items[layer.ID][2], self.image.ID)
+
+  def test_push_already_stacked(self):
+    ''' An existing layer returned again, e.g. by gimp_image_get_active_layer: moved to the top, not copied. '''
+    other = new_layer(self.ephemera.top(PF_IMAGE), "Other")
+    self.ephemera.update()
+    self.assertEqual(self.stack(PF_LAYER), [self.layer.ID, other.ID])
+    self.ephemera.push(PF_DRAWABLE, self.layer)  # stacked by its subtype, layer
+    self.assertEqual(self.stack(PF_LAYER), [other.ID, self.layer.ID])
+    self.assertEqual(self.stack(PF_DRAWABLE), [other.ID, self.layer.ID])
+    self.ephemera.push(PF_LAYER, self.layer)  # already the top
+    self.assertEqual(self.stack(PF_LAYER), [other.ID, self.layer.ID])
+
+  def test_same_names_prefer_active_image(self):
+    image = pdb.gimp_image_new(320, 200, 0)
+    self.ephemera.push(PF_IMAGE, image)
+    background = new_layer(self.ephemera.top(PF_IMAGE), "Background")
+    self.ephemera.update()
+    self.assertEqual(self.ephemera.lookup(PF_LAYER, "Background").ID, background.ID)
+    self.assertEqual(self.ephemera.lookup(PF_DRAWABLE, "Background").ID, background.ID)
+    # The first image active again
+    self.ephemera.push(PF_IMAGE, self.image)
+    self.assertEqual(self.ephemera.lookup(PF_LAYER, "Background").ID, self.background.ID)
+
+  def test_renamed(self):
+    ''' A command of unknown effects (e.g. a script) renames a layer passed to it. '''
+    layer = self.ephemera.top(PF_LAYER)
+    layer.name = "Renamed"
+    self.ephemera.update()
+    self.assertEqual(self.ephemera.lookup(PF_LAYER, "Renamed").ID, self.layer.ID)
+    self.assertEqual(self.ephemera.lookup(PF_LAYER, "Clipboard"), None)
+    self.assertEqual(self.ephemera.lookup(PF_LAYER, "Background").ID, self.background.ID)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,128 @@
+'''
+Tests of spec files: a spec saved and loaded back is the same spec, and invalid files are rejected.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import offline
+import gimpcolor
+from gimpfu import PDB_COLOR, PDB_STRING
+
+
+@offline.requires_gtk
+class SpecFileTest(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    cls.plugindb = offline.load_plugindb()
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp(prefix="gimpscripter-test-")
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def write(self, text):
+    filepath = os.path.join(self.directory, "test.gsspec")
+    with open(filepath, "w") as f:
+      f.write(text)
+    return filepath
+
+  def synthetic_with(self, *types):
+    ''' Name of a synthetic plugin having parameters of all types. '''
+    for name in sorted(self.plugindb.plugindb):
+      if name.startswith("plug-in-synthetic-"):
+        paramtypes = [pdef[0] for pdef in self.plugindb.plugindb[name].params]
+        if all([paramtype in paramtypes for paramtype in types]):
+          return name
+    self.fail("no synthetic plugin with parameters of types %r" % (types,))
+
+  def make_spec(self):
+    ''' Spec as the GUI makes it: a color entered as gimpcolor.RGB, some parameters deferred, a macro. '''
+    from gimpscripter import specification
+    from gimpscripter import macros
+
+    spec = specification.GimpScripterSpec()
+    spec.wrapping.set_menu_name("Test \"round trip\"")
+    spec.wrapping.set_undo_mode(specification.UNDO_GROUP)
+    names = [self.synthetic_with(PDB_COLOR, PDB_STRING), sorted(macros.macros.keys())[0]]
+    for position, name in enumerate(names):
+      offline.quietly(spec.commands.append, specification.CommandSpec(name, self.plugindb.plugindb[name].menupath))
+      param_list = spec.commands.param_list
+      values = param_list.get_nonhidden_defaults_for(position)
+      pdefs = param_list.get_nonhidden_pdefs_for(position)
+      defers = [index % 2 == 1 for index in range(len(values))]
+      for index, pdef in enumerate(pdefs):
+        if pdef[0] == PDB_COLOR:
+          values[index] = gimpcolor.RGB(0.25, 0.5, 1.0, 1.0)
+          defers[index] = False
+        elif pdef[0] == PDB_STRING:
+          values[index] = "it's \"quoted\"\n"
+      param_list.preset(values, defers, command_index=position)
+    spec.commands.get_command_for(0).set_is_use_last(True)
+    return spec
+
+  def test_round_trip(self):
+    from gimpscripter import specfile
+
+    spec = self.make_spec()
+    text = specfile.dumps(spec)
+    loaded = offline.quietly(specfile.load, self.write(text))
+    self.assertEqual(specfile.dumps(loaded), text)
+
+    self.assertEqual(loaded.wrapping.menuname, spec.wrapping.menuname)
+    self.assertEqual(loaded.wrapping.undo_mode, spec.wrapping.undo_mode)
+    self.assertEqual([command.name for command in loaded.commands.command_list],
+      [command.name for command in spec.commands.command_list])
+    self.assertTrue(loaded.commands.get_command_for(0).is_use_last)
+    for position in range(len(spec.commands)):
+      self.assertEqual(loaded.commands.param_list.get_nonhidden_values_for(position),
+        spec.commands.param_list.get_nonhidden_values_for(position))
+      self.assertEqual(loaded.commands.param_list.get_defers_for(position),
+        spec.commands.param_list.get_defers_for(position))
+    pdefs = loaded.commands.param_list.get_nonhidden_pdefs_for(0)
+    colors = [value for pdef, value in zip(pdefs, loaded.commands.param_list.get_nonhidden_values_for(0))
+      if pdef[0] == PDB_COLOR]
+    self.assertTrue(colors)
+    self.assertEqual(colors, [gimpcolor.RGB(0.25, 0.5, 1.0, 1.0)] * len(colors))
+
+  def test_defaults(self):
+    ''' Values and defers are optional. '''
+    from gimpscripter import specfile
+
+    name = self.synthetic_with(PDB_STRING)
+    text = '{"version" : 1, "menuname" : "Defaults", "commands" : [{"name" : %r}]}' % name
+    spec = offline.quietly(specfile.load, self.write(text))
+    param_list = spec.commands.param_list
+    self.assertEqual(param_list.get_nonhidden_values_for(0), param_list.get_nonhidden_defaults_for(0))
+    self.assertEqual(param_list.get_defers_for(0), [False] * len(param_list.get_nonhidden_defaults_for(0)))
+
+  def test_invalid(self):
+    from gimpscripter import specfile
+
+    name = self.synthetic_with(PDB_STRING)
+    for text in (
+      'not a literal',
+      '[]',
+      '{"version" : 0, "menuname" : "Old", "commands" : [{"name" : %r}]}' % name,
+      '{"version" : 1, "commands" : [{"name" : %r}]}' % name,
+      '{"version" : 1, "menuname" : "No commands", "commands" : []}',
+      '{"version" : 1, "menuname" : "Unknown", "commands" : [{"name" : "plug-in-no-such"}]}',
+      '{"version" : 1, "menuname" : "Undo", "undo_mode" : 9, "commands" : [{"name" : %r}]}' % name,
+      '{"version" : 1, "menuname" : "Count", "commands" : [{"name" : %r, "values" : []}]}' % name,
+      ):
+      self.assertRaises(specfile.SpecFileError, offline.quietly, specfile.load, self.write(text))
+
+
+if __name__ == "__main__":
+  unittest.main()
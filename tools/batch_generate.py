@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+'''
+Generate wrapper plugins from spec files (see gimpscripter/specfile.py), without Gimp or the GUI.
+
+Commands and their parameters come from a PDB recorded from a real Gimp (see fakegimp/fakepdb.py, record()),
+served by the fake Gimp modules in fakegimp.
+Wrappers are generated, in parallel by a pool of processes, into the plug-ins directory of a Gimp directory,
+as GimpScripter does into the user's.  A wrapper whose file is unchanged is not rewritten (see generate.py.)
+
+Usage:
+  python tools/batch_generate.py --pdb recorded-file --directory gimp-directory [--processes N] [--verbose]
+    specfile-or-directory ...
+A directory stands for the spec files (*.gsspec) in it.
+Exit status is 1 if any spec failed.
+
+Needs PyGTK (the plugin db imports it), but not a display.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import time
+import glob
+import shutil
+import optparse
+import multiprocessing
+
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.dirname(TOOLS_DIRECTORY)
+
+
+def parse_options():
+  parser = optparse.OptionParser(usage="%prog [options] specfile-or-directory ...")
+  parser.add_option("--pdb", help="recorded PDB file")
+  parser.add_option("--directory", help="Gimp directory, whose plug-ins directory gets the wrappers")
+  parser.add_option("--processes", type="int", default=multiprocessing.cpu_count(), help="count of processes")
+  parser.add_option("--verbose", action="store_true", help="don't hide GimpScripter's chatter")
+  options, args = parser.parse_args()
+  if not options.pdb or not options.directory or not args:
+    parser.error("--pdb, --directory, and at least one spec file are required")
+  return options, args
+
+
+def spec_paths(args):
+  ''' Return paths of spec files named by args, files or directories. '''
+  from gimpscripter import specfile
+
+  paths = []
+  for arg in args:
+    if os.path.isdir(arg):
+      paths.extend(sorted(glob.glob(os.path.join(arg, "*" + specfile.SPEC_FILE_SUFFIX))))
+    else:
+      paths.append(arg)
+  return paths
+
+
+def quietly(function, *args):
+  ''' Call function without GimpScripter's chatter on stdout.  Return its result. '''
+  saved = sys.stdout
+  sys.stdout = open(os.devnull, "w")
+  try:
+    return function(*args)
+  finally:
+    sys.stdout = saved
+
+def load_plugindb():
+  from gimpscripter.mockmenu import plugindb
+  plugindb.load()
+
+def install_runtime():
+  ''' Wrappers include the runtime from where GimpScripter is installed: install it if it isn't. '''
+  import gimp
+  runtimedirectory = os.path.join(gimp.directory, "plug-ins", "gimpscripter")
+  if not os.path.isfile(os.path.join(runtimedirectory, "runtime.py")):
+    if not os.path.isdir(runtimedirectory):
+      os.makedirs(runtimedirectory)
+    shutil.copy(os.path.join(SOURCE_DIRECTORY, "gimpscripter", "runtime.py"), runtimedirectory)
+    print "Installed runtime in", runtimedirectory
+
+
+def generate_one(specpath):
+  '''
+  In a worker process, generate the wrapper specified by spec file at specpath.
+  Return (specpath, filepath of wrapper or None, status or error message.)
+  '''
+  from gimpscripter import generate
+  from gimpscripter import specfile
+
+  try:
+    spec = specfile.load(specpath)
+    generate.generate(spec)
+  except Exception, e:
+    return specpath, None, "%s: %s" % (e.__class__.__name__, e)
+  return specpath, generate.substitutions["filepath"], generate.substitutions["wrappingstatus"]
+
+def quietly_generate_one(specpath):
+  return quietly(generate_one, specpath)
+
+def init_worker():
+  '''
+  Where worker processes are forked (not Windows), they inherit the plugin db the main process loaded,
+  and this does nothing.  Else each loads it.
+  '''
+  load_plugindb()
+
+
+def main(options, args):
+  paths = spec_paths(args)
+  start = time.time()
+  if options.verbose:
+    load_plugindb()
+  else:
+    quietly(load_plugindb)
+  install_runtime()
+  print "Loaded plugin db in %.3f seconds" % (time.time() - start)
+
+  pool = multiprocessing.Pool(options.processes, init_worker)
+  if options.verbose:
+    worker = generate_one
+  else:
+    worker = quietly_generate_one
+  counts = {}
+  failures = 0
+  for specpath, filepath, status in pool.imap_unordered(worker, paths, 8):
+    if filepath is None:
+      failures += 1
+      print "Failed", specpath, status
+    else:
+      counts[status] = counts.get(status, 0) + 1
+      if options.verbose:
+        print status, filepath
+  pool.close()
+  pool.join()
+
+  summary = ", ".join(["%d %s" % (count, status.lower()) for status, count in sorted(counts.items())])
+  print "%d specs in %.3f seconds: %s%s" % (len(paths), time.time() - start, summary or "none generated",
+    failures and ", %d failed" % failures or "")
+  return failures and 1 or 0
+
+
+if __name__ == "__main__":
+  options, args = parse_options()
+
+  # Configure fake Gimp before it is imported
+  os.environ["FAKEGIMP_PDB"] = options.pdb
+  os.environ["FAKEGIMP_DIRECTORY"] = options.directory
+  sys.path.insert(0, os.path.join(TOOLS_DIRECTORY, "fakegimp"))
+  sys.path.insert(0, SOURCE_DIRECTORY)
+
+  sys.exit(main(options, args))
@@ -0,0 +1,570 @@
+#!/usr/bin/env python
+
+'''
+Headless stand-in for the Gimp PDB, so GimpScripter can be driven and profiled without Gimp.
+
+This directory holds fake gimp, gimpfu, gimpenums, and gimpcolor modules.
+Put it first on sys.path (or PYTHONPATH) and GimpScripter's modules import the fakes.
+See tools/profile_offline.py for an example driver.
+
+The fake PDB serves either:
+- a synthetic PDB: many plugins with random menu paths, paramdefs, and blurbs, of configurable size
+- or a PDB recorded from a real Gimp, see record()
+
+Configured by environment variables, read when the fake gimp module is imported:
+  FAKEGIMP_PDB        file of a recorded PDB (else synthetic)
+  FAKEGIMP_SIZE       count of synthetic plugins (default 1000)
+  FAKEGIMP_SEED       random seed for synthetic PDB (default 0)
+  FAKEGIMP_DIRECTORY  the user's Gimp directory, gimp.directory (default a new temporary directory)
+A driver can also replace the procedures later, see FakePdb.set_procedures().
+
+Calling a procedure counts the call (see FakePdb.calls), checks the count of arguments,
+and for a few procedures (images, layers, channels) changes a fake set of Gimp objects,
+so generated wrapper plugins and the runtime (GimpEphemera) can run.
+Other procedures do nothing but push an undo step (see _push_undo()) and return None for each return value.
+Round-trips to Gimp that pygimp makes implicitly are also counted, as calls of the procedure it calls:
+looking up a procedure (pdb.foo or pdb["foo"]) as gimp-procedural-db-proc-info,
+making a drawable object from an ID (gimp._id2drawable) as gimp-drawable-is-layer.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+'''
+
+import os
+import random
+import cPickle
+
+from gimpenums import *
+
+
+# Bump this whenever the layout of a recorded PDB changes.
+RECORD_FORMAT_VERSION = 1
+
+DEFAULT_SIZE = 1000
+
+# Synthetic plugins are this many to a plugin file (location), as real plugin files often register several.
+PROCEDURES_PER_FILE = 4
+
+# Most that synthetic plugins have, besides run-mode, image, drawable
+MAX_EXTRA_PARAMS = 8
+
+# Of a drawable's pixels, saved in an undo step, as RGBA
+BYTES_PER_PIXEL = 4
+
+
+'''
+Fake Gimp objects: images and the items they hold.
+Only the attributes GimpScripter and wrapper plugins use.
+'''
+
+class _Item(object):
+  ''' Base of fake Gimp objects, having a unique ID and a name. '''
+  _next_ID = 1
+
+  def __init__(self, name):
+    self.ID = _Item._next_ID
+    _Item._next_ID += 1
+    self.name = name
+    _objects[self.ID] = self
+
+  def __repr__(self):
+    return "<fake %s %r ID %d>" % (self.__class__.__name__, self.name, self.ID)
+
+
+class Image(_Item):
+  def __init__(self, width, height, type=RGB):
+    _Item.__init__(self, "Untitled")
+    self.width = width
+    self.height = height
+    self.base_type = type
+    self.filename = None
+    self.layers = []
+    self.channels = []
+    self.vectors = []
+    # Undo, see _push_undo()
+    self.undo_disabled = 0  # count of disables not yet enabled
+    self.undo_group = 0     # depth of undo groups
+    self.undo_steps = 0
+    self.undo_bytes = 0
+    self._is_group_changed = False
+    _images.append(self)
+
+class Drawable(_Item):
+  def __init__(self, name, width, height):
+    _Item.__init__(self, name)
+    self.width = width
+    self.height = height
+    self.image = None # until added to an image
+
+class Layer(Drawable):
+  def __init__(self, image, name, width, height, type=RGB_IMAGE, opacity=100, mode=NORMAL_MODE):
+    Drawable.__init__(self, name, width, height)
+    self.type = type
+    self.opacity = opacity
+    self.mode = mode
+
+  def copy(self, add_alpha=False):
+    return Layer(None, self.name + " copy", self.width, self.height, self.type, self.opacity, self.mode)
+
+class Channel(Drawable):
+  def __init__(self, image, name, width, height, opacity=100, color=(0, 0, 0)):
+    Drawable.__init__(self, name, width, height)
+    self.opacity = opacity
+    self.color = color
+
+class Vectors(_Item):
+  def __init__(self, image, name):
+    _Item.__init__(self, name)
+    self.image = image
+
+
+_images = []  # open images, in order of creation
+_objects = {} # ID => every object ever made, as pygimp can make an object for a stale ID
+
+def image_list():
+  ''' As gimp.image_list(): open images. '''
+  return list(_images)
+
+def clear_images():
+  ''' Close all images, e.g. between runs of a driver. '''
+  del _images[:]
+
+def id2object(ID):
+  ''' As gimp._id2image(), gimp._id2drawable(), gimp._id2vectors(). '''
+  return _objects[ID]
+
+
+'''
+Implementations of the few procedures that change the set of Gimp objects.
+Keyed by PDB name.  Each has the paramdefs and return value defs it has in Gimp 2.6 (abridged descs.)
+'''
+
+def _image_new(width, height, type):
+  return Image(width, height, type)
+
+def _image_delete(image):
+  _images.remove(image)
+
+def _image_duplicate(image):
+  result = Image(image.width, image.height, image.base_type)
+  for position, layer in enumerate(image.layers):
+    duplicate = layer.copy()
+    duplicate.name = layer.name
+    _image_add_layer(result, duplicate, position)
+  return result
+
+def _image_flatten(image):
+  flat = Layer(image, "Background", image.width, image.height)
+  image.layers = []
+  _image_add_layer(image, flat, 0)
+  return flat
+
+def _image_add_layer(image, layer, position):
+  _add_item(image.layers, image, layer, position)
+
+def _image_remove_layer(image, layer):
+  image.layers.remove(layer)
+
+def _image_add_channel(image, channel, position):
+  _add_item(image.channels, image, channel, position)
+
+def _image_remove_channel(image, channel):
+  image.channels.remove(channel)
+
+def _add_item(items, image, item, position):
+  item.image = image
+  if position < 0:
+    position = 0  # Gimp: -1 means above the active item, ie top
+  items.insert(position, item)
+
+def _layer_new(image, width, height, type, name, opacity, mode):
+  return Layer(image, name, width, height, type, opacity, mode)
+
+def _layer_copy(layer, add_alpha):
+  return layer.copy(add_alpha)
+
+def _layer_new_from_visible(image, dest_image, name):
+  return Layer(dest_image, name, image.width, image.height)
+
+def _channel_new(image, width, height, name, opacity, color):
+  return Channel(image, name, width, height, opacity, color)
+
+def _channel_new_from_component(image, component, name):
+  return Channel(image, name, image.width, image.height)
+
+def _image_list():
+  return len(_images), tuple([image.ID for image in _images])
+
+def _image_get_layers(image):
+  return len(image.layers), tuple([layer.ID for layer in image.layers])
+
+def _image_get_channels(image):
+  return len(image.channels), tuple([channel.ID for channel in image.channels])
+
+def _image_get_vectors(image):
+  return len(image.vectors), tuple([vectors.ID for vectors in image.vectors])
+
+def _drawable_is_layer(drawable):
+  return isinstance(drawable, Layer)
+
+def _drawable_is_channel(drawable):
+  return isinstance(drawable, Channel)
+
+def _message(message):
+  print "Fake Gimp message:", message
+
+'''
+Undo.  Every procedure that is not implemented here (plugins, filters) is taken to change
+every drawable passed to it, and so push an undo step saving its pixels, as Gimp would.
+Steps within an undo group count as one step.  Undo bytes are the total saved,
+as if Gimp's preferences didn't limit undo memory.
+'''
+
+def _push_undo(args):
+  for arg in args:
+    if isinstance(arg, Drawable) and arg.image is not None and not arg.image.undo_disabled:
+      image = arg.image
+      image.undo_bytes += arg.width * arg.height * BYTES_PER_PIXEL
+      if image.undo_group:
+        image._is_group_changed = True
+      else:
+        image.undo_steps += 1
+
+def _image_undo_group_start(image):
+  if not image.undo_group:
+    image._is_group_changed = False
+  image.undo_group += 1
+  return True
+
+def _image_undo_group_end(image):
+  image.undo_group -= 1
+  if not image.undo_group and image._is_group_changed:
+    image.undo_steps += 1
+  return True
+
+def _image_undo_disable(image):
+  # As Gimp, disabling frees the undo history
+  image.undo_disabled += 1
+  image.undo_steps = 0
+  image.undo_bytes = 0
+  return True
+
+def _image_undo_enable(image):
+  if image.undo_disabled:
+    image.undo_disabled -= 1
+  return True
+
+def _image_undo_is_enabled(image):
+  return not image.undo_disabled
+
+
+_IMAGE = (PDB_IMAGE, "image", "The image")
+_DRAWABLE = (PDB_DRAWABLE, "drawable", "The drawable")
+_LAYER = (PDB_LAYER, "layer", "The layer")
+_CHANNEL = (PDB_CHANNEL, "channel", "The channel")
+_WIDTH = (PDB_INT32, "width", "The width")
+_HEIGHT = (PDB_INT32, "height", "The height")
+_NAME = (PDB_STRING, "name", "The name")
+_OPACITY = (PDB_FLOAT, "opacity", "The opacity")
+_POSITION = (PDB_INT32, "position", "The position")
+
+# name => (function, params, return_vals)
+_IMPLEMENTATIONS = {
+  "gimp-image-new" : (_image_new, (_WIDTH, _HEIGHT, (PDB_INT32, "type", "The type of image")),
+    ((PDB_IMAGE, "image", "The ID of the newly created image"),)),
+  "gimp-image-delete" : (_image_delete, (_IMAGE,), ()),
+  "gimp-image-duplicate" : (_image_duplicate, (_IMAGE,), ((PDB_IMAGE, "new-image", "The new, duplicated image"),)),
+  "gimp-image-flatten" : (_image_flatten, (_IMAGE,), ((PDB_LAYER, "layer", "The resulting layer"),)),
+  "gimp-image-add-layer" : (_image_add_layer, (_IMAGE, _LAYER, _POSITION), ()),
+  "gimp-image-remove-layer" : (_image_remove_layer, (_IMAGE, _LAYER), ()),
+  "gimp-image-add-channel" : (_image_add_channel, (_IMAGE, _CHANNEL, _POSITION), ()),
+  "gimp-image-remove-channel" : (_image_remove_channel, (_IMAGE, _CHANNEL), ()),
+  "gimp-layer-new" : (_layer_new, (_IMAGE, _WIDTH, _HEIGHT, (PDB_INT32, "type", "The layer type"),
+    _NAME, _OPACITY, (PDB_INT32, "mode", "The layer combination mode")),
+    ((PDB_LAYER, "layer", "The newly created layer"),)),
+  "gimp-layer-copy" : (_layer_copy, (_LAYER, (PDB_INT32, "add-alpha", "Add an alpha channel")),
+    ((PDB_LAYER, "layer-copy", "The newly copied layer"),)),
+  "gimp-layer-new-from-visible" : (_layer_new_from_visible, (_IMAGE, (PDB_IMAGE, "dest-image", "The destination image"), _NAME),
+    ((PDB_LAYER, "layer", "The newly created layer"),)),
+  "gimp-channel-new" : (_channel_new, (_IMAGE, _WIDTH, _HEIGHT, _NAME, _OPACITY, (PDB_COLOR, "color", "The channel compositing color")),
+    ((PDB_CHANNEL, "channel", "The newly created channel"),)),
+  "gimp-channel-new-from-component" : (_channel_new_from_component, (_IMAGE, (PDB_INT32, "component", "The image component"), _NAME),
+    ((PDB_CHANNEL, "channel", "The newly created channel"),)),
+  "gimp-image-list" : (_image_list, (),
+    ((PDB_INT32, "num-images", "The number of images currently open"), (PDB_INT32ARRAY, "image-ids", "The list of images currently open"))),
+  "gimp-image-get-layers" : (_image_get_layers, (_IMAGE,),
+    ((PDB_INT32, "num-layers", "The number of layers contained in the image"), (PDB_INT32ARRAY, "layer-ids", "The list of layers contained in the image"))),
+  "gimp-image-get-channels" : (_image_get_channels, (_IMAGE,),
+    ((PDB_INT32, "num-channels", "The number of channels contained in the image"), (PDB_INT32ARRAY, "channel-ids", "The list of channels contained in the image"))),
+  "gimp-image-get-vectors" : (_image_get_vectors, (_IMAGE,),
+    ((PDB_INT32, "num-vectors", "The number of vectors contained in the image"), (PDB_INT32ARRAY, "vector-ids", "The list of vectors contained in the image"))),
+  "gimp-drawable-is-layer" : (_drawable_is_layer, (_DRAWABLE,), ((PDB_INT32, "layer", "TRUE if the drawable is a layer"),)),
+  "gimp-drawable-is-channel" : (_drawable_is_channel, (_DRAWABLE,), ((PDB_INT32, "channel", "TRUE if the drawable is a channel"),)),
+  "gimp-message" : (_message, ((PDB_STRING, "message", "Message to display in the dialog"),), ()),
+  "gimp-displays-flush" : (None, (), ()),
+  "gimp-context-push" : (None, (), ()),
+  "gimp-context-pop" : (None, (), ()),
+  "gimp-context-set-brush" : (None, ((PDB_STRING, "name", "The name of the brush"),), ()),
+  "gimp-display-new" : (None, (_IMAGE,), ((PDB_DISPLAY, "display", "The new display"),)),
+  "gimp-image-undo-group-start" : (_image_undo_group_start, (_IMAGE,), ()),
+  "gimp-image-undo-group-end" : (_image_undo_group_end, (_IMAGE,), ()),
+  "gimp-image-undo-disable" : (_image_undo_disable, (_IMAGE,), ((PDB_INT32, "disabled", "TRUE if the image undo has been disabled"),)),
+  "gimp-image-undo-enable" : (_image_undo_enable, (_IMAGE,), ((PDB_INT32, "enabled", "TRUE if the image undo has been enabled"),)),
+  "gimp-image-undo-is-enabled" : (_image_undo_is_enabled, (_IMAGE,), ((PDB_INT32, "enabled", "TRUE if undo is enabled for this image"),)),
+  }
+
+
+class PDBFunction(object):
+  '''
+  A procedure in the fake PDB.
+  Attributes as pygimp's PDB functions (proc_name, proc_blurb, ..., params, return_vals),
+  plus, for plugins, what gimp-plugins-query tells (menupath, accel, location, imagetype, time.)
+  '''
+
+  def __init__(self, name, blurb="", help="", author="", copyright="", date="", proc_type=INTERNAL,
+      params=(), return_vals=(), menupath=None, accel="", location="", imagetype="", time=0):
+    self.proc_name = name
+    self.proc_blurb = blurb
+    self.proc_help = help
+    self.proc_author = author
+    self.proc_copyright = copyright
+    self.proc_date = date
+    self.proc_type = proc_type
+    self.params = tuple(params)
+    self.return_vals = tuple(return_vals)
+    self.nparams = len(self.params)
+    self.nreturn_vals = len(self.return_vals)
+    self.menupath = menupath
+    self.accel = accel
+    self.location = location
+    self.imagetype = imagetype
+    self.time = time
+    self.pdb = None # set when added to a FakePdb
+
+  def __repr__(self):
+    return "<fake pdb function %s>" % self.proc_name
+
+  def __call__(self, *args, **kwargs):
+    '''
+    As pygimp: run-mode can be omitted from args (and passed as keyword run_mode.)
+    '''
+    if self.pdb is not None:
+      self.pdb.count_call(self.proc_name)
+    if self.params and self.params[0][1] == "run-mode" and len(args) == self.nparams - 1:
+      pass
+    elif len(args) != self.nparams:
+      raise TypeError("wrong number of parameters to %s: %d, expected %d" % (self.proc_name, len(args), self.nparams))
+    function = _IMPLEMENTATIONS.get(self.proc_name, (None,))[0]
+    if function is not None:
+      return function(*args)
+    _push_undo(args)
+    if self.nreturn_vals < 2:
+      return None
+    return (None,) * self.nreturn_vals
+
+
+class FakePdb(object):
+  '''
+  As gimp.pdb: procedures by PDB name (pdb["gimp-image-new"])
+  or as attributes with underbars (pdb.gimp_image_new.)
+  '''
+
+  def __init__(self, procedures=()):
+    self.procedures = {}
+    self.calls = {} # PDB name => count of calls
+    self.set_procedures(procedures)
+
+  def set_procedures(self, procedures):
+    ''' Replace procedures with given sequence of PDBFunction. '''
+    self.procedures = {}
+    for procedure in procedures:
+      procedure.pdb = self
+      self.procedures[procedure.proc_name] = procedure
+    # Queries that the real PDB answers about itself
+    for name, function in (("gimp-plugins-query", self._plugins_query),
+        ("gimp-procedural-db-query", self._procedural_db_query)):
+      self.procedures[name] = _Query(name, function, self)
+
+  def __getitem__(self, name):
+    procedure = self.procedures[name]
+    self.count_call("gimp-procedural-db-proc-info") # pygimp fetches proc info on every lookup
+    return procedure
+
+  def __contains__(self, name):
+    return name in self.procedures
+
+  def __getattr__(self, attrname):
+    if attrname.startswith("_"):
+      raise AttributeError(attrname)
+    try:
+      return self[attrname.replace("_", "-")]
+    except KeyError:
+      raise AttributeError(attrname)
+
+  def query(self):
+    ''' As pygimp pdb.query(): all procedure names. '''
+    return self.procedures.keys()
+
+  def reset_calls(self):
+    self.calls = {}
+
+  def count_call(self, name):
+    self.calls[name] = self.calls.get(name, 0) + 1
+
+  def count_calls(self):
+    ''' Total count of calls since reset_calls() '''
+    return sum(self.calls.values())
+
+  def _plugins_query(self, search_string):
+    plugins = [procedure for procedure in self.procedures.itervalues()
+      if procedure.menupath is not None and search_string in procedure.proc_name]
+    plugins.sort(key=lambda procedure: procedure.proc_name)
+    count = len(plugins)
+    return (count, [procedure.menupath for procedure in plugins],
+      count, [procedure.accel for procedure in plugins],
+      count, [procedure.location for procedure in plugins],
+      count, [procedure.imagetype for procedure in plugins],
+      count, [procedure.time for procedure in plugins],
+      count, [procedure.proc_name for procedure in plugins])
+
+  def _procedural_db_query(self, name, blurb, help, author, copyright, date, proc_type):
+    ''' Only name is matched, as a substring, not as a regex. '''
+    names = [procname for procname in self.procedures if name in (".*", "") or name in procname]
+    return len(names), names
+
+
+class _Query(PDBFunction):
+  ''' A query procedure, answered by the FakePdb itself. '''
+
+  def __init__(self, name, function, pdb):
+    PDBFunction.__init__(self, name)
+    self.function = function
+    self.pdb = pdb
+
+  def __call__(self, *args):
+    self.pdb.calls[self.proc_name] = self.pdb.calls.get(self.proc_name, 0) + 1
+    return self.function(*args)
+
+
+'''
+Synthetic PDB
+'''
+
+_MENUS = ("Filters/Blur", "Filters/Enhance", "Filters/Distorts", "Filters/Light and Shadow",
+  "Filters/Noise", "Filters/Edge-Detect", "Filters/Generic", "Filters/Combine", "Filters/Artistic",
+  "Filters/Decor", "Filters/Map", "Filters/Render/Pattern", "Filters/Render/Nature", "Filters/Web",
+  "Filters/Animation", "Colors", "Colors/Map", "Colors/Components", "Colors/Auto", "Layer/Transparency")
+
+_WORDS = ("blur", "sharpen", "noise", "map", "render", "color", "layer", "channel", "edge", "light",
+  "shadow", "pattern", "wave", "tile", "mosaic", "grid", "curve", "gradient", "alpha", "mask")
+
+_EXTRA_PARAM_TYPES = (PDB_INT32, PDB_INT32, PDB_FLOAT, PDB_FLOAT, PDB_STRING, PDB_COLOR,
+  PDB_INT8, PDB_INT16, PDB_LAYER, PDB_CHANNEL)
+
+_PLUGIN_PARAMS = ((PDB_INT32, "run-mode", "Interactive, non-interactive"), _IMAGE, _DRAWABLE)
+
+# Params of internal procedures not implemented here.
+_DEFAULT_INTERNAL_PARAMS = (_IMAGE, _DRAWABLE)
+
+
+def synthetic_procedures(count=DEFAULT_SIZE, seed=0, internal_names=()):
+  '''
+  Return list of PDBFunction: count synthetic plugins,
+  the internal procedures implemented here, and internal procedures named by internal_names
+  (e.g. those a driver expects, having paramdefs image, drawable.)
+  Same seed, same PDB.
+  '''
+  generator = random.Random(seed)
+  result = []
+  for i in range(count):
+    words = [generator.choice(_WORDS) for j in range(generator.randint(2, 12))]
+    params = list(_PLUGIN_PARAMS)
+    for j in range(generator.randint(0, MAX_EXTRA_PARAMS)):
+      if j == 0: # leading ephemeral params would be hidden (see parse_params), as the drawable is
+        paramtype = generator.choice(_EXTRA_PARAM_TYPES[:-2])
+      else:
+        paramtype = generator.choice(_EXTRA_PARAM_TYPES)
+      word = generator.choice(_WORDS)
+      params.append((paramtype, "%s-%d" % (word, j), "The %s of the %s" % (word, generator.choice(_WORDS))))
+    if generator.random() < 0.1:
+      return_vals = ((PDB_LAYER, "new-layer", "The new layer"),)
+    else:
+      return_vals = ()
+    label = " ".join(words[:2]).capitalize() + " %d" % i
+    result.append(PDBFunction("plug-in-synthetic-%d" % i,
+      blurb=" ".join(words).capitalize(),
+      help="Synthetic plugin %d." % i,
+      author="Synthetic", copyright="Synthetic", date="2010",
+      proc_type=PLUGIN, params=params, return_vals=return_vals,
+      menupath="<Image>/%s/%s..." % (generator.choice(_MENUS), label),
+      location="/usr/lib/gimp/2.0/plug-ins/synthetic-%d" % (i / PROCEDURES_PER_FILE),
+      imagetype="RGB*, GRAY*",
+      time=1262304000 + i / PROCEDURES_PER_FILE))
+  for name, (function, params, return_vals) in _IMPLEMENTATIONS.iteritems():
+    result.append(PDBFunction(name, blurb=name, params=params, return_vals=return_vals))
+  for name in internal_names:
+    if name not in _IMPLEMENTATIONS:
+      result.append(PDBFunction(name, blurb=name, params=_DEFAULT_INTERNAL_PARAMS))
+  return result
+
+
+'''
+Recorded PDB
+'''
+
+def record(pdb, filepath):
+  '''
+  Record a real Gimp's PDB to filepath, for offline use.
+  Run in Gimp, e.g. in the Python-Fu console:
+    import sys; sys.path.append("<gimpscripter>/tools/fakegimp"); import fakepdb
+    fakepdb.record(pdb, "/tmp/pdb.record")
+  (Appended to sys.path, the fake modules don't shadow Gimp's, already imported.)
+  Takes a while: one round-trip per procedure.
+  '''
+  plugins = {}
+  c1, menupath, c2, accel, c3, loc, c4, imagetype, c5, times, c6, name = pdb.gimp_plugins_query("")
+  for i in range(len(name)):
+    plugins[name[i]] = dict(menupath=menupath[i], accel=accel[i], location=loc[i],
+      imagetype=imagetype[i], time=times[i])
+  records = []
+  for procname in pdb.query():
+    proc = pdb[procname]
+    record = dict(name=procname, blurb=proc.proc_blurb, help=proc.proc_help,
+      author=proc.proc_author, copyright=proc.proc_copyright, date=proc.proc_date,
+      proc_type=proc.proc_type, params=tuple(proc.params), return_vals=tuple(proc.return_vals))
+    record.update(plugins.get(procname, {}))
+    records.append(record)
+  with open(filepath, "wb") as f:
+    cPickle.dump((RECORD_FORMAT_VERSION, records), f, cPickle.HIGHEST_PROTOCOL)
+  print "Recorded", len(records), "procedures to", filepath
+
+
+def recorded_procedures(filepath):
+  ''' Return list of PDBFunction recorded in filepath by record(). '''
+  with open(filepath, "rb") as f:
+    format_version, records = cPickle.load(f)
+  if format_version != RECORD_FORMAT_VERSION:
+    raise RuntimeError("Recorded PDB %s has format %s, expected %s" % (filepath, format_version, RECORD_FORMAT_VERSION))
+  return [PDBFunction(**record) for record in records]
+
+
+def configured_procedures():
+  ''' Procedures as configured by environment, see module doc. '''
+  filepath = os.environ.get("FAKEGIMP_PDB")
+  if filepath:
+    return recorded_procedures(filepath)
+  return synthetic_procedures(int(os.environ.get("FAKEGIMP_SIZE", DEFAULT_SIZE)),
+    int(os.environ.get("FAKEGIMP_SEED", 0)))
@@ -0,0 +1,46 @@
+'''
+Fake gimp module, for running GimpScripter without Gimp.  See fakepdb.py.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import tempfile
+
+import fakepdb
+from fakepdb import Image, Layer, Channel, Vectors, image_list
+
+
+version = (2, 6, 11)
+
+# The user's Gimp directory, with a plug-ins subdirectory, as Gimp makes it.
+directory = os.environ.get("FAKEGIMP_DIRECTORY") or tempfile.mkdtemp(prefix="fakegimp-")
+if not os.path.isdir(os.path.join(directory, "plug-ins")):
+  os.makedirs(os.path.join(directory, "plug-ins"))
+
+locale_directory = "/usr/share/locale"
+
+pdb = fakepdb.FakePdb(fakepdb.configured_procedures())
+
+
+class error(RuntimeError):
+  pass
+
+
+def pygimp_get_data(name):
+  raise error("no data for id")
+
+_id2image = fakepdb.id2object
+_id2vectors = fakepdb.id2object
+
+def _id2drawable(ID):
+  pdb.count_call("gimp-drawable-is-layer") # pygimp asks, to make a Layer or Channel
+  return fakepdb.id2object(ID)
+
+def delete(image):
+  fakepdb._images.remove(image)
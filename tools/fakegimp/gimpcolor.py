@@ -0,0 +1,26 @@
+'''
+Fake gimpcolor module, for running GimpScripter without Gimp.  See fakepdb.py.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+
+class RGB(object):
+  ''' Color.  Repr is evaluable, as pygimp's. '''
+
+  def __init__(self, r=0, g=0, b=0, a=1):
+    self.r, self.g, self.b, self.a = r, g, b, a
+
+  def __repr__(self):
+    return "gimpcolor.RGB(%r, %r, %r, %r)" % (self.r, self.g, self.b, self.a)
+
+  def __eq__(self, other):
+    return isinstance(other, RGB) and (self.r, self.g, self.b, self.a) == (other.r, other.g, other.b, other.a)
+
+  def __ne__(self, other):
+    return not self == other
@@ -0,0 +1,70 @@
+'''
+Fake gimpenums module, for running GimpScripter without Gimp.  See fakepdb.py.
+
+Constants named as pygimp's gimpenums (libgimp enums without the GIMP_ prefix.)
+Only the enums GimpScripter uses, plus a few generated wrapper plugins use.
+Values are those of Gimp 2.6, so a PDB recorded from a real Gimp reads correctly.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+# GimpPDBArgType
+PDB_INT32 = 0
+PDB_INT16 = 1
+PDB_INT8 = 2
+PDB_FLOAT = 3
+PDB_STRING = 4
+PDB_INT32ARRAY = 5
+PDB_INT16ARRAY = 6
+PDB_INT8ARRAY = 7
+PDB_FLOATARRAY = 8
+PDB_STRINGARRAY = 9
+PDB_COLOR = 10
+PDB_REGION = 11
+PDB_DISPLAY = 12
+PDB_IMAGE = 13
+PDB_LAYER = 14
+PDB_CHANNEL = 15
+PDB_DRAWABLE = 16
+PDB_SELECTION = 17
+PDB_BOUNDARY = 18
+PDB_VECTORS = 19
+PDB_PARASITE = 20
+PDB_STATUS = 21
+
+# GimpPDBProcType
+INTERNAL = 0
+PLUGIN = 1
+EXTENSION = 2
+TEMPORARY = 3
+
+# GimpRunMode
+RUN_INTERACTIVE = 0
+RUN_NONINTERACTIVE = 1
+RUN_WITH_LAST_VALS = 2
+
+# GimpImageBaseType
+RGB = 0
+GRAY = 1
+INDEXED = 2
+
+# GimpImageType
+RGB_IMAGE = 0
+RGBA_IMAGE = 1
+GRAY_IMAGE = 2
+GRAYA_IMAGE = 3
+INDEXED_IMAGE = 4
+INDEXEDA_IMAGE = 5
+
+# GimpLayerModeEffects
+NORMAL_MODE = 0
+
+# GimpChannelType
+RED_CHANNEL = 0
+GREEN_CHANNEL = 1
+BLUE_CHANNEL = 2
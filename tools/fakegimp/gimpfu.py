@@ -0,0 +1,102 @@
+'''
+Fake gimpfu module, for running GimpScripter without Gimp.  See fakepdb.py.
+
+As pygimp's gimpfu: "from gimpfu import *" gives gimp, pdb, gettext, the gimpenums, and PF_ constants.
+register() remembers the plugin (see registered), main() does nothing,
+so a generated wrapper plugin can be imported and its function called by a driver.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import gettext
+
+import gimp
+import gimpcolor
+from gimpenums import *
+
+pdb = gimp.pdb
+
+# As gimpfu.py of Gimp 2.6
+PF_INT8        = PDB_INT8
+PF_INT16       = PDB_INT16
+PF_INT32       = PDB_INT32
+PF_INT         = PF_INT32
+PF_FLOAT       = PDB_FLOAT
+PF_STRING      = PDB_STRING
+PF_VALUE       = PF_STRING
+PF_COLOR       = PDB_COLOR
+PF_COLOUR      = PF_COLOR
+PF_REGION      = PDB_REGION
+PF_DISPLAY     = PDB_DISPLAY
+PF_IMAGE       = PDB_IMAGE
+PF_LAYER       = PDB_LAYER
+PF_CHANNEL     = PDB_CHANNEL
+PF_DRAWABLE    = PDB_DRAWABLE
+PF_VECTORS     = PDB_VECTORS
+
+PF_TOGGLE      = 1000
+PF_BOOL        = PF_TOGGLE
+PF_SLIDER      = 1001
+PF_SPINNER     = 1002
+PF_ADJUSTMENT  = PF_SPINNER
+PF_FONT        = 1003
+PF_FILE        = 1004
+PF_BRUSH       = 1005
+PF_PATTERN     = 1006
+PF_GRADIENT    = 1007
+PF_RADIO       = 1008
+PF_TEXT        = 1009
+PF_PALETTE     = 1010
+PF_FILENAME    = 1011
+PF_DIRNAME     = 1012
+PF_OPTION      = 1013
+
+_obj_mapping = {
+    PF_INT8        : int,
+    PF_INT16       : int,
+    PF_INT32       : int,
+    PF_FLOAT       : float,
+    PF_STRING      : str,
+    PF_COLOR       : gimpcolor.RGB,
+    PF_DISPLAY     : object,
+    PF_IMAGE       : gimp.Image,
+    PF_LAYER       : gimp.Layer,
+    PF_CHANNEL     : gimp.Channel,
+    PF_DRAWABLE    : gimp.fakepdb.Drawable,
+    PF_VECTORS     : gimp.Vectors,
+    PF_TOGGLE      : bool,
+    PF_SLIDER      : float,
+    PF_SPINNER     : int,
+    PF_FONT        : str,
+    PF_FILE        : str,
+    PF_BRUSH       : str,
+    PF_PATTERN     : str,
+    PF_GRADIENT    : str,
+    PF_RADIO       : str,
+    PF_TEXT        : str,
+    PF_PALETTE     : str,
+    PF_FILENAME    : str,
+    PF_DIRNAME     : str,
+    PF_OPTION      : int,
+}
+
+registered = {} # procedure name => (function, params, menu), by register()
+
+
+def register(proc_name, blurb, help, author, copyright, date, label, imagetypes,
+    params, results, function, menu=None, domain=None, on_query=None, on_run=None):
+  registered[proc_name] = (function, params, menu)
+
+def main():
+  pass
+
+def fail(msg):
+  raise RuntimeError(msg)
+
+def N_(message):
+  return message
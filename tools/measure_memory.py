@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+'''
+Measure the memory of GimpScripter's records, on a fake PDB (see fakegimp/fakepdb.py), without Gimp:
+the plugin db (a Procedure per procedure, all proc info fetched, as after a session or from the cache)
+and a spec of a long sequence of commands (a CommandSpec per command, a Param per parameter.)
+
+For each, prints the growth of resident memory of this process, and the bytes of the records counted
+object by object (sys.getsizeof, each object once, so shared strings and FormalParams count once.)
+The count doesn't vary from run to run; resident memory does, a little.
+Compare the output of different versions of GimpScripter on the same PDB.
+
+A real Gimp sends every string as a new object, but the fake PDB hands out the same few objects.
+So, before loading, strings of the fake PDB are copied, one copy per procedure, as Gimp would send them.
+
+Usage:
+  python tools/measure_memory.py [--size N] [--seed N] [--pdb recorded-file] [--commands N]
+Needs PyGTK (the plugin db imports it), but not a display.  Resident memory is Linux only.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import gc
+import optparse
+
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.dirname(TOOLS_DIRECTORY)
+
+# Attributes of fake PDB functions that Gimp would send as new strings.
+WIRE_ATTRS = ("proc_name", "proc_blurb", "proc_help", "proc_author", "proc_copyright", "proc_date",
+  "params", "return_vals", "menupath", "accel", "location", "imagetype")
+
+
+def parse_options():
+  parser = optparse.OptionParser(usage="%prog [options]")
+  parser.add_option("--size", type="int", default=2000, help="count of synthetic plugins")
+  parser.add_option("--seed", type="int", default=0, help="random seed of synthetic PDB")
+  parser.add_option("--pdb", help="recorded PDB file, instead of synthetic")
+  parser.add_option("--commands", type="int", default=2000, help="count of commands in spec")
+  options, args = parser.parse_args()
+  return options
+
+
+def resident():
+  ''' Return resident kilobytes of this process. '''
+  with open("/proc/self/status") as f:
+    for line in f:
+      if line.startswith("VmRSS:"):
+        return int(line.split()[1])
+
+def copied(value):
+  ''' Return value with its strings copied, also in tuples. '''
+  if isinstance(value, str):
+    return "".join(list(value))  # a new object, unless empty or one character
+  if isinstance(value, tuple):
+    return tuple([copied(item) for item in value])
+  return value
+
+def copy_wire_strings(procedures):
+  for procedure in procedures:
+    for attrname in WIRE_ATTRS:
+      setattr(procedure, attrname, copied(getattr(procedure, attrname)))
+
+
+def _attribute_values(obj):
+  ''' Values of instance attributes of obj, in a __dict__ or slots. '''
+  values = []
+  if hasattr(obj, "__dict__"):
+    values.extend(obj.__dict__.values())
+  for cls in type(obj).__mro__:
+    for slot in cls.__dict__.get("__slots__", ()):
+      try:
+        values.append(object.__getattribute__(obj, slot))
+      except AttributeError:
+        pass # unset, e.g. lazy
+  return values
+
+def size_of(objects, seen):
+  '''
+  Return bytes of objects, and of what they refer to: instances (their __dict__ too), tuples, lists, strings.
+  Objects in seen (a set of ids) are not counted, and those counted are added to it.
+  '''
+  total = 0
+  pending = list(objects)
+  while pending:
+    obj = pending.pop()
+    if id(obj) in seen:
+      continue
+    seen.add(id(obj))
+    total += sys.getsizeof(obj)
+    if isinstance(obj, (tuple, list)):
+      pending.extend(obj)
+    elif isinstance(obj, dict):
+      pending.extend(obj.keys())
+      pending.extend(obj.values())
+    elif not isinstance(obj, (basestring, int, long, float, type)) and obj is not None:
+      if hasattr(obj, "__dict__"):
+        total += sys.getsizeof(obj.__dict__)
+      pending.extend(_attribute_values(obj))
+  return total
+
+
+def quietly(function, *args):
+  ''' Call function without GimpScripter's chatter on stdout.  Return its result. '''
+  saved = sys.stdout
+  sys.stdout = open(os.devnull, "w")
+  try:
+    return function(*args)
+  finally:
+    sys.stdout = saved
+
+def report(label, count, before, records):
+  gc.collect()
+  kilobytes = resident() - before
+  size = size_of(records, set())
+  print "%-24s %8d %12d kB %12d kB %10d B/record" % (label, count, kilobytes, size / 1024, size / max(count, 1))
+
+
+def main(options):
+  import gimp
+  from gimpscripter.mockmenu import plugindb
+  import profile_offline
+
+  copy_wire_strings(gimp.pdb.procedures.values())
+  print "%-24s %8s %15s %15s" % ("", "records", "resident", "counted")
+
+  gc.collect()
+  before = resident()
+  quietly(plugindb.load)
+  quietly(profile_offline.fetch_proc_info, plugindb)
+  report("plugin db", len(plugindb.plugindb), before, plugindb.plugindb.values())
+
+  gc.collect()
+  before = resident()
+  spec = quietly(profile_offline.make_spec, plugindb, options.commands)
+  commands = spec.commands
+  report("spec, %d params" % len(commands.param_list), len(commands), before,
+    commands.command_list + list(commands.param_list))
+
+
+if __name__ == "__main__":
+  options = parse_options()
+
+  # Configure fake PDB before it is imported
+  os.environ["FAKEGIMP_SIZE"] = str(options.size)
+  os.environ["FAKEGIMP_SEED"] = str(options.seed)
+  if options.pdb:
+    os.environ["FAKEGIMP_PDB"] = options.pdb
+  sys.path.insert(0, os.path.join(TOOLS_DIRECTORY, "fakegimp"))
+  sys.path.insert(0, TOOLS_DIRECTORY)
+  sys.path.insert(0, SOURCE_DIRECTORY)
+
+  import gimp
+  # Internal procedures that GimpScripter's mock menu offers, as profile_offline.py
+  from gimpscripter.mockmenu import map_procedures
+  import fakepdb
+  gimp.pdb.set_procedures(fakepdb.synthetic_procedures(0, internal_names=map_procedures.menu_to_procname.values())
+    + gimp.pdb.procedures.values())
+
+  main(options)
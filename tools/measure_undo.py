@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+'''
+Measure, in a real Gimp, the time and memory a wrapper plugin takes on a large image, in an undo mode
+(see specification.UNDO_FOO.)  profile_offline.py counts undo steps and memory on a fake PDB,
+but only a real Gimp can tell the time.
+
+Run in Gimp's batch mode from the source directory, once per undo mode,
+so the memory one mode leaves in Gimp doesn't hide another's:
+
+  for mode in 0 1 2; do
+    gimp -i --batch-interpreter python-fu-eval \
+      -b "import sys; sys.argv = ['measure_undo.py', '--mode', '$mode']; execfile('tools/measure_undo.py')" \
+      -b "pdb.gimp_quit(1)"
+  done
+
+Options: --mode N, --size N (width and height of image), --commands name,name,...
+The wrapper is generated into the user's plug-ins directory, as GimpScripter does, and removed after.
+GimpScripter must be installed there, for its runtime.
+Memory is of the Gimp process (this runs in a plug-in process, a child of Gimp), Linux only.
+Gimp swaps undo beyond its tile cache to disk, so also compare with the tile cache size in preferences.
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import time
+import optparse
+
+TOOLS_DIRECTORY = os.path.abspath("tools")
+SOURCE_DIRECTORY = os.path.dirname(TOOLS_DIRECTORY)
+
+# Filters that change every pixel of the drawable, so each pushes an undo step of the whole drawable.
+DEFAULT_COMMANDS = "plug-in-gauss,plug-in-unsharp-mask,plug-in-noisify,plug-in-gauss,plug-in-unsharp-mask"
+
+
+def parse_options():
+  parser = optparse.OptionParser(usage="%prog [options]")
+  parser.add_option("--mode", type="int", default=0, help="undo mode, see specification.UNDO_FOO")
+  parser.add_option("--size", type="int", default=10000, help="width and height of image")
+  parser.add_option("--commands", default=DEFAULT_COMMANDS, help="comma separated PDB names of commands")
+  options, args = parser.parse_args()
+  return options
+
+
+def gimp_memory():
+  ''' Return (resident, peak resident) kilobytes of the Gimp process. '''
+  sizes = {}
+  with open("/proc/%d/status" % os.getppid()) as f:
+    for line in f:
+      name, value = line.split(":", 1)
+      if name in ("VmRSS", "VmHWM"):
+        sizes[name] = int(value.split()[0])
+  return sizes["VmRSS"], sizes["VmHWM"]
+
+
+def main(options):
+  from gimpfu import gimp, pdb, RGB, RGB_IMAGE, NORMAL_MODE
+  from gimpscripter import generate
+  from gimpscripter import specification
+  from gimpscripter.mockmenu import plugindb
+  import profile_offline
+
+  plugindb.load()
+  spec = profile_offline.spec_of(plugindb, options.commands.split(","), "Measure undo")
+  spec.wrapping.set_undo_mode(options.mode)
+  generate.generate(spec)
+  filepath = generate.substitutions["filepath"]
+  namespace = { "__name__" : "wrapper" } # not "__main__", so it doesn't register
+  exec "from gimpfu import *" in namespace
+  execfile(filepath, namespace)
+  os.remove(filepath)
+
+  image = pdb.gimp_image_new(options.size, options.size, RGB)
+  layer = pdb.gimp_layer_new(image, options.size, options.size, RGB_IMAGE, "Background", 100, NORMAL_MODE)
+  pdb.gimp_image_add_layer(image, layer, 0)
+  resident_before, peak_before = gimp_memory()
+  start = time.time()
+  namespace["plugin_main"](image, layer)
+  elapsed = time.time() - start
+  resident, peak = gimp_memory()
+  pdb.gimp_image_delete(image)
+
+  print "%s, %d commands on %dx%d image: %.1f seconds, Gimp memory %+d kB, peak %+d kB" % (
+    specification.UNDO_MODE_LABELS[options.mode], len(spec.commands.command_list), options.size, options.size,
+    elapsed, resident - resident_before, peak - peak_before)
+
+
+sys.path.insert(0, TOOLS_DIRECTORY)
+sys.path.insert(0, SOURCE_DIRECTORY)
+main(parse_options())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+
+'''
+Drive GimpScripter without Gimp, on a fake PDB (see fakegimp/fakepdb.py), timing each stage.
+
+Stages:
+  run the runtime (GimpEphemera) over a growing image,
+  load the plugin db, fetch proc info (blurbs etc.), save caches, search,
+  populate tree models, generate a wrapper plugin, run the wrapper plugin.
+Then for each undo mode of a wrapper (see specification.UNDO_FOO), the undo steps and memory
+its commands leave on a large image (only counted by the fake PDB: for time, see measure_undo.py.)
+Then the time to generate wrappers of ever longer sequences of commands, which should grow linearly.
+Stages needing PyGTK (everything that imports db_treemodel) are skipped if it is not installed.
+
+Usage:
+  python tools/profile_offline.py [--size N] [--seed N] [--pdb recorded-file] [--commands N] [--updates N]
+    [--image-size N] [--profile]
+
+Copyright 2010  Lloyd Konneker
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+'''
+
+import os
+import sys
+import time
+import shutil
+import optparse
+
+TOOLS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIRECTORY = os.path.dirname(TOOLS_DIRECTORY)
+
+
+def parse_options():
+  parser = optparse.OptionParser(usage="%prog [options]")
+  parser.add_option("--size", type="int", default=1000, help="count of synthetic plugins")
+  parser.add_option("--seed", type="int", default=0, help="random seed of synthetic PDB")
+  parser.add_option("--pdb", help="recorded PDB file, instead of synthetic")
+  parser.add_option("--commands", type="int", default=10, help="count of commands in generated wrapper")
+  parser.add_option("--updates", type="int", default=100, help="count of layers made and ephemera updates by runtime stage")
+  parser.add_option("--image-size", type="int", default=10000, help="width and height of image for undo modes")
+  parser.add_option("--profile", action="store_true", help="also print cProfile statistics")
+  options, args = parser.parse_args()
+  return options
+
+
+def stage(name, function, *args):
+  ''' Call function, printing elapsed time.  Return its result. '''
+  start = time.time()
+  result = function(*args)
+  print "%-24s %8.3f seconds" % (name, time.time() - start)
+  return result
+
+
+def new_image(width=640, height=400):
+  ''' Fake image having a layer and a channel with the names of GimpScripter's defaults. Return image, layer. '''
+  from gimpfu import pdb
+  image = pdb.gimp_image_new(width, height, 0)
+  layer = pdb.gimp_layer_new(image, width, height, 0, "Clipboard", 100, 0)
+  pdb.gimp_image_add_layer(image, layer, 0)
+  pdb.gimp_image_add_channel(image, pdb.gimp_channel_new(image, width, height, "Alpha", 100, (0, 0, 0)), 0)
+  return image, layer
+
+def run_runtime(count):
+  ''' Make count layers, updating ephemera after each, as a wrapper would.  Return count of PDB calls. '''
+  from gimpfu import pdb, PF_LAYER
+
+  namespace = { "__name__" : "runtime" }
+  execfile(os.path.join(SOURCE_DIRECTORY, "gimpscripter", "runtime.py"), namespace)
+  image, layer = new_image()
+  pdb.reset_calls()
+  ephemera = namespace["GimpEphemera"](image, layer)
+  for i in range(count):
+    pdb.gimp_image_add_layer(image, pdb.gimp_layer_new(image, 64, 64, 0, "Layer %d" % i, 100, 0), 0)
+    ephemera.update()
+    ephemera.top(PF_LAYER)
+  return pdb.count_calls()
+
+def fetch_proc_info(plugindb):
+  for procedure in plugindb.plugindb.itervalues():
+    procedure.blurb
+
+def search(plugindb):
+  for pattern in ("b", "bl", "blur", "noise map", ""):
+    plugindb.pluginfilterdict.filter(plugindb.plugindb, pattern)
+
+def make_spec(plugindb, count):
+  '''
+  Spec of a wrapper calling count commands: synthetic plugins, and every fifth a macro.
+  '''
+  from gimpscripter import macros
+
+  plugins = sorted([name for name in plugindb.plugindb if name.startswith("plug-in-synthetic-")])
+  macronames = sorted(macros.macros.keys())
+  names = []
+  for i in range(count):
+    if i % 5 == 4:
+      names.append(macronames[i % len(macronames)])
+    else:
+      names.append(plugins[i % len(plugins)])
+  return spec_of(plugindb, names)
+
+def spec_of(plugindb, names, menuname="Offline profile"):
+  ''' Spec of a wrapper calling named commands.  Parameters preset to their defaults, none deferred. '''
+  from gimpscripter import specification
+
+  spec = specification.GimpScripterSpec()
+  spec.wrapping.set_menu_name(menuname)
+  for i, name in enumerate(names):
+    spec.commands.append(specification.CommandSpec(name, plugindb.plugindb[name].menupath))
+    param_list = spec.commands.param_list
+    defaults = param_list.get_nonhidden_defaults_for(i)
+    param_list.preset(defaults, [False] * len(defaults), command_index=i)
+  return spec
+
+def generate(spec):
+  import gimp
+  from gimpscripter import generate
+
+  # Generated wrappers include the runtime from where GimpScripter is installed.
+  runtimedirectory = os.path.join(gimp.directory, "plug-ins", "gimpscripter")
+  if not os.path.isdir(runtimedirectory):
+    os.makedirs(runtimedirectory)
+  shutil.copy(os.path.join(SOURCE_DIRECTORY, "gimpscripter", "runtime.py"), runtimedirectory)
+  generate.generate(spec)
+  return generate.substitutions["filepath"]
+
+def run_wrapper(filepath, width=640, height=400):
+  '''
+  Import generated wrapper and call its plugin_main on a new fake image (the first open image.)
+  Return count of PDB calls.
+  '''
+  from gimpfu import pdb
+
+  namespace = { "__name__" : "wrapper" } # not "__main__", so it doesn't register
+  # As under "__main__", where the wrapper imports gimpfu, needed if it lacks the runtime, which also does
+  exec "from gimpfu import *" in namespace
+  execfile(filepath, namespace)
+  image, layer = new_image(width, height)
+  pdb.reset_calls()
+  plugin_main = namespace["plugin_main"]
+  if plugin_main.func_code.co_argcount:
+    plugin_main(image, layer)
+  else:
+    plugin_main()
+  return pdb.count_calls()
+
+
+def count_macro_calls(plugindb):
+  '''
+  For each bundled macro, and for all in sequence, generate a wrapper without and with optimization
+  of its body (see gimpscripter/optimize.py), and print the PDB calls each makes.
+  '''
+  from gimpscripter import generate as generator
+  from gimpscripter import macros
+
+  names = sorted(macros.macros.keys())
+  print "%-36s %8s %8s" % ("PDB calls of wrapper of", "before", "after")
+  for sequence in [[name] for name in names] + [names]:
+    counts = []
+    for is_optimized in (False, True):
+      generator.OPTIMIZE_WRAPPING_MAIN_BODY = is_optimized
+      counts.append(quietly(run_wrapper, quietly(generate, quietly(spec_of, plugindb, sequence, "Macros"))))
+      gimp_clear_images()
+    print "%-36s %8d %8d" % (len(sequence) == 1 and sequence[0] or "all macros", counts[0], counts[1])
+  generator.OPTIMIZE_WRAPPING_MAIN_BODY = True
+
+def count_undo(plugindb, count, size):
+  '''
+  For each undo mode, generate a wrapper of count commands, run it on a size x size image,
+  and print the undo steps and memory left on the image.
+  '''
+  import gimp
+  from gimpscripter import specification
+
+  spec = quietly(make_spec, plugindb, count)
+  print "%-36s %8s %8s %12s" % ("Undo of wrapper of %d commands" % count, "calls", "steps", "megabytes")
+  for mode, label in enumerate(specification.UNDO_MODE_LABELS):
+    spec.wrapping.set_undo_mode(mode)
+    calls = quietly(run_wrapper, quietly(generate, spec), size, size)
+    image = gimp.fakepdb.image_list()[0]
+    print "%-36s %8d %8d %12.1f" % (label, calls, image.undo_steps, image.undo_bytes / 1048576.0)
+    gimp_clear_images()
+
+def time_generation(plugindb, lengths=(100, 200, 400, 800, 1600)):
+  '''
+  Print time to make specs (append commands, see parameters.prototype_of)
+  and to generate wrappers, of sequences of commands of lengths.
+  '''
+  print "%-36s %8s %8s %12s" % ("Generate wrapper of", "spec s", "seconds", "ms/command")
+  for length in lengths:
+    start = time.time()
+    spec = quietly(make_spec, plugindb, length)
+    spec_elapsed = time.time() - start
+    start = time.time()
+    quietly(generate, spec)
+    elapsed = time.time() - start
+    print "%-36s %8.3f %8.3f %12.3f" % ("%d commands" % length, spec_elapsed, elapsed, elapsed * 1000 / length)
+
+def quietly(function, *args):
+  ''' Call function without GimpScripter's chatter on stdout.  Return its result. '''
+  saved = sys.stdout
+  sys.stdout = open(os.devnull, "w")
+  try:
+    return function(*args)
+  finally:
+    sys.stdout = saved
+
+def gimp_clear_images():
+  import gimp
+  gimp.fakepdb.clear_images()
+
+
+def main(options):
+  import gimp
+  print "Fake PDB:", len(gimp.pdb.procedures), "procedures, Gimp directory:", gimp.directory
+
+  calls = stage("runtime", run_runtime, options.updates)
+  print "Runtime made", calls, "PDB calls"
+  gimp.fakepdb.clear_images()
+
+  try:
+    import gtk
+  except ImportError:
+    print "PyGTK not installed, skipping stages that need it"
+    return
+  from gimpscripter.mockmenu import plugindb
+  from gimpscripter.mockmenu import db_treemodel
+
+  stage("load plugin db", plugindb.load)
+  stage("fetch proc info", fetch_proc_info, plugindb)
+  stage("save caches", plugindb.save)
+  stage("search", search, plugindb)
+  stage("populate models", db_treemodel.TreeModelDictionary, plugindb.dictofviews)
+  spec = stage("make spec", make_spec, plugindb, options.commands)
+  filepath = stage("generate", generate, spec)
+  calls = stage("run wrapper", run_wrapper, filepath)
+  print "Wrapper", filepath, "made", calls, "PDB calls"
+  gimp.fakepdb.clear_images()
+  count_macro_calls(plugindb)
+  count_undo(plugindb, options.commands, options.image_size)
+  time_generation(plugindb)
+
+
+if __name__ == "__main__":
+  options = parse_options()
+
+  # Configure fake PDB before it is imported
+  os.environ["FAKEGIMP_SIZE"] = str(options.size)
+  os.environ["FAKEGIMP_SEED"] = str(options.seed)
+  if options.pdb:
+    os.environ["FAKEGIMP_PDB"] = options.pdb
+  sys.path.insert(0, os.path.join(TOOLS_DIRECTORY, "fakegimp"))
+  sys.path.insert(0, SOURCE_DIRECTORY)
+
+  import gimp
+  # Internal procedures that GimpScripter's mock menu offers
+  from gimpscripter.mockmenu import map_procedures
+  import fakepdb
+  # (Procedures already in the PDB, e.g. recorded, take precedence.)
+  gimp.pdb.set_procedures(fakepdb.synthetic_procedures(0, internal_names=map_procedures.menu_to_procname.values())
+    + gimp.pdb.procedures.values())
+
+  if options.profile:
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.runcall(main, options)
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(30)
+  else:
+    main(options)